@@ -3,66 +3,100 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
-EPS = 1e-12
+# Use the scoring kernel from the checkout (src/) when sensad is not installed.
+_SRC = Path(__file__).resolve().parent.parent / "src"
+if _SRC.is_dir() and str(_SRC) not in sys.path:
+    sys.path.insert(0, str(_SRC))
 
-def robust_z(x: np.ndarray, med: float, mad: float) -> np.ndarray:
-    denom = 1.4826 * mad + EPS
-    return (x - med) / denom
+from sensad.events import EVENT_COLUMNS, EventTracker, predict_with_z  # noqa: E402
+from sensad.models import model_from_config  # noqa: E402
+from sensad.pipeline import TopK, run_pipeline  # noqa: E402
+from sensad.tabular import FORMATS, FrameWriter, iter_frames, read_frame  # noqa: E402
 
 def main():
     ap = argparse.ArgumentParser(description="Edge anomaly scoring (baseline robust-z)")
     ap.add_argument("--baseline", required=True, help="Path to baseline.json")
-    ap.add_argument("--input", required=True, help="Input CSV (must contain the sensor columns)")
-    ap.add_argument("--out", default="predictions.csv", help="Output CSV path")
+    ap.add_argument("--input", required=True, help="Input CSV/Parquet/Arrow/npy (must contain the sensor columns)")
+    ap.add_argument("--out", default="predictions.csv", help="Output path; format from suffix (.csv/.parquet/.arrow/.npy)")
+    ap.add_argument("--format", choices=("auto",) + FORMATS, default="auto", help="Input format (auto = from suffix)")
     ap.add_argument("--threshold", type=float, default=None, help="Override threshold (float)")
     ap.add_argument("--agg", choices=["max", "mean"], default=None, help="Override aggregation mode")
+    ap.add_argument("--chunksize", type=int, default=0, help="Score N rows at a time in bounded memory (0 = whole file)")
+    ap.add_argument("--output", choices=["rows", "events"], default="rows",
+                    help="rows: every input row + score; events: one row per run of anomalous rows")
+    ap.add_argument("--event-gap", type=int, default=0, help="Merge events separated by at most N normal rows")
     args = ap.parse_args()
 
     baseline_path = Path(args.baseline)
     cfg = json.loads(baseline_path.read_text(encoding="utf-8"))
 
     columns = cfg["columns"]
-    med = cfg["med"]
-    mad = cfg["mad"]
     threshold = float(cfg["threshold"]) if args.threshold is None else float(args.threshold)
     agg = cfg.get("agg", "max") if args.agg is None else args.agg
 
-    df = pd.read_csv(args.input)
-    missing = [c for c in columns if c not in df.columns]
-    if missing:
-        raise SystemExit(f"Missing columns in input CSV: {missing}")
-
-    X = df[columns].to_numpy(dtype=np.float32)
+    # baseline_robust_z, rolling_robust_z or autoencoder; stateful scorers keep their context across blocks
+    spec = model_from_config(cfg, base=baseline_path.parent)
+    spec.threshold, spec.agg = threshold, agg
+    model = spec.compile()
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    top = TopK(5)
+    chunksize = args.chunksize if args.chunksize > 0 else None
+    work = model.workspace(chunksize)[1] if chunksize else None
+    n_rows = 0
 
-    zs = []
-    for j, col in enumerate(columns):
-        z = robust_z(X[:, j], float(med[col]), float(mad[col]))
-        zs.append(np.abs(z))
-    Z = np.stack(zs, axis=1)
+    def score_chunk(df: pd.DataFrame) -> pd.DataFrame:
+        nonlocal n_rows
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            raise SystemExit(f"Missing columns in input: {missing}")
+        X = df[columns].to_numpy(dtype=np.float32)
+        score, pred = model.predict(X, work=work)
+        df["anomaly_score"] = score
+        df["is_anomaly"] = pred
+        times = df["time"].astype(str).to_numpy() if "time" in df.columns else [""] * len(df)
+        top.push(score, n_rows, (times, pred))
+        n_rows += len(df)
+        return df
 
-    score = np.mean(Z, axis=1) if agg == "mean" else np.max(Z, axis=1)
-    pred = (score >= threshold).astype(int)
+    if args.output == "events":
+        # feature models report the top channel (e.g. "temp:slope"), not just the sensor
+        tracker = EventTracker(getattr(model, "channels", columns), gap=args.event_gap)
+        events = []
+        frames = iter_frames(args.input, chunksize, fmt=args.format) if chunksize else [read_frame(args.input, fmt=args.format)]
+        for df in frames:
+            missing = [c for c in columns if c not in df.columns]
+            if missing:
+                raise SystemExit(f"Missing columns in input: {missing}")
+            score, pred, Z = predict_with_z(model, df[columns].to_numpy(dtype=np.float32), work)
+            times = df["time"].astype(str).to_numpy() if "time" in df.columns else None
+            events += tracker.update(score, pred, Z, times)
+        events += tracker.flush()
+        with FrameWriter(out_path) as writer:
+            writer.write(pd.DataFrame(events, columns=EVENT_COLUMNS))
+        print(f"OK: wrote {len(events)} events to {out_path} | threshold={threshold:.3f} agg={agg}")
+        for ev in sorted(events, key=lambda e: -e["peak_score"])[:5]:
+            print(f"  peak={ev['peak_score']:.3f} rows={ev['rows']} start={ev['start']} sensor={ev['top_sensor']}")
+        return
 
-    out = df.copy()
-    out["anomaly_score"] = score
-    out["is_anomaly"] = pred
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(out_path, index=False)
+    with FrameWriter(out_path) as writer:
+        if chunksize:
+            # read -> score -> append overlap; memory stays at a few chunks
+            run_pipeline(iter_frames(args.input, chunksize, fmt=args.format), score_chunk, writer.write)
+        else:
+            writer.write(score_chunk(read_frame(args.input, fmt=args.format)))
 
     # small summary
-    topk = min(5, len(out))
-    idx = np.argsort(-score)[:topk]
     print(f"OK: wrote {out_path} | threshold={threshold:.3f} agg={agg}")
     print("Top anomalies:")
-    for i in idx:
-        t = out.iloc[int(i)].get("time", "")
-        print(f"  score={score[int(i)]:.3f} is_anomaly={int(pred[int(i)])} time={t}")
+    for _, score, (t, pred) in top.items():
+        print(f"  score={score:.3f} is_anomaly={int(pred)} time={t}")
 
 if __name__ == "__main__":
     main()
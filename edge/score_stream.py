@@ -3,71 +3,592 @@ from __future__ import annotations
 
 import argparse
 import csv
-import json
+import io
 import sys
+import time
 from pathlib import Path
 
-import numpy as np
+# Use the scoring kernel from the checkout (src/) when sensad is not installed.
+_SRC = Path(__file__).resolve().parent.parent / "src"
+if _SRC.is_dir() and str(_SRC) not in sys.path:
+    sys.path.insert(0, str(_SRC))
 
-EPS = 1e-12
+from sensad.linebatch import iter_line_batches  # noqa: E402
+from sensad.telemetry import SIZE_BUCKETS, make_metrics  # noqa: E402
 
-def robust_z(x: float, med: float, mad: float) -> float:
-    denom = 1.4826 * mad + EPS
-    return (x - med) / denom
+# numpy (and the sensad modules built on it) are imported only when the numpy
+# engine is used; the lite engine starts with the standard library alone.
+
+def _have_numpy() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def parse_block(rows: list, idx: list):
+    """Sensor cells of a block of CSV rows -> (n, d) float32; unparsable cells become NaN."""
+    import numpy as np
+
+    cells = [[r[i] if i < len(r) else "" for i in idx] for r in rows]
+    try:
+        return np.array(cells, dtype=np.float32)
+    except ValueError:
+        X = np.empty((len(cells), len(idx)), dtype=np.float32)
+        for k, row in enumerate(cells):
+            for j, v in enumerate(row):
+                try:
+                    X[k, j] = float(v)
+                except ValueError:
+                    X[k, j] = np.nan
+        return X
+
+def format_rows(X, score, flags, times=None, suffix: str = "") -> str:
+    """CSV lines for scored float32 rows: one %-format per row; NaN cells are left empty."""
+    import numpy as np
+
+    d = X.shape[1]
+    fmt = ("%s," if times is not None else "") + ",".join(["%.7g"] * d) + ",%.6f,%d" + suffix.replace("%", "%%") + "\n"
+    rows = [[t] + x for t, x in zip(times, X.tolist())] if times is not None else X.tolist()
+    lines = [fmt % (*r, s, f) for r, s, f in zip(rows, score.tolist(), flags.tolist())]
+    a = 0 if times is None else 1
+    for i in np.flatnonzero(np.isnan(X).any(axis=1)).tolist():
+        cells = lines[i].split(",")
+        cells[a:a + d] = ["" if c == "nan" else c for c in cells[a:a + d]]
+        lines[i] = ",".join(cells)
+    return "".join(lines)
+
+def build_model(cfg: dict, base: Path, engine: str, args):
+    """Scorer for a baseline.json payload with the --threshold / --agg overrides applied."""
+    threshold = float(cfg["threshold"]) if args.threshold is None else float(args.threshold)
+    agg = cfg.get("agg", "max") if args.agg is None else args.agg
+    if engine == "lite":
+        from sensad.lite import lite_from_config
+
+        model = lite_from_config(cfg)
+        model.threshold, model.agg = threshold, agg
+        return model
+    from sensad.models import model_from_config
+
+    # baseline_robust_z, rolling_robust_z or autoencoder (optionally behind rolling features);
+    # stateful scorers keep their context across blocks
+    spec = model_from_config(cfg, base=base)
+    spec.threshold, spec.agg = threshold, agg
+    return spec.compile()
+
+def make_capture(args, columns: list, times, time_kind=None, counter=None):
+    """ContextCapture for --context-dir (None without it); snapshots are logged to stderr."""
+    if not args.context_dir:
+        return None
+    from sensad.context import ContextCapture
+
+    def logged(path, n):
+        if counter is not None:
+            counter.inc()
+        print(f"context: wrote {path} ({n} rows)", file=sys.stderr, flush=True)
+
+    return ContextCapture(columns, args.context_pre, args.context_post, args.context_dir, fmt=args.context_format,
+                          max_rows=args.context_max_rows, times=times, time_kind=time_kind, on_write=logged)
+
+def make_stage(args, write, metrics, m_write, m_latency):
+    """OutputStage (sensad.overload) running `write(blocks)` on the writer thread, with its metrics."""
+    from sensad.overload import OutputStage
+
+    if not metrics.enabled:
+        return OutputStage(write, args.queue_rows, args.overload, args.sample_every)
+    clock = time.perf_counter
+    m_drop = metrics.counter("rows_dropped_total", "Normal rows dropped by the --overload policy")
+    m_wait = metrics.counter("output_wait_seconds_total", "Time scoring waited for room in the output queue")
+
+    def timed_write(blocks):
+        t = clock()
+        write(blocks)
+        m_write.observe(clock() - t)
+
+    def written(block):
+        m_latency.observe(clock() - block.t_in)
+        m_drop.value, m_wait.value = stage.dropped, stage.blocked_s
+
+    stage = OutputStage(timed_write, args.queue_rows, args.overload, args.sample_every, written)
+    metrics.gauge("output_queue_rows", "Scored rows waiting for the writer thread", fn=lambda: stage.rows)
+    return stage
+
+def close_stage(stage) -> None:
+    stage.close()
+    if stage.dropped:
+        print(f"overload: dropped {stage.dropped} normal rows (--overload {stage.policy}), "
+              f"waited {stage.blocked_s:.2f}s for the writer", file=sys.stderr, flush=True)
+
+class Handover:
+    """
+    A reloaded model waiting for its swap. A stateful one (rolling, AE, features) first
+    scores the same batches as the running model, output discarded, until its window
+    is full: swapped in cold, it would restart warm-up in the middle of the stream.
+    """
+
+    def __init__(self, model, version: str, max_batch: int, log):
+        from sensad.reload import warmup_rows
+
+        self.model, self.version = model, version
+        self.need = warmup_rows(model)
+        self.seen = 0
+        self._out, self._work = model.workspace(max_batch) if self.need else (None, None)
+        if self.need:
+            log(f"reload: model version {version} is stateful: warming its window on the next "
+                f"{self.need} rows before the swap")
+
+    @property
+    def ready(self) -> bool:
+        return self.seen >= self.need
+
+    def feed(self, X) -> None:
+        """Advances the new model's window with a batch the running model just scored."""
+        if self.seen < self.need:
+            self.model.score(X, out=self._out, work=self._work)
+            self.seen += len(X)
+
+    def note(self) -> str:
+        return f" after warming its window on {self.seen} rows" if self.need else ""
+
+def run_binary(args, model, columns: list, threshold: float, max_batch: int, events: bool, timed: bool, stages: tuple,
+               metrics, watcher, m_reload):
+    """--wire binary: frames from sensad.wire are read straight into float32 batches."""
+    import numpy as np
+    from sensad.wire import BatchWriter, LazyTimes, format_times, iter_batches, read_header
+
+    try:
+        schema = read_header(sys.stdin.fileno())
+    except ValueError as e:
+        raise SystemExit(str(e))
+    names, kind = schema["columns"], schema.get("time")
+    missing = [c for c in columns if c not in names]
+    if missing:
+        raise SystemExit(f"Missing columns in stream: {missing}")
+    idx = [names.index(c) for c in columns]
+    gather = idx != list(range(len(names)))
+    m_parse, m_score, m_write, m_latency, m_batch, m_rows, m_anom, m_ctx = stages
+    capture = make_capture(args, columns, "wire" if kind else None, kind, m_ctx)
+
+    out = sys.stdout.buffer
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    extra = ["model_version"] if args.version_column else []
+    if events:
+        from sensad.events import EVENT_COLUMNS, EventTracker, event_cells, predict_with_z
+
+        tracker = EventTracker(getattr(model, "channels", columns), gap=args.event_gap)
+        work = model.workspace(max_batch)[1]
+        writer.writerow(EVENT_COLUMNS + extra)
+    else:
+        out_s, work = model.workspace(max_batch)
+        if args.wire_out == "binary":
+            bw = BatchWriter(out, names + ["anomaly_score", "is_anomaly"], kind)
+        else:
+            writer.writerow((["time"] if kind else []) + names + ["anomaly_score", "is_anomaly"] + extra)
+    out.write(buf.getvalue().encode("utf-8"))
+    out.flush()
+
+    def write(blocks):
+        # writer thread: rendering and stdout backpressure stay off the scoring loop
+        buf.seek(0)
+        buf.truncate()
+        for b in blocks:
+            ver = [b.tag] if extra else []
+            if events:
+                writer.writerows(event_cells(ev) + ver for ev in b.fields[0])
+                continue
+            tm, X, score = b.fields
+            if args.wire_out == "binary":
+                bw.write(tm, np.column_stack([X, score, b.flags]))
+            else:
+                buf.write(format_rows(X, score, b.flags, None if tm is None else format_times(tm, kind),
+                                      "".join("," + v for v in ver)))
+        if buf.tell():
+            out.write(buf.getvalue().encode("utf-8"))
+        out.flush()
+
+    stage = make_stage(args, write, metrics, m_write, m_latency)
+    clock = time.perf_counter
+    t0 = 0.0
+    version = watcher.version
+    pending = None
+    try:
+        for times, X in iter_batches(sys.stdin.fileno(), schema, max_batch, args.max_wait_ms / 1000.0):
+            new = watcher.take()
+            if new is not None:
+                # a newer version replaces one still warming up
+                pending = Handover(*new, max_batch, watcher.log)
+            if pending is not None and pending.ready:
+                # swap between batches: this batch and the following ones use the new version
+                model, threshold = pending.model, pending.model.threshold
+                watcher.activate(pending.version, pending.note())
+                pending = None
+                m_reload.inc()
+                if events:
+                    work = model.workspace(max_batch)[1]
+                    channels = list(getattr(model, "channels", columns))
+                    if channels != tracker.columns:
+                        # an open event was measured on the old channels: it ends here
+                        ends = tracker.flush()
+                        stage.put((ends,), None, len(ends), clock(), version)
+                        tracker.columns = channels
+                else:
+                    out_s, work = model.workspace(max_batch)
+            version = watcher.version
+            if timed:
+                t0 = clock()
+            Xm = X[:, idx] if gather else X
+            if timed:
+                t1 = clock()
+            if events:
+                score, pred, Z = predict_with_z(model, Xm, work)
+                closed = tracker.update(score, pred, Z, None if times is None else LazyTimes(times, kind))
+                flags = pred.astype(bool)
+            else:
+                score = model.score(Xm, out=out_s, work=work)
+                flags = score >= threshold
+            if capture is not None:
+                capture.update(Xm, times, score, flags)
+            if pending is not None:
+                pending.feed(Xm)
+            if timed:
+                t2 = clock()
+
+            if events:
+                stage.put((closed,), None, len(closed), t0, version)
+            elif args.only_anomalies:
+                stage.put((None if times is None else times[flags], X[flags], score[flags]), flags[flags],
+                          int(flags.sum()), t0, version)
+            else:
+                # the score buffer is reused by the next batch: queue a copy
+                stage.put((times, X, score.copy()), flags, len(X), t0, version)
+            if timed:
+                m_parse.observe(t1 - t0)
+                m_score.observe(t2 - t1)
+                m_batch.observe(len(X))
+                m_rows.inc(len(X))
+                m_anom.inc(int(flags.sum()))
+        if events:
+            ends = tracker.flush()
+            stage.put((ends,), None, len(ends), clock(), version)
+        if capture is not None:
+            capture.close()
+    finally:
+        close_stage(stage)
 
 def main():
     ap = argparse.ArgumentParser(description="Edge stream anomaly scoring (reads CSV from stdin)")
-    ap.add_argument("--baseline", required=True, help="Path to baseline.json")
+    ap.add_argument("--baseline", default=None, help="Path to baseline.json")
+    ap.add_argument("--registry", default=None, help="Per-device models: folder of run folders or JSON {device: run}")
+    ap.add_argument("--device-column", default=None, help="Column with the device id used to route rows (with --registry)")
+    ap.add_argument("--cache-size", type=int, default=64, help="Max models kept loaded (LRU) with --registry")
     ap.add_argument("--threshold", type=float, default=None, help="Override threshold")
     ap.add_argument("--agg", choices=["max", "mean"], default=None, help="Override aggregation")
     ap.add_argument("--only-anomalies", action="store_true", help="Print only anomalous rows")
+    ap.add_argument("--max-batch", type=int, default=1, help="Score up to N rows per vectorized call")
+    ap.add_argument("--max-wait-ms", type=float, default=0.0, help="Max time a row waits for its batch to fill")
+    ap.add_argument("--engine", choices=["auto", "numpy", "lite"], default="auto",
+                    help="numpy kernel, or pure-stdlib 'lite' scorer (fastest start; auto = numpy if installed)")
+    ap.add_argument("--output", choices=["rows", "events"], default="rows",
+                    help="rows: every row + score; events: one line per anomaly event, emitted when it ends")
+    ap.add_argument("--event-gap", type=int, default=0, help="Merge events separated by at most N normal rows")
+    ap.add_argument("--wire", choices=["text", "binary"], default="text",
+                    help="stdin format: CSV lines, or binary frames from `sensad stream --wire binary`")
+    ap.add_argument("--wire-out", choices=["csv", "binary"], default="csv",
+                    help="stdout format for scored rows with --wire binary (binary = frames with score/flag columns)")
+    ap.add_argument("--context-dir", default="", help="Write raw-data snapshots around anomalies to this folder")
+    ap.add_argument("--context-pre", type=int, default=300, help="Rows before the first flagged row in a snapshot")
+    ap.add_argument("--context-post", type=int, default=300, help="Rows after the last flagged row in a snapshot")
+    ap.add_argument("--context-format", choices=["npz", "parquet"], default="npz", help="Snapshot file format")
+    ap.add_argument("--context-max-rows", type=int, default=0,
+                    help="Rows buffered per snapshot file; longer captures are split (0 = 2*(pre+post+1))")
+    ap.add_argument("--overload", choices=["block", "drop-normal", "sample"], default="block",
+                    help="When the output queue is full: wait for the writer, drop normal rows (oldest first), "
+                         "or keep 1 in --sample-every normal rows; anomalies are never dropped")
+    ap.add_argument("--queue-rows", type=int, default=65536,
+                    help="Scored rows queued for the writer thread (0 = write synchronously)")
+    ap.add_argument("--sample-every", type=int, default=10, help="Keep every Nth normal row with --overload sample")
+    ap.add_argument("--reload-interval", type=float, default=5.0,
+                    help="Seconds between checks of the model artifact(s) for a new version (0 = no hot reload); "
+                         "a stateful model is swapped in once its window is warm")
+    ap.add_argument("--version-column", action="store_true",
+                    help="Append a model_version column (content hash of the baseline.json that scored the row)")
+    ap.add_argument("--metrics-port", type=int, default=0, help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    ap.add_argument("--metrics-file", default="", help="Write Prometheus metrics to this file periodically")
+    ap.add_argument("--metrics-interval", type=float, default=5.0, help="Seconds between --metrics-file writes")
     args = ap.parse_args()
 
-    cfg = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
-    columns = cfg["columns"]
-    med = {k: float(v) for k, v in cfg["med"].items()}
-    mad = {k: float(v) for k, v in cfg["mad"].items()}
-    threshold = float(cfg["threshold"]) if args.threshold is None else float(args.threshold)
-    agg = cfg.get("agg", "max") if args.agg is None else args.agg
+    engine = args.engine
+    if engine == "auto":
+        engine = "numpy" if _have_numpy() else "lite"
+    events = args.output == "events"
+    if events and (args.registry or engine == "lite"):
+        raise SystemExit("--output events needs --baseline and the numpy engine (it reports the top |z| sensor)")
+    binary = args.wire == "binary"
+    if binary and (args.registry or engine == "lite"):
+        raise SystemExit("--wire binary needs --baseline and the numpy engine (frames carry float32 sensors only)")
+    if args.wire_out == "binary" and (not binary or events):
+        raise SystemExit("--wire-out binary needs --wire binary and --output rows")
+    if args.context_dir and (args.registry or engine == "lite"):
+        raise SystemExit("--context-dir needs --baseline and the numpy engine (snapshots are numpy arrays)")
+
+    if args.overload != "block" and args.queue_rows <= 0:
+        raise SystemExit("--overload drop-normal/sample needs an output queue (--queue-rows > 0)")
+    if args.sample_every < 1:
+        raise SystemExit("--sample-every must be >= 1")
+    if args.version_column and (args.registry or args.wire_out == "binary"):
+        raise SystemExit("--version-column needs --baseline and CSV output")
+
+    registry = None
+    if args.registry:
+        if not args.device_column:
+            raise SystemExit("--registry requires --device-column")
+        if engine == "lite":
+            raise SystemExit("--registry needs numpy (use --engine numpy)")
+        from sensad.registry import ModelRegistry
+
+        # the registry re-stats each device's artifact itself
+        check = args.reload_interval if args.reload_interval > 0 else float("inf")
+        registry = ModelRegistry(args.registry, capacity=args.cache_size, check_interval=check,
+                                 threshold=args.threshold, agg=args.agg)
+        columns = []
+    elif args.baseline:
+        from sensad.reload import read_artifact
+
+        cfg, version = read_artifact(args.baseline)
+        columns = cfg["columns"]
+        base = Path(args.baseline).parent
+        try:
+            model = build_model(cfg, base, engine, args)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        threshold = model.threshold
+    else:
+        raise SystemExit("Provide --baseline or --registry")
+
+    max_batch = max(1, args.max_batch)
+    # no-op objects unless --metrics-port / --metrics-file is given
+    metrics = make_metrics(args.metrics_port, args.metrics_file, args.metrics_interval)
+    timed = metrics.enabled
+    m_rows = metrics.counter("rows_total", "Rows scored")
+    m_anom = metrics.counter("anomalies_total", "Rows flagged as anomalous")
+    m_parse = metrics.histogram("stage_seconds", "Time per batch in each stage", stage="parse")
+    m_score = metrics.histogram("stage_seconds", "Time per batch in each stage", stage="score")
+    m_write = metrics.histogram("stage_seconds", "Time per batch in each stage", stage="write")
+    m_latency = metrics.histogram("batch_latency_seconds", "From batch received to its output flushed (incl. output queue)")
+    m_batch = metrics.histogram("batch_rows", "Rows per batch", buckets=SIZE_BUCKETS)
+    metrics.rate("rows_per_second", m_rows, "Rows scored per second since the previous scrape")
+    metrics.gauge("anomaly_ratio", "Fraction of rows flagged", fn=lambda: m_anom.value / max(1, m_rows.value))
+    m_ctx = metrics.counter("context_snapshots_total", "Context snapshot files written")
+    m_reload = metrics.counter("model_reloads_total", "New model versions swapped in")
+    m_reject = metrics.counter("model_reload_errors_total", "Model versions rejected (unreadable or column mismatch)")
+
+    watcher = None
+    if registry is None:
+        from sensad.reload import ModelWatcher
+
+        # new versions are built and checked on the watcher thread; the loop swaps between batches
+        watcher = ModelWatcher(args.baseline, lambda c: build_model(c, base, engine, args), version,
+                               interval=args.reload_interval, columns=columns, on_reject=lambda v, e: m_reject.inc())
+
+    if binary:
+        try:
+            run_binary(args, model, columns, threshold, max_batch, events, timed,
+                       (m_parse, m_score, m_write, m_latency, m_batch, m_rows, m_anom, m_ctx), metrics, watcher, m_reload)
+        finally:
+            watcher.close()
+            metrics.close()
+        return
 
-    reader = csv.DictReader(sys.stdin)
-    if reader.fieldnames is None:
+    batches = iter_line_batches(sys.stdin.fileno(), max_batch=max_batch, max_wait_s=args.max_wait_ms / 1000.0)
+
+    # header = first non-empty line
+    fieldnames = None
+    carry: list = []
+    for lines in batches:
+        while lines and not lines[0]:
+            lines = lines[1:]
+        if lines:
+            fieldnames = next(csv.reader(lines[:1]))
+            carry = lines[1:]
+            break
+    if fieldnames is None:
         raise SystemExit("No CSV header received on stdin.")
 
-    missing = [c for c in columns if c not in reader.fieldnames]
+    if registry is not None and args.device_column not in fieldnames:
+        raise SystemExit(f"Missing device column in stream: {args.device_column}")
+    missing = [c for c in columns if c not in fieldnames]
     if missing:
         raise SystemExit(f"Missing columns in stream: {missing}")
+    idx = [fieldnames.index(c) for c in columns]
+    width = len(fieldnames)
+    ti = fieldnames.index("time") if "time" in fieldnames else -1
+    capture = make_capture(args, columns, "text" if ti >= 0 else None, counter=m_ctx)
+
+    def matrix(rows: list, cols: list):
+        missing = [c for c in cols if c not in fieldnames]
+        if missing:
+            raise SystemExit(f"Missing columns in stream: {missing}")
+        return parse_block(rows, [fieldnames.index(c) for c in cols])
+
+    # parse_rows: csv rows -> model input; score_rows: model input -> (scores, flags)
+    if registry is not None:
+        dev_idx = fieldnames.index(args.device_column)
+
+        def parse_rows(rows: list):
+            return rows, [r[dev_idx] if dev_idx < len(r) else "" for r in rows]
+
+        def score_rows(parsed):
+            # rows of each device are scored together with that device's model
+            rows, devices = parsed
+            score, pred = registry.predict_grouped(devices, lambda cols: matrix(rows, cols))
+            return score.tolist(), pred.astype(bool).tolist()
+    elif engine == "lite":
+        from sensad.lite import parse_cells
+
+        def parse_rows(rows: list):
+            return parse_cells(rows, idx)
+
+        def score_rows(X):
+            return model.score_rows(X)
+    elif events:
+        from sensad.events import EVENT_COLUMNS, EventTracker, event_cells, predict_with_z
+
+        work = model.workspace(max_batch)[1]
+        tracker = EventTracker(getattr(model, "channels", columns), gap=args.event_gap)
+        closed: list = []
+
+        def parse_rows(rows: list):
+            times = [r[ti] if ti < len(r) else "" for r in rows] if ti >= 0 else None
+            return parse_block(rows, idx), times
+
+        def score_rows(parsed):
+            # events that end in this batch are collected for the write stage
+            X, times = parsed
+            score, pred, Z = predict_with_z(model, X, work)
+            closed.extend(tracker.update(score, pred, Z, times))
+            if capture is not None:
+                capture.update(X, times, score, pred)
+            return score.tolist(), pred.astype(bool).tolist()
+    else:
+        out, work = model.workspace(max_batch)
+
+        def parse_rows(rows: list):
+            # time cells are only needed for context snapshots
+            times = [r[ti] if ti < len(r) else "" for r in rows] if capture is not None and ti >= 0 else None
+            return parse_block(rows, idx), times
+
+        def score_rows(parsed):
+            X, times = parsed
+            score = model.score(X, out=out, work=work)
+            flags = score >= threshold
+            if capture is not None:
+                capture.update(X, times, score, flags)
+            return score.tolist(), flags.tolist()
 
     # Output header
-    out_fields = list(reader.fieldnames) + ["anomaly_score", "is_anomaly"]
-    writer = csv.DictWriter(sys.stdout, fieldnames=out_fields)
-    writer.writeheader()
-
-    for row in reader:
-        zs = []
-        for c in columns:
-            try:
-                x = float(row[c])
-            except Exception:
-                x = float("nan")
-            z = robust_z(x, med[c], mad[c])
-            zs.append(abs(z))
-
-        if agg == "mean":
-            score = float(np.mean(zs))
-        else:
-            score = float(np.max(zs))
+    extra = ["model_version"] if args.version_column else []
+    out_fields = (EVENT_COLUMNS if events else list(fieldnames) + ["anomaly_score", "is_anomaly"]) + extra
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(out_fields)
+    sys.stdout.write(buf.getvalue())
+    sys.stdout.flush()
+
+    def write(blocks):
+        # writer thread: one buffered write + flush per burst (stdout backpressure shows up here)
+        buf.seek(0)
+        buf.truncate()
+        for b in blocks:
+            ver = [b.tag] if extra else []
+            if events:
+                writer.writerows(event_cells(ev) + ver for ev in b.fields[0])
+                continue
+            rows, score = b.fields
+            for r, sc, is_anom in zip(rows, score, b.flags):
+                if len(r) != width:
+                    r = (r + [""] * width)[:width]
+                writer.writerow(r + [f"{sc:.6f}", "1" if is_anom else "0"] + ver)
+        if buf.tell():
+            sys.stdout.write(buf.getvalue())
+            sys.stdout.flush()
+
+    stage = make_stage(args, write, metrics, m_write, m_latency)
 
-        is_anom = 1 if score >= threshold else 0
+    def blocks():
+        if carry:
+            yield carry
+        yield from batches
 
-        if args.only_anomalies and not is_anom:
-            continue
+    clock = time.perf_counter
+    t0 = 0.0
+    version = None if watcher is None else watcher.version
+    pending = None
+    try:
+        for lines in blocks():
+            new = None if watcher is None else watcher.take()
+            if new is not None:
+                # a newer version replaces one still warming up
+                pending = Handover(*new, max_batch, watcher.log)
+            if pending is not None and pending.ready:
+                # swap between batches; the scoring closures read these names
+                model, threshold = pending.model, pending.model.threshold
+                watcher.activate(pending.version, pending.note())
+                pending = None
+                m_reload.inc()
+                if events:
+                    work = model.workspace(max_batch)[1]
+                    channels = list(getattr(model, "channels", columns))
+                    if channels != tracker.columns:
+                        # an open event was measured on the old channels: it ends here
+                        ends = tracker.flush()
+                        stage.put((ends,), None, len(ends), clock(), version)
+                        tracker.columns = channels
+                elif engine != "lite":
+                    out, work = model.workspace(max_batch)
+                version = watcher.version
+            if timed:
+                t0 = clock()
+            rows = [r for r in csv.reader(lines) if r]
+            if not rows:
+                continue
+            parsed = parse_rows(rows)
+            if timed:
+                t1 = clock()
+            score, flags = score_rows(parsed)
+            if pending is not None:
+                pending.feed(parsed[0])  # numpy engine only: lite models are stateless
+            if timed:
+                t2 = clock()
 
-        row_out = dict(row)
-        row_out["anomaly_score"] = f"{score:.6f}"
-        row_out["is_anomaly"] = str(is_anom)
-        writer.writerow(row_out)
-        sys.stdout.flush()
+            if events:
+                stage.put((list(closed),), None, len(closed), t0, version)
+                closed.clear()
+            elif args.only_anomalies:
+                keep = [i for i, f in enumerate(flags) if f]
+                stage.put(([rows[i] for i in keep], [score[i] for i in keep]), [True] * len(keep), len(keep), t0,
+                          version)
+            else:
+                stage.put((rows, score), flags, len(rows), t0, version)
+            if timed:
+                m_parse.observe(t1 - t0)
+                m_score.observe(t2 - t1)
+                m_batch.observe(len(rows))
+                m_rows.inc(len(rows))
+                m_anom.inc(sum(flags))
+        if events:
+            # the input ended: an event still open ends with it
+            ends = tracker.flush()
+            stage.put((ends,), None, len(ends), clock(), version)
+        if capture is not None:
+            capture.close()
+    finally:
+        try:
+            close_stage(stage)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            metrics.close()
 
 if __name__ == "__main__":
     main()
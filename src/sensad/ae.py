@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .baseline import EPS, aggregate, fit_baseline, param_array, weight_array
+
+# torch is needed to train and export; scoring runs on the numpy forward pass below
+# (or on an exported TorchScript/ONNX file), so a trained run loads without torch.
+
+RUNTIMES = ("numpy", "torch", "torchscript", "onnx")
+EXPORT_FILES = {"torchscript": "ae.torchscript.pt", "onnx": "ae.onnx"}
+
+Layers = List[Tuple[np.ndarray, np.ndarray]]  # [(W (out, in), b (out,)), ...]; ReLU between layers
+
+def _torch():
+    try:
+        import torch
+    except ImportError as e:
+        raise ImportError("The autoencoder needs PyTorch to train/export (pip install torch)") from e
+    return torch
+
+def _onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("ONNX inference needs onnxruntime (pip install onnxruntime)") from e
+    return onnxruntime
+
+def encode_array(a: np.ndarray) -> dict:
+    a = np.ascontiguousarray(a, dtype=np.float32)
+    return {"shape": list(a.shape), "data": base64.b64encode(a.tobytes()).decode("ascii")}
+
+def decode_array(obj: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(obj["data"]), dtype=np.float32).reshape(obj["shape"]).copy()
+
+def score_layers(layers: Layers, d: int) -> Layers:
+    """The scoring net: same weights, last layer cut to the newest row of the window."""
+    W, b = layers[-1]
+    return layers[:-1] + [(np.ascontiguousarray(W[-d:]), b[-d:].copy())]
+
+def numpy_forward(layers: Layers) -> Callable[[np.ndarray], np.ndarray]:
+    Wt = [np.ascontiguousarray(W.T, dtype=np.float32) for W, _ in layers]
+    bs = [np.asarray(b, dtype=np.float32) for _, b in layers]
+    last = len(layers) - 1
+
+    def forward(H: np.ndarray) -> np.ndarray:
+        for i, (W, b) in enumerate(zip(Wt, bs)):
+            H = H @ W
+            H += b
+            if i < last:
+                np.maximum(H, 0.0, out=H)
+        return H
+
+    return forward
+
+def torch_module(layers: Layers):
+    """nn.Sequential of Linear/ReLU carrying `layers` (float32, CPU)."""
+    torch = _torch()
+    mods = []
+    for i, (W, b) in enumerate(layers):
+        lin = torch.nn.Linear(W.shape[1], W.shape[0])
+        with torch.no_grad():
+            lin.weight.copy_(torch.from_numpy(np.asarray(W, dtype=np.float32)))
+            lin.bias.copy_(torch.from_numpy(np.asarray(b, dtype=np.float32)))
+        mods.append(lin)
+        if i < len(layers) - 1:
+            mods.append(torch.nn.ReLU())
+    return torch.nn.Sequential(*mods).eval()
+
+def _torch_forward(module) -> Callable[[np.ndarray], np.ndarray]:
+    torch = _torch()
+
+    def forward(H: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            return module(torch.from_numpy(H)).numpy()
+
+    return forward
+
+def _onnx_forward(path: str) -> Callable[[np.ndarray], np.ndarray]:
+    ort = _onnxruntime()
+    sess = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    name = sess.get_inputs()[0].name
+
+    def forward(H: np.ndarray) -> np.ndarray:
+        return sess.run(None, {name: H})[0]
+
+    return forward
+
+class AEScorer:
+    """
+    Stateful scorer for an AEModel. Row t is scored on the window of the last
+    `window` rows ending at t (robust-scaled, NaN -> median); the per-sensor
+    "|z|" is |reconstruction - value| of row t, aggregated like the baseline.
+    The last window-1 rows are carried across calls (medians before the first
+    row), so any block partition gives the same scores. `forward` maps
+    (n, window*d) float32 windows to (n, d) reconstructions of the newest row.
+    """
+
+    def __init__(self, columns: List[str], med: np.ndarray, inv_scale: np.ndarray, window: int,
+                 forward: Callable[[np.ndarray], np.ndarray], threshold: float, agg: str, block: int = 8192,
+                 weights: Optional[np.ndarray] = None):
+        self.columns = list(columns)
+        self.window = int(window)
+        self.threshold = float(threshold)
+        self.agg = agg
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float32)
+        self.med = med
+        self.inv_scale = inv_scale
+        self.forward = forward
+        self.block = block
+        self._ctx = np.zeros((self.window - 1, len(self.columns)), dtype=np.float32)
+
+    def workspace(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Preallocates (out, work) buffers for blocks of up to n rows."""
+        d = len(self.columns)
+        return np.empty(n, dtype=np.float32), np.empty((n, d), dtype=np.float32)
+
+    def abs_z(self, X: np.ndarray, work: Optional[np.ndarray] = None) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        n, d = X.shape
+        w = self.window
+        E = np.empty(X.shape, dtype=np.float32) if work is None else work[:n]
+        # bounded blocks keep the (rows, window*d) window matrix small
+        for a in range(0, n, self.block):
+            b = min(n, a + self.block)
+            Z = (X[a:b] - self.med) * self.inv_scale
+            full = np.concatenate([self._ctx, np.nan_to_num(Z, nan=0.0)])
+            H = np.lib.stride_tricks.sliding_window_view(full, w, axis=0)  # (m, d, w)
+            H = np.ascontiguousarray(H.transpose(0, 2, 1)).reshape(b - a, w * d)
+            R = self.forward(H)
+            np.subtract(R, Z, out=E[a:b])
+            np.abs(E[a:b], out=E[a:b])
+            if w > 1:
+                self._ctx = full[-(w - 1):].copy()
+        return E
+
+    def score(self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None) -> np.ndarray:
+        return aggregate(self.abs_z(X, work=work), self.agg, self.weights, out)
+
+    def predict(
+        self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        score = self.score(X, out=out, work=work)
+        pred = (score >= self.threshold).astype(int)
+        return score, pred
+
+@dataclass
+class AEModel:
+    columns: List[str]
+    med: np.ndarray
+    mad: np.ndarray
+    layers: Layers = field(repr=False)
+    window: int = 16
+    threshold: float = 3.5
+    agg: str = "max"
+    # runtime used by compile(); exported files are absolute paths resolved at load
+    runtime: str = "numpy"
+    exports: Dict[str, str] = field(default_factory=dict)
+    weights: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.med = param_array(self.med, self.columns)
+        self.mad = param_array(self.mad, self.columns)
+        self.weights = weight_array(self.weights, self.columns)
+
+    def _inv_scale(self) -> np.ndarray:
+        return (1.0 / (1.4826 * self.mad + EPS)).astype(np.float32)
+
+    def compile(self, runtime: Optional[str] = None) -> AEScorer:
+        """Returns a fresh scorer (empty context) running on `runtime` (default: self.runtime)."""
+        rt = runtime or self.runtime
+        layers = score_layers(self.layers, len(self.columns))
+        if rt == "numpy":
+            forward = numpy_forward(layers)
+        elif rt == "torch":
+            forward = _torch_forward(torch_module(layers))
+        elif rt in ("torchscript", "onnx"):
+            path = self.exports.get(rt)
+            if not path or not Path(path).exists():
+                raise FileNotFoundError(f"No {rt} export for this model; run `sensad export --format {rt}` first")
+            forward = _torch_forward(_torch().jit.load(path)) if rt == "torchscript" else _onnx_forward(path)
+        else:
+            raise ValueError(f"Unknown runtime: {rt} (expected one of {RUNTIMES})")
+        return AEScorer(
+            columns=self.columns,
+            med=self.med.astype(np.float32),
+            inv_scale=self._inv_scale(),
+            window=self.window,
+            forward=forward,
+            threshold=self.threshold,
+            agg=self.agg,
+            weights=self.weights,
+        )
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        return self.compile().score(X)
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.compile().predict(X)
+
+def init_layers(n_in: int, hidden: int, latent: int, seed: int = 0) -> Layers:
+    """He-initialised encoder/decoder: n_in -> hidden -> latent -> hidden -> n_in."""
+    rng = np.random.default_rng(seed)
+    sizes = [n_in, hidden, latent, hidden, n_in]
+    return [
+        (rng.normal(0, np.sqrt(2.0 / a), size=(b, a)).astype(np.float32), np.zeros(b, dtype=np.float32))
+        for a, b in zip(sizes[:-1], sizes[1:])
+    ]
+
+def _windows(Z: np.ndarray, w: int) -> np.ndarray:
+    # (n-w+1, w*d) time-major windows, as the scorer builds them
+    H = np.lib.stride_tricks.sliding_window_view(Z, w, axis=0).transpose(0, 2, 1)
+    return np.ascontiguousarray(H).reshape(H.shape[0], -1)
+
+def fit_ae(
+    X: np.ndarray,
+    columns: List[str],
+    window: int = 16,
+    hidden: int = 64,
+    latent: int = 8,
+    epochs: int = 10,
+    batch_size: int = 256,
+    lr: float = 1e-3,
+    max_windows: int = 200_000,
+    device: str = "cpu",
+    seed: int = 0,
+    agg: str = "max",
+) -> AEModel:
+    """
+    Trains a dense autoencoder on windows of robust-scaled rows (median/MAD from the
+    baseline fit). The threshold is fit separately, as for the other models.
+    """
+    torch = _torch()
+    if len(X) < window:
+        raise ValueError(f"Need at least window={window} rows to train the autoencoder, got {len(X)}")
+    bm = fit_baseline(X, columns=columns, agg=agg)
+    model = AEModel(columns=list(columns), med=bm.med, mad=bm.mad, layers=[], window=int(window), agg=agg)
+    med = bm.med.astype(np.float32)
+    Z = np.nan_to_num((np.asarray(X, dtype=np.float32) - med) * model._inv_scale(), nan=0.0)
+    H = _windows(Z, window)
+    rng = np.random.default_rng(seed)
+    if len(H) > max_windows:
+        H = H[np.sort(rng.choice(len(H), max_windows, replace=False))]
+
+    torch.manual_seed(seed)
+    dev = torch.device(device)
+    net = torch_module(init_layers(H.shape[1], hidden, latent, seed)).train().to(dev)
+    opt = torch.optim.Adam(net.parameters(), lr=lr)
+    data = torch.from_numpy(H).to(dev)
+    for _ in range(max(1, epochs)):
+        for idx in torch.randperm(len(data), device=dev).split(batch_size):
+            xb = data[idx]
+            loss = torch.nn.functional.mse_loss(net(xb), xb)
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+
+    lins = [m for m in net.cpu().eval() if isinstance(m, torch.nn.Linear)]
+    model.layers = [(m.weight.detach().numpy().copy(), m.bias.detach().numpy().copy()) for m in lins]
+    return model
+
+def export_model(model: AEModel, format: str, path: Path) -> Path:
+    """Writes the scoring net ((n, window*d) -> (n, d)) as TorchScript or ONNX."""
+    torch = _torch()
+    d = len(model.columns)
+    net = torch_module(score_layers(model.layers, d))
+    example = torch.zeros(2, model.window * d)
+    if format == "torchscript":
+        with torch.inference_mode():
+            torch.jit.trace(net, example).save(str(path))
+    elif format == "onnx":
+        torch.onnx.export(
+            net, (example,), str(path), input_names=["window"], output_names=["recon"],
+            dynamic_axes={"window": {0: "n"}, "recon": {0: "n"}}, opset_version=17, dynamo=False,
+        )
+    else:
+        raise ValueError(f"Unknown export format: {format} (expected torchscript|onnx)")
+    return path
+
+def ae_to_config(model: AEModel) -> dict:
+    return {
+        "window": model.window,
+        "layers": [{"weight": encode_array(W), "bias": encode_array(b)} for W, b in model.layers],
+        "runtime": model.runtime,
+        "exports": {k: Path(v).name for k, v in model.exports.items()},
+    }
+
+def ae_from_config(cfg: dict, common: dict, base: Optional[Path] = None) -> AEModel:
+    base = Path(base) if base is not None else Path(".")
+    return AEModel(
+        window=int(cfg["window"]),
+        layers=[(decode_array(L["weight"]), decode_array(L["bias"])) for L in cfg["layers"]],
+        runtime=cfg.get("runtime", "numpy"),
+        exports={k: str(base / v) for k, v in cfg.get("exports", {}).items()},
+        **common,
+    )
@@ -1,69 +1,209 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import List, Optional, Tuple
 import numpy as np
 
+from .sketch import QuantileSketch
+
 EPS = 1e-12
 
-def _median(x: np.ndarray) -> float:
-    return float(np.nanmedian(x))
+# columns per block in fit_baseline: the block is copied once (~64 MB at most)
+_BLOCK_BYTES = 64 << 20
+
+def param_array(values, columns: List[str]) -> np.ndarray:
+    """
+    Per-sensor parameters as a float64 array in `columns` order. Accepts arrays
+    and lists, and (older artifacts, hand-written configs) dicts keyed by column.
+    """
+    if isinstance(values, dict):
+        return np.array([float(values[c]) for c in columns], dtype=np.float64)
+    a = np.asarray(values, dtype=np.float64)
+    if a.shape != (len(columns),):
+        raise ValueError(f"expected {len(columns)} per-sensor values, got shape {a.shape}")
+    return a
 
-def _mad(x: np.ndarray) -> float:
-    # Median Absolute Deviation
-    med = np.nanmedian(x)
-    return float(np.nanmedian(np.abs(x - med)))
+def weight_array(values, columns: List[str]) -> Optional[np.ndarray]:
+    """param_array for the optional per-sensor weights (None stays None)."""
+    return None if values is None else param_array(values, columns)
 
-def _robust_z(x: np.ndarray, med: float, mad: float) -> np.ndarray:
-    # 1.4826 makes MAD comparable to std for normal dist
-    denom = 1.4826 * mad + EPS
-    return (x - med) / denom
+def parse_agg(agg: str) -> int:
+    """
+    Validates an aggregation: "max", "mean" or "top<k>" (mean of the k largest |z|
+    per row, e.g. "top3"). Returns k for top-k, 0 otherwise.
+    """
+    if agg in ("max", "mean"):
+        return 0
+    if agg.startswith("top") and agg[3:].isdigit() and int(agg[3:]) > 0:
+        return int(agg[3:])
+    raise ValueError(f"Unknown aggregation '{agg}' (expected max, mean or top<k>, e.g. top3)")
+
+def aggregate(Z: np.ndarray, agg: str, weights: Optional[np.ndarray] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Row scores from |z| (n, d). With per-sensor `weights`, Z is scaled in place
+    first (callers that keep Z, e.g. events, then see the weighted values).
+    """
+    n, d = Z.shape
+    s = np.empty(n, dtype=np.float32) if out is None else out[:n]
+    if weights is not None:
+        np.multiply(Z, weights, out=Z)
+    k = parse_agg(agg)
+    if agg == "mean" or k >= d:
+        np.mean(Z, axis=1, out=s)
+    elif agg == "max" or k == 1:
+        np.max(Z, axis=1, out=s)
+    else:
+        # NaN sorts last, so a row with a missing sensor stays NaN (as with max/mean)
+        np.mean(np.partition(Z, d - k, axis=1)[:, d - k:], axis=1, out=s)
+    return s
+
+def _select_median(B: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Row medians of B (k, n) where row i has its `valid[i]` values first after NaN
+    -> +inf; partitions B in place (no sort). Rows are grouped by valid count, so
+    each group is one np.partition call. Empty rows give NaN.
+    """
+    med = np.full(len(B), np.nan, dtype=B.dtype)
+    for m in np.unique(valid):
+        if m == 0:
+            continue
+        rows = np.flatnonzero(valid == m)
+        lo, hi = (m - 1) // 2, m // 2
+        P = B[rows] if len(rows) < len(B) else B
+        # one selection: for even counts the lower middle is the max left of `hi`
+        # (a second kth in the same partition call costs several times more)
+        P.partition(hi, axis=1)
+        if lo == hi:
+            med[rows] = P[:, hi]
+        else:
+            # same arithmetic as np.nanmedian: mean of the two middle values
+            med[rows] = (P[:, :hi].max(axis=1) + P[:, hi]) / 2
+    return med
+
+@dataclass
+class CompiledBaseline:
+    """
+    Scoring kernel for a BaselineModel.
+    Holds med and 1/(1.4826*mad+eps) as contiguous float32 vectors so an (n, d)
+    block is scored in one broadcast pass. Pass out=/work= buffers to reuse
+    memory across calls (they may be larger than the block; views are returned).
+    """
+    columns: List[str]
+    med: np.ndarray        # (d,) float32
+    inv_scale: np.ndarray  # (d,) float32
+    threshold: float = 3.5
+    agg: str = "max"
+    weights: Optional[np.ndarray] = None  # (d,) float32 per-sensor |z| weights
+
+    def workspace(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Preallocates (out, work) buffers for blocks of up to n rows."""
+        d = len(self.columns)
+        return np.empty(n, dtype=np.float32), np.empty((n, d), dtype=np.float32)
+
+    def abs_z(self, X: np.ndarray, work: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        X shape: (n, d) for self.columns
+        returns |z| shape: (n, d), written into work if given
+        """
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        Z = np.empty(X.shape, dtype=np.float32) if work is None else work[:n]
+        np.subtract(X, self.med, out=Z)
+        np.multiply(Z, self.inv_scale, out=Z)
+        np.abs(Z, out=Z)
+        return Z
+
+    def score(self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        X shape: (n, d) for self.columns
+        returns score shape: (n,), higher => more anomalous
+        """
+        return aggregate(self.abs_z(X, work=work), self.agg, self.weights, out)
+
+    def predict(
+        self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        score = self.score(X, out=out, work=work)
+        pred = (score >= self.threshold).astype(int)
+        return score, pred
 
 @dataclass
 class BaselineModel:
     columns: List[str]
-    med: Dict[str, float]
-    mad: Dict[str, float]
+    # per-sensor median / MAD, float64 arrays in `columns` order
+    med: np.ndarray
+    mad: np.ndarray
     # Threshold on aggregated score
     threshold: float = 3.5
-    # How to aggregate across sensors: "max" or "mean"
+    # How to aggregate across sensors: "max", "mean" or "top<k>"
     agg: str = "max"
+    # optional per-sensor multipliers of |z| before aggregation (sensad tune)
+    weights: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.med = param_array(self.med, self.columns)
+        self.mad = param_array(self.mad, self.columns)
+        self.weights = weight_array(self.weights, self.columns)
+
+    def compile(self) -> CompiledBaseline:
+        inv_scale = (1.0 / (1.4826 * self.mad + EPS)).astype(np.float32)
+        return CompiledBaseline(
+            columns=list(self.columns),
+            med=self.med.astype(np.float32),
+            inv_scale=inv_scale,
+            threshold=float(self.threshold),
+            agg=self.agg,
+            weights=None if self.weights is None else self.weights.astype(np.float32),
+        )
 
     def score(self, X: np.ndarray) -> np.ndarray:
         """
         X shape: (n, d) for self.columns
         returns score shape: (n,), higher => more anomalous
         """
-        zs = []
-        for j, col in enumerate(self.columns):
-            med = self.med[col]
-            mad = self.mad[col]
-            z = _robust_z(X[:, j], med, mad)
-            zs.append(np.abs(z))
-        Z = np.stack(zs, axis=1)  # (n,d)
-
-        if self.agg == "mean":
-            s = np.mean(Z, axis=1)
-        else:
-            s = np.max(Z, axis=1)
-        return s
+        return self.compile().score(X)
 
     def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        score = self.score(X)
-        pred = (score >= self.threshold).astype(int)
-        return score, pred
+        return self.compile().predict(X)
 
 def fit_baseline(X: np.ndarray, columns: List[str], agg: str = "max") -> BaselineModel:
-    med = {}
-    mad = {}
-    for j, col in enumerate(columns):
-        v = X[:, j]
-        med[col] = _median(v)
-        mad[col] = _mad(v)
-        # if mad is 0 (flat sensor), keep it tiny to avoid blowups
-        if mad[col] < 1e-9:
-            mad[col] = 1e-9
-    return BaselineModel(columns=columns, med=med, mad=mad, threshold=3.5, agg=agg)
+    """
+    Per-sensor median and MAD (NaN ignored), as whole-matrix operations: blocks of
+    columns are copied once into contiguous rows (a plain memcpy for the
+    column-major matrices read_matrix returns), NaN -> +inf in place, and both
+    statistics come from np.partition instead of a sort. Same values as
+    np.nanmedian per column.
+    """
+    X = np.asarray(X)
+    if X.dtype.kind != "f":
+        X = X.astype(np.float64)
+    n, d = X.shape
+    med = np.empty(d, dtype=np.float64)
+    mad = np.empty(d, dtype=np.float64)
+    step = max(1, _BLOCK_BYTES // max(1, n * X.itemsize))
+    for a in range(0, d, step):
+        B = np.array(X[:, a:a + step].T, order="C")     # (k, n), one copy
+        nan = np.isnan(B)
+        valid = n - nan.sum(axis=1)
+        B[nan] = np.inf                                   # NaN sorts last
+        m = _select_median(B, valid)
+        np.subtract(B, m[:, None], out=B)
+        np.abs(B, out=B)                                  # inf stays last
+        med[a:a + step] = m
+        mad[a:a + step] = _select_median(B, valid)
+    # if mad is 0 (flat sensor), keep it tiny to avoid blowups
+    mad = np.where(mad < 1e-9, 1e-9, mad)
+    return BaselineModel(columns=list(columns), med=med, mad=mad, threshold=3.5, agg=agg)
+
+def fit_baseline_sketch(sketch: QuantileSketch, columns: List[str], agg: str = "max") -> BaselineModel:
+    """
+    Same parameters as fit_baseline, estimated from a (merged) QuantileSketch
+    instead of the full matrix; see QuantileSketch for the error bound.
+    """
+    med = np.asarray(sketch.median(), dtype=np.float64)
+    mad = np.asarray(sketch.mad(med), dtype=np.float64)
+    mad = np.where(mad >= 1e-9, mad, 1e-9)
+    return BaselineModel(columns=list(columns), med=med, mad=mad, threshold=3.5, agg=agg)
 
 def choose_threshold_from_train(model: BaselineModel, X_train: np.ndarray, q: float = 0.995) -> float:
     """
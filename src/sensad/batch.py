@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+from .infer import _InferMetrics, _infer_chunked, _infer_events, _infer_full, _model_scorer, _registry_scorer
+from .pipeline import TopK
+from .registry import ModelRegistry
+from .tabular import EXT, FORMATS, _SUFFIX, detect_format, iter_frames, read_frame
+from .telemetry import Metrics
+
+console = Console()
+
+SUMMARY_COLUMNS = ["file", "status", "rows", "anomalies", "anomaly_ratio", "max_score", "events", "seconds", "output", "error"]
+
+def is_multi(spec: str) -> bool:
+    """True if `spec` names several inputs (a directory or a glob pattern)."""
+    return Path(spec).is_dir() or glob.has_magic(spec)
+
+def expand_inputs(spec: str) -> List[Path]:
+    """Files of a directory (recursively, known data suffixes only), a glob, or one file."""
+    p = Path(spec)
+    if p.is_dir():
+        files = [f for f in p.rglob("*") if f.is_file() and f.suffix.lower() in _SUFFIX
+                 and not f.name.endswith(".time.npy")]  # npy timestamp sidecars
+    elif glob.has_magic(spec):
+        files = [Path(f) for f in glob.glob(spec, recursive=True) if Path(f).is_file()]
+    else:
+        files = [p]
+    return sorted(files)
+
+# --- worker side -----------------------------------------------------------------
+
+_W: Dict[str, Any] = {}
+
+def _init_worker(model, registry_args, opts):
+    # runs once per worker process: the model arrives pickled once, not per file
+    _W["model"] = model
+    _W["registry"] = ModelRegistry(**registry_args) if registry_args else None
+    _W["opts"] = opts
+
+def _summarize(score_frame, src: str, fmt: str, chunksize: int, top: TopK, m: _InferMetrics) -> int:
+    frames = iter_frames(src, chunksize, fmt=fmt) if chunksize else iter([read_frame(src, fmt=fmt)])
+    n = 0
+    for df in frames:
+        score, pred = score_frame(df)
+        m.rows.inc(len(df))
+        m.anomalies.inc(int(pred.sum()))
+        top.push(score, n)
+        n += len(df)
+    return n
+
+def _score_file(src: str, out: str) -> Dict[str, Any]:
+    """Scores one file in a worker; errors are reported in the result, not raised."""
+    opts = _W["opts"]
+    res: Dict[str, Any] = {"file": src, "output": out}
+    t0 = time.perf_counter()
+    m = _InferMetrics(Metrics())
+    top = TopK(1)
+    try:
+        fmt = detect_format(src, opts["format"])
+        chunksize, output = opts["chunksize"], opts["output"]
+        model = _W["model"]
+        # a fresh scorer per file: stateful models start each file with empty windows
+        if model is not None:
+            score_frame = _model_scorer(model, chunksize)
+        else:
+            score_frame = _registry_scorer(_W["registry"], opts["device_column"])
+        if out:
+            Path(out).parent.mkdir(parents=True, exist_ok=True)
+        if output == "events":
+            _, ev = _infer_events(model, src, fmt, Path(out), chunksize, opts["event_gap"], m)
+            res["events"] = len(ev)
+            res["max_score"] = float(ev["peak_score"].max()) if len(ev) else np.nan
+        else:
+            if output == "summary":
+                _summarize(score_frame, src, fmt, chunksize, top, m)
+            elif chunksize:
+                _infer_chunked(score_frame, src, fmt, Path(out), top, chunksize, m)
+            else:
+                _infer_full(score_frame, src, fmt, Path(out), top, m)
+            items = top.items()
+            res["max_score"] = items[0][1] if items else np.nan
+        res["status"] = "ok"
+    except Exception as e:  # one bad file must not stop the backfill
+        res["status"] = "failed"
+        res["error"] = f"{type(e).__name__}: {e}"
+    res["rows"] = int(m.rows.value)
+    res["anomalies"] = int(m.anomalies.value)
+    res["anomaly_ratio"] = res["anomalies"] / res["rows"] if res["rows"] else np.nan
+    res["seconds"] = time.perf_counter() - t0
+    return res
+
+# --- driver ----------------------------------------------------------------------
+
+def _out_path(src: Path, root: Path, out_dir: Path, output: str, format: str) -> str:
+    if output == "summary":
+        return ""
+    rel = src.relative_to(root) if root in src.parents else Path(src.name)
+    if output == "events":
+        return str(out_dir / rel.with_name(rel.stem + ".events.csv"))
+    fmt = detect_format(str(src), format) if format == "auto" else format
+    return str(out_dir / rel.with_name(rel.stem + ".pred" + EXT[fmt]))
+
+def infer_files(
+    files: List[Path],
+    out_dir: Path,
+    model=None,
+    registry_args: Optional[Dict[str, Any]] = None,
+    device_column: str = "",
+    workers: int = 1,
+    chunksize: int = 0,
+    format: str = "auto",
+    output: str = "rows",
+    event_gap: int = 0,
+) -> pd.DataFrame:
+    """
+    Scores many files with a process pool. Each worker gets the model once (pool
+    initializer); files are handed out largest first so the long ones do not end
+    up last. Writes per-file outputs (mirroring the input tree under `out_dir`,
+    unless output == "summary") and `out_dir/summary.csv`; returns the summary.
+    """
+    if format != "auto" and format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    if not files:
+        raise FileNotFoundError("No input files matched")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    root = Path(os.path.commonpath([str(f.resolve().parent) for f in files]))
+    jobs = sorted(files, key=lambda f: f.stat().st_size if f.exists() else 0, reverse=True)
+    jobs = [(str(f), _out_path(f.resolve(), root, out_dir, output, format)) for f in jobs]
+    opts = {"format": format, "chunksize": chunksize, "output": output, "event_gap": event_gap, "device_column": device_column}
+    init = (model, registry_args, opts)
+
+    t0 = time.perf_counter()
+    results = []
+    with console.status(f"scoring {len(jobs)} files with {workers} worker(s)"):
+        if workers <= 1:
+            _init_worker(*init)
+            results = [_score_file(*j) for j in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init) as ex:
+                futs = {ex.submit(_score_file, *j): j for j in jobs}
+                for fut in as_completed(futs):
+                    try:
+                        results.append(fut.result())
+                    except Exception as e:  # e.g. a worker killed by the OOM killer
+                        results.append({"file": futs[fut][0], "output": futs[fut][1], "status": "failed",
+                                        "error": f"{type(e).__name__}: {e}", "rows": 0, "anomalies": 0})
+    elapsed = time.perf_counter() - t0
+
+    summary = pd.DataFrame(results, columns=SUMMARY_COLUMNS).sort_values("file", ignore_index=True)
+    summary.to_csv(out_dir / "summary.csv", index=False)
+
+    failed = summary[summary["status"] != "ok"]
+    rows = int(summary["rows"].sum())
+    t = Table(title=f"Scored {len(summary) - len(failed)}/{len(summary)} files")
+    for c in ("files", "rows", "anomalies", "elapsed", "rows/s"):
+        t.add_column(c, justify="right")
+    t.add_row(str(len(summary)), f"{rows:,}", f"{int(summary['anomalies'].sum()):,}",
+              f"{elapsed:.2f}s", f"{rows / elapsed:,.0f}" if elapsed > 0 else "")
+    console.print(t)
+    for r in failed.head(10).itertuples():
+        err = r.error if len(r.error) <= 200 else r.error[:200] + "..."
+        console.print(f"[red]FAILED[/red] {r.file}: {err}")
+    if len(failed) > 10:
+        console.print(f"... and {len(failed) - 10} more (see summary.csv)")
+    return summary
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from .baseline import choose_threshold_from_train, fit_baseline
+from .models import model_to_config
+
+console = Console()
+
+SCORE_STREAM = Path(__file__).resolve().parents[2] / "edge" / "score_stream.py"
+
+# metric -> +1 if larger is better (throughput), -1 if smaller is better; the single
+# worst latency (max_ms) is reported but too noisy to gate on
+_DIRECTION = {"rows_per_s": 1, "peak_mb": -1, "p50_ms": -1, "p90_ms": -1, "p99_ms": -1}
+
+def _make_data(rows: int, sensors: int, seed: int) -> Tuple[np.ndarray, List[str]]:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0.0, 1.0, size=(rows, sensors)).astype(np.float32)
+    X += np.linspace(0, 50, sensors, dtype=np.float32)
+    spikes = rng.integers(0, rows, max(1, rows // 1000))
+    X[spikes, rng.integers(0, sensors, len(spikes))] += 12.0
+    return X, [f"s{j}" for j in range(sensors)]
+
+def _measure(fn: Callable[[], Any], rows: int, repeat: int) -> Dict[str, float]:
+    # best-of-N wall time, then one extra traced run for peak Python/numpy memory
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "rows_per_s": rows / best if best > 0 else 0.0, "peak_mb": peak / 2**20}
+
+def _peak_rss_mb(pid: int) -> float:
+    # VmHWM of a running process (Linux); 0.0 where /proc is unavailable
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def _bench_stream(
+    baseline_json: Path, X: np.ndarray, columns: List[str], rate: float, max_batch: int, max_wait_ms: float
+) -> Dict[str, float]:
+    """
+    Feeds rows to edge/score_stream.py through a pipe at `rate` rows/s (absolute
+    deadlines) and times each row from write to its scored line on stdout.
+    """
+    lines = [(",".join(columns) + "\n").encode()]
+    lines += [(",".join(f"{v:.5f}" for v in row) + "\n").encode() for row in X]
+    n = len(lines) - 1
+    sent = np.zeros(n)
+    recv = np.zeros(n)
+    cmd = [sys.executable, str(SCORE_STREAM), "--baseline", str(baseline_json),
+           "--max-batch", str(max_batch), "--max-wait-ms", str(max_wait_ms)]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    peak = [0.0]
+
+    def reader():
+        out = proc.stdout
+        out.readline()  # header
+        for i in range(n):
+            if not out.readline():
+                break
+            recv[i] = time.perf_counter()
+            if i % 1000 == 0 or i == n - 1:
+                peak[0] = max(peak[0], _peak_rss_mb(proc.pid))
+
+    th = threading.Thread(target=reader, daemon=True)
+    th.start()
+    proc.stdin.write(lines[0])
+    proc.stdin.flush()
+    time.sleep(0.5)  # let the scorer start before the clock runs
+    period = 1.0 / rate if rate > 0 else 0.0
+    t0 = time.perf_counter()
+    i = 0
+    while i < n:
+        now = time.perf_counter() - t0
+        j = min(n, max(i + 1, int(now / period) + 1)) if period else n
+        if period and i * period > now:
+            time.sleep(i * period - now)
+            continue
+        proc.stdin.write(b"".join(lines[1 + i:1 + j]))
+        proc.stdin.flush()
+        sent[i:j] = time.perf_counter()
+        i = j
+    proc.stdin.close()
+    th.join()
+    proc.wait()
+    elapsed = time.perf_counter() - t0
+    lat = (recv - sent)[recv > 0] * 1e3
+    if not len(lat):
+        raise RuntimeError("stream scorer produced no output")
+    return {
+        "rows": int(len(lat)),
+        "rows_per_s": len(lat) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p90_ms": float(np.percentile(lat, 90)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "max_ms": float(lat.max()),
+        "peak_mb": peak[0],
+    }
+
+def _bench_ae(X: np.ndarray, columns: List[str], repeat: int, max_batch: int, tmp: Path) -> Dict[str, Dict[str, float]]:
+    """
+    Autoencoder scoring on each runtime (numpy, eager torch, TorchScript, ONNX):
+    whole-matrix throughput and per-call latency at `max_batch` rows. Weights are
+    random (speed does not depend on them), so no training is needed; runtimes
+    whose packages are missing are skipped.
+    """
+    from .ae import EXPORT_FILES, RUNTIMES, AEModel, export_model, init_layers
+
+    bm = fit_baseline(X, columns)
+    window = 16
+    model = AEModel(columns=columns, med=bm.med, mad=bm.mad, window=window,
+                    layers=init_layers(window * len(columns), 64, 8), threshold=1e9)
+    block = X[:max_batch]
+    out: Dict[str, Dict[str, float]] = {}
+    for rt in RUNTIMES:
+        try:
+            if rt in EXPORT_FILES:
+                model.exports[rt] = str(export_model(model, rt, tmp / EXPORT_FILES[rt]))
+            scorer = model.compile(rt)
+        except ImportError as e:
+            console.print(f"[yellow]skip[/yellow] ae_{rt}: {e}")
+            continue
+        r = _measure(lambda: scorer.score(X), len(X), repeat)
+        lat = []
+        for _ in range(200):
+            t0 = time.perf_counter()
+            scorer.score(block)
+            lat.append(time.perf_counter() - t0)
+        lat = np.array(lat) * 1e3
+        r.update({"p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99))})
+        out[f"ae_{rt}"] = r
+    return out
+
+def _bench_wide(rows: int, sensors: int, repeat: int, seed: int, tmp: Path) -> Dict[str, Dict[str, float]]:
+    """
+    Wide training (thousands of channels, few rows): fit, threshold and the
+    baseline.json round trip on a column-major matrix with 1% NaN cells.
+    """
+    from .models import load_model
+
+    X, cols = _make_data(rows, sensors, seed)
+    X[np.random.default_rng(seed + 1).random(X.shape) < 0.01] = np.nan
+    X = np.asfortranarray(X)  # the layout read_matrix returns
+    out: Dict[str, Dict[str, float]] = {}
+    out["wide_fit"] = _measure(lambda: fit_baseline(X, cols), rows, repeat)
+    model = fit_baseline(X, cols)
+    out["wide_threshold"] = _measure(lambda: choose_threshold_from_train(model, X), rows, repeat)
+    path = tmp / "wide.json"
+
+    def save():
+        path.write_text(json.dumps(model_to_config(model)), encoding="utf-8")
+
+    out["wide_save"] = _measure(save, rows, repeat)
+    out["wide_load"] = _measure(lambda: load_model(path), rows, repeat)
+    out["wide_load"]["artifact_mb"] = path.stat().st_size / 2**20
+    return out
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Rows of (bench, metric, old, new, change, regressed) for metrics present in both."""
+    out = []
+    for name, new in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        for metric, sign in _DIRECTION.items():
+            if metric not in new or metric not in old or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            out.append({
+                "bench": name, "metric": metric, "old": old[metric], "new": new[metric],
+                "change": change, "regressed": sign * change < -tolerance,
+            })
+    return out
+
+def bench_main(
+    rows: int = 200_000,
+    sensors: int = 16,
+    repeat: int = 3,
+    out: str = "bench.json",
+    baseline: str = "",
+    tolerance: float = 0.2,
+    stream_rows: int = 20_000,
+    stream_rate: float = 5000.0,
+    max_batch: int = 256,
+    max_wait_ms: float = 5.0,
+    chunksize: int = 50_000,
+    seed: int = 0,
+    ae: bool = False,
+    wide_sensors: int = 0,
+    wide_rows: int = 2000,
+) -> bool:
+    """
+    Runs the benchmark suite, writes JSON to `out` and, with `baseline`, compares
+    against a stored result. Returns False if any metric regressed by more than
+    `tolerance` (relative).
+    """
+    from . import infer as infer_mod
+    import pandas as pd
+
+    X, cols = _make_data(rows, sensors, seed)
+    results: Dict[str, Dict[str, float]] = {}
+
+    console.print(f"bench: rows={rows} sensors={sensors} repeat={repeat}")
+    results["fit"] = _measure(lambda: fit_baseline(X, cols), rows, repeat)
+    model = fit_baseline(X, cols)
+    results["threshold"] = _measure(lambda: choose_threshold_from_train(model, X), rows, repeat)
+    model.threshold = choose_threshold_from_train(model, X)
+
+    kernel = model.compile()
+    buf, work = kernel.workspace(len(X))
+    results["score"] = _measure(lambda: kernel.score(X, out=buf, work=work), rows, repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        run = tmp / "run"
+        run.mkdir()
+        (run / "baseline.json").write_text(json.dumps(model_to_config(model)), encoding="utf-8")
+        data = tmp / "data.csv"
+        df = pd.DataFrame(X, columns=cols)
+        df.insert(0, "time", pd.date_range("2026-01-01", periods=rows, freq="1s"))
+        df.to_csv(data, index=False)
+        del df
+
+        quiet = infer_mod.console.quiet
+        infer_mod.console.quiet = True
+        try:
+            results["infer_csv"] = _measure(
+                lambda: infer_mod.infer_main(str(run), str(data), str(tmp / "pred.csv")), rows, repeat
+            )
+            results["infer_csv_chunked"] = _measure(
+                lambda: infer_mod.infer_main(str(run), str(data), str(tmp / "pred.csv"), chunksize=chunksize), rows, repeat
+            )
+        finally:
+            infer_mod.console.quiet = quiet
+
+        if stream_rows > 0 and SCORE_STREAM.exists():
+            results["stream"] = _bench_stream(
+                run / "baseline.json", X[:stream_rows], cols, stream_rate, max_batch, max_wait_ms
+            )
+        elif stream_rows > 0:
+            console.print(f"[yellow]skip[/yellow] stream bench: {SCORE_STREAM} not found")
+
+        if ae:
+            results.update(_bench_ae(X, cols, repeat, max_batch, tmp))
+        if wide_sensors > 0:
+            console.print(f"bench: wide rows={wide_rows} sensors={wide_sensors}")
+            results.update(_bench_wide(wide_rows, wide_sensors, repeat, seed, tmp))
+
+    report = {
+        "env": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "rows": rows, "sensors": sensors, "repeat": repeat, "stream_rows": stream_rows,
+            "stream_rate": stream_rate, "max_batch": max_batch, "max_wait_ms": max_wait_ms,
+            "chunksize": chunksize, "seed": seed, "ae": ae,
+            "wide_sensors": wide_sensors, "wide_rows": wide_rows,
+        },
+        "results": results,
+    }
+    Path(out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    t = Table(title="Benchmark")
+    t.add_column("bench")
+    t.add_column("rows/s", justify="right")
+    t.add_column("peak MB", justify="right")
+    t.add_column("latency p50/p99 ms", justify="right")
+    for name, r in results.items():
+        lat = f"{r['p50_ms']:.2f} / {r['p99_ms']:.2f}" if "p50_ms" in r else ""
+        t.add_row(name, f"{r['rows_per_s']:,.0f}", f"{r['peak_mb']:.1f}", lat)
+    console.print(t)
+    console.print(f"[green]OK[/green] wrote {out}")
+
+    if not baseline:
+        return True
+    base = json.loads(Path(baseline).read_text(encoding="utf-8"))
+    if base.get("config") != report["config"]:
+        console.print("[yellow]WARN[/yellow] baseline was recorded with a different config; comparison is indicative only")
+    rows_cmp = compare(report, base, tolerance)
+    t = Table(title=f"Compared with {baseline} (tolerance {tolerance:.0%})")
+    for c in ("bench", "metric", "old", "new", "change", "status"):
+        t.add_column(c, justify="left" if c in ("bench", "metric", "status") else "right")
+    for r in rows_cmp:
+        status = "[red]REGRESSION[/red]" if r["regressed"] else "ok"
+        t.add_row(r["bench"], r["metric"], f"{r['old']:.4g}", f"{r['new']:.4g}", f"{r['change']:+.1%}", status)
+    console.print(t)
+    n_bad = sum(r["regressed"] for r in rows_cmp)
+    if n_bad:
+        console.print(f"[red]FAIL[/red] {n_bad} metric(s) regressed by more than {tolerance:.0%}")
+    return n_bad == 0
@@ -1,70 +1,235 @@
 from __future__ import annotations
 
 import typer
-from rich.console import Console
 
-from .synth import synth_main
-from .train import train_main
-from .eval import eval_main
-from .export import export_main
-from .infer import infer_main
-from .stream import stream_main
+# Subcommand modules (and pandas/numpy/rich behind them) are imported inside each
+# command, so `sensad <cmd>` only pays for what that command needs.
 
 app = typer.Typer(add_completion=False)
-console = Console()
 
 @app.command()
 def synth(
     out: str = typer.Option("data/demo", "--out", help="Output folder"),
-    minutes: int = typer.Option(60, "--minutes", help="Duration in minutes"),
+    minutes: int = typer.Option(60, "--minutes", help="Duration in minutes (ignored with --rows)"),
+    rows: int = typer.Option(0, "--rows", help="Number of rows (0 = from --minutes and --freq)"),
+    sensors: int = typer.Option(3, "--sensors", help="Number of sensors (temp, pressure, vibration, temp_1, ...)"),
+    workers: int = typer.Option(1, "--workers", help="Processes generating chunks (output is identical for any N)"),
     freq: str = typer.Option("1s", "--freq", help="Sampling frequency (e.g., 1s, 200ms)"),
     seed: int = typer.Option(42, "--seed", help="Random seed"),
+    format: str = typer.Option("csv", "--format", help="csv|parquet|arrow|npy"),
 ):
-    synth_main(out=out, minutes=minutes, freq=freq, seed=seed)
+    from .synth import synth_main
+
+    synth_main(
+        out=out, minutes=minutes, freq=freq, seed=seed, format=format,
+        sensors=sensors, rows=rows, workers=workers,
+    )
 
 @app.command()
 def train(
-    data: str = typer.Option(..., "--data", help="CSV file (time, sensor1..N)"),
+    data: str = typer.Option(..., "--data", help="CSV/Parquet/Arrow/npy file (time, sensor1..N)"),
     out: str = typer.Option("runs/demo", "--out", help="Run output folder"),
-    model: str = typer.Option("baseline", "--model", help="baseline|ae"),
+    model: str = typer.Option("baseline", "--model", help="baseline|rolling|ae"),
     device: str = typer.Option("cpu", "--device", help="cpu|cuda (for AE)"),
+    streaming: bool = typer.Option(False, "--streaming", help="Single pass in bounded memory (quantile sketches)"),
+    chunksize: int = typer.Option(100_000, "--chunksize", help="Rows per chunk for --streaming"),
+    workers: int = typer.Option(1, "--workers", help="Processes for --streaming (file is split into shards)"),
+    sketch_k: int = typer.Option(400, "--sketch-k", help="Sketch size; rank error ~ 2.3/k^0.97"),
+    sample_rows: int = typer.Option(65536, "--sample-rows", help="Row sample size for the score quantile"),
+    window: int = typer.Option(600, "--window", help="Sliding window (samples per sensor) for --model rolling"),
+    min_periods: int = typer.Option(-1, "--min-periods", help="Samples before the window is used (-1 = window)"),
+    ae_window: int = typer.Option(16, "--ae-window", help="Rows per input window for --model ae"),
+    epochs: int = typer.Option(10, "--epochs", help="Training epochs for --model ae"),
+    hidden: int = typer.Option(64, "--hidden", help="Hidden layer width for --model ae"),
+    latent: int = typer.Option(8, "--latent", help="Bottleneck width for --model ae"),
+    features: str = typer.Option("", "--features", help="Rolling features to score too: mean,std,min,max,slope"),
+    feature_window: int = typer.Option(60, "--feature-window", help="Samples per sensor for --features"),
+    format: str = typer.Option("auto", "--format", help="Input format: auto|csv|parquet|arrow|npy"),
+    metrics_port: int = typer.Option(0, "--metrics-port", help="Serve Prometheus metrics on 127.0.0.1:PORT"),
+    metrics_file: str = typer.Option("", "--metrics-file", help="Write Prometheus metrics to this file"),
 ):
-    train_main(data=data, out=out, model=model, device=device)
+    from .train import train_main
+
+    train_main(
+        data=data, out=out, model=model, device=device, streaming=streaming,
+        chunksize=chunksize, workers=workers, sketch_k=sketch_k, sample_rows=sample_rows,
+        window=window, min_periods=min_periods, format=format,
+        metrics_port=metrics_port, metrics_file=metrics_file,
+        ae_window=ae_window, epochs=epochs, hidden=hidden, latent=latent,
+        features=features, feature_window=feature_window,
+    )
 
 @app.command()
 def eval(
     run: str = typer.Option(..., "--run", help="Run folder with saved artifacts"),
+    data: str = typer.Option("", "--data", help="Labelled test file (default: data/demo/test.*)"),
+    format: str = typer.Option("auto", "--format", help="Input format: auto|csv|parquet|arrow|npy"),
 ):
-    eval_main(run=run)
+    from .eval import eval_main
+
+    eval_main(run=run, data=data, format=format)
+
+@app.command()
+def tune(
+    run: str = typer.Option(..., "--run", help="Run folder with saved artifacts"),
+    data: str = typer.Option(..., "--data", help="Labelled file (with an 'anomaly' column) to score settings against"),
+    train: str = typer.Option("", "--train", help="Training file the threshold quantiles come from (default: the one in meta.json)"),
+    aggs: str = typer.Option("max,mean,top2,top3,top5", "--aggs", help="Aggregations to try: max, mean, top<k>"),
+    quantiles: str = typer.Option("0.99,0.995,0.998,0.999,0.9995,0.9999", "--quantiles", help="Train score quantiles to try as thresholds"),
+    weights: str = typer.Option("none,balanced", "--weights", help="Sensor weightings to try: none, balanced (1 / p99 of train |z|)"),
+    metric: str = typer.Option("f1", "--metric", help="Pick the best setting by f1 (rows) or event_f1 (events)"),
+    workers: int = typer.Option(1, "--workers", help="Processes evaluating settings in parallel"),
+    write: bool = typer.Option(True, "--write/--no-write", help="Write the best setting into baseline.json"),
+    rebuild: bool = typer.Option(False, "--rebuild", help="Recompute the cached |z| matrices"),
+    format: str = typer.Option("auto", "--format", help="Input format: auto|csv|parquet|arrow|npy"),
+):
+    """
+    Search aggregation, sensor weights and threshold quantile from a cached |z| matrix.
+    """
+    from .tune import tune_main
+
+    tune_main(run=run, data=data, train=train, aggs=aggs, quantiles=quantiles, weights=weights, metric=metric,
+              workers=workers, write=write, rebuild=rebuild, format=format)
 
 @app.command()
 def export(
     run: str = typer.Option(..., "--run", help="Run folder"),
     format: str = typer.Option("torchscript", "--format", help="torchscript|onnx"),
+    activate: bool = typer.Option(True, "--activate/--no-activate", help="Make infer/stream use the exported runtime"),
 ):
-    export_main(run=run, format=format)
+    """
+    Export a trained autoencoder (--model ae) for CPU inference.
+    """
+    from .export import export_main
+
+    export_main(run=run, format=format, activate=activate)
 
 @app.command()
 def infer(
-    model: str = typer.Option(..., "--model", help="baseline.json OR run folder containing it"),
-    input: str = typer.Option(..., "--input", help="CSV file to score"),
-    out: str = typer.Option("", "--out", help="Output CSV (default: <run>/predictions.csv)"),
+    model: str = typer.Option("", "--model", help="baseline.json OR run folder containing it"),
+    input: str = typer.Option(..., "--input", help="CSV/Parquet/Arrow/npy file, or a directory / quoted glob of them"),
+    out: str = typer.Option("", "--out", help="Output file; format from suffix (default: <run>/predictions.<input ext>, or <run>/events.csv). A folder for several inputs (default: <run>/predictions/)"),
     threshold: float = typer.Option(-1.0, "--threshold", help="Override threshold (use -1 to keep trained)"),
-    agg: str = typer.Option("", "--agg", help="Override aggregation: max|mean (empty keeps trained)"),
+    agg: str = typer.Option("", "--agg", help="Override aggregation: max|mean|top<k> (empty keeps trained)"),
+    chunksize: int = typer.Option(0, "--chunksize", help="Score N rows at a time in bounded memory (0 = whole file)"),
+    registry: str = typer.Option("", "--registry", help="Per-device models: folder of run folders or JSON {device: run}"),
+    device_column: str = typer.Option("", "--device-column", help="Column holding the device id (with --registry)"),
+    cache_size: int = typer.Option(64, "--cache-size", help="Max models kept loaded (LRU) with --registry"),
+    format: str = typer.Option("auto", "--format", help="Input format: auto|csv|parquet|arrow|npy"),
+    metrics_port: int = typer.Option(0, "--metrics-port", help="Serve Prometheus metrics on 127.0.0.1:PORT"),
+    metrics_file: str = typer.Option("", "--metrics-file", help="Write Prometheus metrics to this file"),
+    output: str = typer.Option("rows", "--output", help="rows (every row + score) | events (one row per anomaly event) | summary (several inputs: summary.csv only)"),
+    event_gap: int = typer.Option(0, "--event-gap", help="Merge events separated by at most N normal rows"),
+    workers: int = typer.Option(1, "--workers", help="Processes scoring files in parallel (several inputs)"),
+    tail: bool = typer.Option(False, "--tail", help="Append-only CSV: score only rows added since the last --tail run (checkpoint next to --out)"),
 ):
-    infer_main(model_path=model, input_csv=input, out_csv=out, threshold=threshold, agg=agg)
+    if not model and not registry:
+        raise typer.BadParameter("Provide --model or --registry")
+    from .infer import infer_main
+
+    ok = infer_main(
+        model_path=model, input_csv=input, out_csv=out, threshold=threshold, agg=agg, chunksize=chunksize,
+        registry=registry, device_column=device_column, cache_size=cache_size, format=format,
+        metrics_port=metrics_port, metrics_file=metrics_file, output=output, event_gap=event_gap, workers=workers,
+        tail=tail,
+    )
+    if not ok:
+        raise typer.Exit(code=1)
 
 @app.command()
 def stream(
     input: str = typer.Option(..., "--input", help="CSV to stream line-by-line"),
-    rate: float = typer.Option(1.0, "--rate", help="Rows per second (Hz)"),
+    rate: float = typer.Option(1.0, "--rate", help="Rows per second (Hz); <= 0 = as fast as possible"),
+    speedup: float = typer.Option(0.0, "--speedup", help="Replay at the 'time' column cadence, N times faster (overrides --rate)"),
     loop: bool = typer.Option(False, "--loop", help="Loop forever"),
     no_header: bool = typer.Option(False, "--no-header", help="Do not emit CSV header"),
+    wire: str = typer.Option("text", "--wire", help="text (CSV lines) | binary (framed float32 batches for score_stream.py --wire binary)"),
 ):
     """
-    Stream a CSV as if it was a live sensor feed (stdout).
+    Stream a CSV as if it was a live sensor feed (stdout); timing report on stderr.
     """
-    stream_main(input_csv=input, rate_hz=rate, loop=loop, no_header=no_header)
+    from .stream import stream_main
+
+    stream_main(input_csv=input, rate_hz=rate, loop=loop, no_header=no_header, speedup=speedup, wire=wire)
+
+@app.command()
+def serve(
+    model: str = typer.Option(..., "--model", help="baseline.json OR run folder containing it"),
+    host: str = typer.Option("127.0.0.1", "--host", help="Address to listen on"),
+    port: int = typer.Option(7878, "--port", help="TCP port (0 = any free port)"),
+    udp_port: int = typer.Option(-1, "--udp-port", help="Also accept UDP datagrams on this port (-1 = off)"),
+    max_batch: int = typer.Option(1024, "--max-batch", help="Max rows scored per batch (across connections)"),
+    max_wait_ms: float = typer.Option(5.0, "--max-wait-ms", help="Max time a row waits for its batch to fill"),
+    conn_inflight: int = typer.Option(4096, "--conn-inflight", help="Unanswered rows per connection before its socket is paused"),
+    only_anomalies: bool = typer.Option(False, "--only-anomalies", help="Send verdicts only for anomalous rows"),
+    sink: str = typer.Option("", "--sink", help="Also append '<conn>,<verdict>' lines to this file ('-' = stdout)"),
+    threshold: float = typer.Option(-1.0, "--threshold", help="Override threshold (use -1 to keep trained)"),
+    agg: str = typer.Option("", "--agg", help="Override aggregation: max|mean|top<k> (empty keeps trained)"),
+    metrics_port: int = typer.Option(0, "--metrics-port", help="Serve Prometheus metrics on 127.0.0.1:PORT"),
+    metrics_file: str = typer.Option("", "--metrics-file", help="Write Prometheus metrics to this file"),
+    reload_interval: float = typer.Option(5.0, "--reload-interval", help="Seconds between checks of the model for a new version (0 = no hot reload)"),
+    version_column: bool = typer.Option(False, "--version-column", help="Append the model version to every verdict"),
+):
+    """
+    Score many concurrent TCP/UDP CSV feeds in one process (header line, then rows).
+    """
+    from .serve import serve_main
+
+    ok = serve_main(
+        model_path=model, host=host, port=port, udp_port=udp_port, max_batch=max_batch,
+        max_wait_ms=max_wait_ms, conn_inflight=conn_inflight, only_anomalies=only_anomalies,
+        sink=sink, threshold=threshold, agg=agg, metrics_port=metrics_port, metrics_file=metrics_file,
+        reload_interval=reload_interval, version_column=version_column,
+    )
+    if not ok:
+        raise typer.Exit(code=1)
+
+@app.command("serve-client")
+def serve_client(
+    input: str = typer.Option(..., "--input", help="CSV replayed by every connection"),
+    host: str = typer.Option("127.0.0.1", "--host", help="Server address"),
+    port: int = typer.Option(7878, "--port", help="Server TCP port"),
+    connections: int = typer.Option(10, "--connections", help="Concurrent feeds to open"),
+    rate: float = typer.Option(100.0, "--rate", help="Rows per second per feed; <= 0 = as fast as possible"),
+    limit: int = typer.Option(0, "--limit", help="Rows per feed (0 = whole file)"),
+):
+    """
+    Stand-in for real devices: replay a CSV over many TCP connections to `sensad serve`.
+    """
+    from .serve import client_main
+
+    client_main(input_csv=input, host=host, port=port, connections=connections, rate=rate, limit=limit)
+
+@app.command()
+def bench(
+    rows: int = typer.Option(200_000, "--rows", help="Rows of generated data"),
+    sensors: int = typer.Option(16, "--sensors", help="Sensors (columns) of generated data"),
+    repeat: int = typer.Option(3, "--repeat", help="Timed runs per benchmark (best is kept)"),
+    out: str = typer.Option("bench.json", "--out", help="Where to write the JSON results"),
+    baseline: str = typer.Option("", "--baseline", help="Earlier bench JSON to compare against"),
+    tolerance: float = typer.Option(0.2, "--tolerance", help="Relative change counted as a regression"),
+    stream_rows: int = typer.Option(20_000, "--stream-rows", help="Rows piped through edge/score_stream.py (0 = skip)"),
+    stream_rate: float = typer.Option(5000.0, "--stream-rate", help="Feed rate for the stream bench (rows/s)"),
+    max_batch: int = typer.Option(256, "--max-batch", help="Stream scorer --max-batch"),
+    max_wait_ms: float = typer.Option(5.0, "--max-wait-ms", help="Stream scorer --max-wait-ms"),
+    seed: int = typer.Option(0, "--seed", help="Random seed"),
+    ae: bool = typer.Option(False, "--ae", help="Also compare autoencoder runtimes (numpy/torch/TorchScript/ONNX)"),
+    wide_sensors: int = typer.Option(0, "--wide-sensors", help="Also bench wide training with this many channels (e.g. 20000; 0 = skip)"),
+    wide_rows: int = typer.Option(2000, "--wide-rows", help="Rows for the wide training bench"),
+):
+    """
+    Measure fit/threshold/score/infer throughput and memory, and stream latency.
+    Exits with code 1 if a metric regressed against --baseline.
+    """
+    from .bench import bench_main
+
+    ok = bench_main(
+        rows=rows, sensors=sensors, repeat=repeat, out=out, baseline=baseline, tolerance=tolerance,
+        stream_rows=stream_rows, stream_rate=stream_rate, max_batch=max_batch, max_wait_ms=max_wait_ms, seed=seed, ae=ae,
+        wide_sensors=wide_sensors, wide_rows=wide_rows,
+    )
+    if not ok:
+        raise typer.Exit(code=1)
 
 def main():
     app()
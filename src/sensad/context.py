@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+# Raw-data snapshots around anomalies for the stream scorer. The last `pre` rows
+# live in a preallocated ring; a flagged row opens a capture (those pre rows + the
+# rows that follow) that stays open until `post` rows after the last flagged row.
+# A flag whose pre-window reaches into an open capture extends it, so overlapping
+# snapshots come out as one file. Captures are written through a fixed buffer of
+# `max_rows` rows (longer ones are split into consecutive files): memory is
+# constant and every row costs one slice copy, whatever the anomaly rate.
+# Finished snapshots are copied out of the buffer and saved by a writer thread
+# (started with the first snapshot), so disk I/O stays off the scoring thread;
+# at most `queue_files` snapshots wait for it before update() blocks.
+#
+# snapshot file: ctx_<first row>_<last row>.npz (or .parquet) with
+#   row (n,) int64 stream row index, time (n,) str (if the feed has time),
+#   X (n, d) float32 sensors, score (n,) float32, is_anomaly (n,) int8, columns (d,) str
+
+FORMATS = ("npz", "parquet")
+
+class _Rows:
+    # preallocated row storage: sensors, time, score, flag
+    def __init__(self, n: int, d: int, time_dtype: Any):
+        self.X = np.empty((n, d), dtype=np.float32)
+        self.time = None if time_dtype is None else np.empty(n, dtype=time_dtype)
+        self.score = np.empty(n, dtype=np.float32)
+        self.flag = np.empty(n, dtype=np.int8)
+
+    def put(self, at: int, X, times, score, flag, a: int, b: int) -> None:
+        k = at + (b - a)
+        self.X[at:k] = X[a:b]
+        if self.time is not None:
+            self.time[at:k] = times[a:b]
+        self.score[at:k] = score[a:b]
+        self.flag[at:k] = flag[a:b]
+
+    def move(self, dst: int, src: int, n: int) -> None:
+        for arr in (self.X, self.time, self.score, self.flag):
+            if arr is not None:
+                arr[dst:dst + n] = arr[src:src + n].copy()
+
+class ContextCapture:
+    """
+    Feed every scored batch to update(); call close() at the end of the stream to
+    write a capture that is still open (its post-window is then cut short).
+    `times`: None (no time column), "text" (strings) or "wire" (binary feed times,
+    formatted with sensad.wire.format_times and `time_kind` when written). `on_write` is
+    called on the writer thread with each snapshot path and its row count; a
+    writer error is raised by the next update() or close().
+    """
+
+    def __init__(self, columns: Sequence[str], pre: int, post: int, out_dir: Any, fmt: str = "npz",
+                 max_rows: int = 0, times: Optional[str] = None, time_kind: Optional[str] = None,
+                 on_write: Optional[Callable[[Path, int], None]] = None, queue_files: int = 8):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown snapshot format '{fmt}' (expected npz or parquet)")
+        if pre < 0 or post < 0:
+            raise ValueError("pre/post rows must be >= 0")
+        self.columns = list(columns)
+        self.pre, self.post = int(pre), int(post)
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.times = times
+        self.time_kind = time_kind
+        # room for a full window plus the tentative rows after its end
+        self.max_rows = max(int(max_rows), 2 * (self.pre + self.post + 1))
+        if times == "wire":
+            from .wire import time_dtype
+
+            dt = np.dtype(time_dtype(time_kind))
+        else:
+            dt = None if times is None else object
+        d = len(self.columns)
+        self._ring = _Rows(max(1, self.pre), d, dt)
+        self._ring_n = 0       # rows held in the ring (<= pre)
+        self._ring_head = 0    # slot the next row goes to
+        self._buf = _Rows(self.max_rows, d, dt)
+        self._fill = 0
+        self._start = -1       # stream row of _buf[0]; -1 = no open capture
+        self._end = -1         # last row the open capture keeps
+        self._row = 0          # stream row of the next input row
+        self.on_write = on_write
+        self.snapshots = 0
+        self.queue_files = max(1, int(queue_files))
+        self._q: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    # --- ring of the last `pre` rows -------------------------------------------
+
+    def _ring_push(self, X, times, score, flag, a: int, b: int) -> None:
+        if self.pre == 0 or b <= a:
+            return
+        a = max(a, b - self.pre)
+        n = b - a
+        first = min(n, self.pre - self._ring_head)
+        self._ring.put(self._ring_head, X, times, score, flag, a, a + first)
+        if first < n:
+            self._ring.put(0, X, times, score, flag, a + first, b)
+        self._ring_head = (self._ring_head + n) % self.pre
+        self._ring_n = min(self.pre, self._ring_n + n)
+
+    def _ring_tail(self, k: int) -> np.ndarray:
+        # ring slots of the newest k rows, oldest first
+        return (self._ring_head - k + np.arange(k)) % self.pre
+
+    # --- captures --------------------------------------------------------------
+
+    def _open(self, X, times, score, flag, a0: int) -> None:
+        # pre rows: the end of the batch before a0, the rest from the ring
+        from_batch = min(a0, self.pre)
+        from_ring = min(self.pre - from_batch, self._ring_n)
+        if from_ring:
+            slots = self._ring_tail(from_ring)
+            r, b = self._ring, self._buf
+            b.X[:from_ring] = r.X[slots]
+            if b.time is not None:
+                b.time[:from_ring] = r.time[slots]
+            b.score[:from_ring] = r.score[slots]
+            b.flag[:from_ring] = r.flag[slots]
+        self._buf.put(from_ring, X, times, score, flag, a0 - from_batch, a0)
+        self._fill = from_ring + from_batch
+        self._start = self._row + a0 - self._fill
+
+    def _append(self, X, times, score, flag, a: int, b: int) -> None:
+        while a < b:
+            if self._fill == self.max_rows:
+                self._spill()
+            k = min(b - a, self.max_rows - self._fill)
+            self._buf.put(self._fill, X, times, score, flag, a, a + k)
+            self._fill += k
+            a += k
+
+    def _spill(self) -> None:
+        # buffer full: write the rows kept so far, keep tentative rows past _end
+        keep = min(self._fill, self._end - self._start + 1)
+        self._write(keep)
+        rest = self._fill - keep
+        if rest:
+            self._buf.move(0, keep, rest)
+        self._fill = rest
+        self._start += keep
+
+    def _close(self) -> None:
+        keep = min(self._fill, self._end - self._start + 1)
+        if keep > 0:
+            self._write(keep)
+        self._fill, self._start, self._end = 0, -1, -1
+
+    def update(self, X: np.ndarray, times: Any, score: np.ndarray, flags: np.ndarray) -> None:
+        if self._error is not None:
+            raise self._error
+        n = len(X)
+        if not n:
+            return
+        score = np.asarray(score)
+        flag = np.asarray(flags, dtype=np.int8)
+        if self.times == "text":
+            times = np.asarray(times, dtype=object)
+        base = self._row
+        reach = self.pre + self.post  # flags further apart than this get separate captures
+        hits = np.flatnonzero(flag)
+        if len(hits):
+            cut = np.flatnonzero(np.diff(hits) > reach) + 1
+            groups = zip(hits[np.r_[0, cut]].tolist(), hits[np.r_[cut - 1, len(hits) - 1]].tolist())
+        else:
+            groups = iter(())
+        i = 0
+        for g0, g1 in groups:
+            if self._start >= 0 and base + g0 - self.pre > self._end:
+                # the open capture ends before this group's pre-window: finish it
+                stop = max(i, min(g0, self._end + self.pre + 1 - base))
+                self._append(X, times, score, flag, i, stop)
+                self._close()
+            # extend the end first: a spill while appending must keep these rows
+            if self._start >= 0:
+                self._end = max(self._end, base + g1 + self.post)
+                self._append(X, times, score, flag, i, g0)
+            else:
+                self._open(X, times, score, flag, g0)
+                self._end = base + g1 + self.post
+            self._append(X, times, score, flag, g0, g1 + 1)
+            i = g1 + 1
+        if self._start >= 0 and i < n:
+            # rows after the last flag: kept while the capture may still be extended
+            stop = min(n, self._end + self.pre + 1 - base)
+            self._append(X, times, score, flag, i, max(i, stop))
+            if stop < n:
+                self._close()
+        self._ring_push(X, times, score, flag, 0, n)
+        self._row += n
+
+    def close(self) -> None:
+        """Writes a capture that is still open and waits until every snapshot is saved."""
+        if self._start >= 0:
+            self._end = min(self._end, self._start + self._fill - 1)
+            self._close()
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    # --- files -----------------------------------------------------------------
+
+    def _write(self, n: int) -> None:
+        # scoring thread: copy the rows out of the buffer, the writer thread saves them
+        b = self._buf
+        item = (self._start, b.X[:n].copy(), None if b.time is None else b.time[:n].copy(),
+                b.score[:n].copy(), b.flag[:n].copy())
+        if self._thread is None:
+            self._q = queue.Queue(maxsize=self.queue_files)
+            self._thread = threading.Thread(target=self._run, name="sensad-context", daemon=True)
+            self._thread.start()
+        self._q.put(item)
+
+    def _run(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            if self._error is None:
+                try:
+                    self._save(*item)
+                except BaseException as e:  # noqa: BLE001 - surfaces in update() / close()
+                    self._error = e
+
+    def _save(self, start: int, X: np.ndarray, times: Any, score: np.ndarray, flag: np.ndarray) -> None:
+        n = len(X)
+        rows = np.arange(start, start + n, dtype=np.int64)
+        data = {"row": rows, "X": X, "score": score, "is_anomaly": flag}
+        if times is not None:
+            if self.times == "wire":
+                from .wire import format_times
+
+                data["time"] = np.array(format_times(times, self.time_kind), dtype=str)
+            else:
+                data["time"] = times.astype(str)
+        path = self.out_dir / f"ctx_{rows[0]:012d}_{rows[-1]:012d}.{self.fmt}"
+        if self.fmt == "npz":
+            np.savez(path, columns=np.array(self.columns, dtype=str), **data)
+        else:
+            from .tabular import _pyarrow
+
+            pa = _pyarrow()
+            cols = {"row": data["row"]}
+            if "time" in data:
+                cols["time"] = data["time"]
+            for j, c in enumerate(self.columns):
+                cols[c] = data["X"][:, j]
+            cols["anomaly_score"] = data["score"]
+            cols["is_anomaly"] = data["is_anomaly"]
+            pa.parquet.write_table(pa.table(cols), str(path))
+        self.snapshots += 1
+        if self.on_write is not None:
+            self.on_write(path, n)
+
+def load_snapshot(path: Any) -> dict:
+    """A snapshot file as a dict of arrays (the npz layout, also for parquet)."""
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path, allow_pickle=False) as z:
+            return {k: z[k] for k in z.files}
+    from .tabular import _pyarrow
+
+    t = _pyarrow().parquet.read_table(str(path))
+    names = [c for c in t.column_names if c not in ("row", "time", "anomaly_score", "is_anomaly")]
+    out = {
+        "row": t.column("row").to_numpy(), "columns": np.array(names, dtype=str),
+        "X": np.column_stack([t.column(c).to_numpy() for c in names]).astype(np.float32),
+        "score": t.column("anomaly_score").to_numpy(), "is_anomaly": t.column("is_anomaly").to_numpy(),
+    }
+    if "time" in t.column_names:
+        out["time"] = np.array(t.column("time").to_pylist(), dtype=str)
+    return out
@@ -3,23 +3,14 @@ from __future__ import annotations
 from pathlib import Path
 import json
 import numpy as np
-import pandas as pd
 from rich.console import Console
 from rich.table import Table
 
-from .baseline import BaselineModel
+from .models import load_model
+from .tabular import EXT, detect_format, read_columns, read_matrix
 
 console = Console()
 
-def _load_baseline(runp: Path) -> BaselineModel:
-    cfg = json.loads((runp / "baseline.json").read_text(encoding="utf-8"))
-    return BaselineModel(
-        columns=cfg["columns"],
-        med=cfg["med"],
-        mad=cfg["mad"],
-        threshold=float(cfg["threshold"]),
-        agg=cfg.get("agg", "max"),
-    )
 
 def _prf(y_true: np.ndarray, y_pred: np.ndarray):
     tp = int(np.sum((y_true == 1) & (y_pred == 1)))
@@ -30,30 +21,106 @@ def _prf(y_true: np.ndarray, y_pred: np.ndarray):
     f1 = (2 * prec * rec) / (prec + rec + 1e-12)
     return {"tp": tp, "fp": fp, "fn": fn, "precision": prec, "recall": rec, "f1": f1}
 
-def eval_main(run: str):
+def pr_curve(y_true: np.ndarray, score: np.ndarray):
+    """
+    Exact precision/recall at every distinct threshold (predict score >= th), from
+    one descending sort and cumulative sums. NaN scores are never flagged.
+    Returns (thresholds desc, precision, recall, tp, fp).
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    score = np.asarray(score)
+    ok = ~np.isnan(score)
+    order = np.argsort(-score[ok], kind="stable")
+    s = score[ok][order]
+    y = y_true[ok][order]
+    # last position of each run of equal scores = all rows with score >= s flagged
+    last = np.r_[np.flatnonzero(s[1:] != s[:-1]), len(s) - 1] if len(s) else np.zeros(0, dtype=int)
+    tp = np.cumsum(y)[last]
+    fp = (last + 1) - tp
+    pos = int(y_true.sum())
+    precision = tp / (tp + fp + 1e-12)
+    recall = tp / (pos + 1e-12)
+    return s[last], precision, recall, tp, fp
+
+def average_precision(precision: np.ndarray, recall: np.ndarray) -> float:
+    # step-wise area under the PR curve (as sklearn's average_precision_score)
+    return float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+
+def _runs(flags: np.ndarray):
+    # [start, end) of contiguous runs of True
+    d = np.diff(np.r_[0, flags.astype(np.int8), 0])
+    return np.flatnonzero(d == 1), np.flatnonzero(d == -1)
+
+def event_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
+    """
+    Event-level scores: each contiguous labelled run is one event, detected if any
+    row in it is flagged; delay = rows from event start to the first flag.
+    Flagged runs that touch no labelled row count as false alarms.
+    """
+    y_true = np.asarray(y_true) == 1
+    y_pred = np.asarray(y_pred) == 1
+    n = len(y_true)
+    starts, ends = _runs(y_true)
+
+    # next flagged index at or after each row (n = none), via reverse running min
+    nxt = np.where(y_pred, np.arange(n), n)
+    nxt = np.minimum.accumulate(nxt[::-1])[::-1] if n else nxt
+    first = nxt[starts] if len(starts) else np.zeros(0, dtype=int)
+    detected = first < ends
+    delays = (first - starts)[detected]
+
+    p_starts, p_ends = _runs(y_pred)
+    cy = np.r_[0, np.cumsum(y_true)]
+    hits = (cy[p_ends] - cy[p_starts]) > 0
+    n_events, n_det, n_alarms = len(starts), int(detected.sum()), len(p_starts)
+    return {
+        "events": int(n_events),
+        "detected": n_det,
+        "event_recall": n_det / (n_events + 1e-12),
+        "alarm_runs": int(n_alarms),
+        "false_alarm_runs": int(n_alarms - hits.sum()),
+        "event_precision": float(hits.sum()) / (n_alarms + 1e-12),
+        "delay_rows_mean": float(delays.mean()) if len(delays) else None,
+        "delay_rows_median": float(np.median(delays)) if len(delays) else None,
+        "delay_rows_max": int(delays.max()) if len(delays) else None,
+    }
+
+def _downsample(n: int, keep: int, max_points: int = 1000) -> np.ndarray:
+    idx = np.unique(np.linspace(0, n - 1, min(n, max_points)).round().astype(int)) if n else np.zeros(0, dtype=int)
+    return np.union1d(idx, [keep]) if n else idx
+
+def eval_main(run: str, data: str = "", format: str = "auto"):
     runp = Path(run)
-    model = _load_baseline(runp)
-
-    # We expect test.csv alongside data demo; store a pointer in meta.json later if desired.
-    # For now: try common locations.
-    candidates = [
-        runp.parent / "data" / "demo" / "test.csv",
-        Path("data/demo/test.csv"),
-    ]
-    test_path = None
-    for c in candidates:
-        if c.exists():
-            test_path = c
-            break
-    if test_path is None:
-        raise FileNotFoundError("Could not find test.csv. Run: sensad synth --out data/demo first.")
-
-    df = pd.read_csv(test_path)
-    if "anomaly" not in df.columns:
-        raise ValueError("test.csv must contain 'anomaly' label column (0/1).")
-
-    X = df[model.columns].to_numpy(dtype=np.float32)
-    y_true = df["anomaly"].to_numpy(dtype=int)
+    model = load_model(runp / "baseline.json")
+
+    if data:
+        test_path = Path(data)
+        if not test_path.exists():
+            raise FileNotFoundError(test_path)
+    else:
+        # We expect test.csv alongside data demo; store a pointer in meta.json later if desired.
+        # For now: try common locations (any supported format).
+        candidates = [
+            base / f"test{ext}"
+            for base in (runp.parent / "data" / "demo", Path("data/demo"))
+            for ext in EXT.values()
+        ]
+        test_path = None
+        for c in candidates:
+            if c.exists():
+                test_path = c
+                break
+        if test_path is None:
+            raise FileNotFoundError("Could not find test.csv. Run: sensad synth --out data/demo first.")
+
+    fmt = detect_format(test_path, format)
+    if "anomaly" not in read_columns(test_path, fmt):
+        raise ValueError(f"{test_path.name} must contain 'anomaly' label column (0/1).")
+
+    # only the sensor and label columns are read
+    M = read_matrix(test_path, model.columns + ["anomaly"], fmt)
+    X = M[:, :-1]
+    y_true = M[:, -1].astype(int)
 
     score = model.score(X)
 
@@ -61,15 +128,21 @@ def eval_main(run: str):
     y_pred = (score >= model.threshold).astype(int)
     m = _prf(y_true, y_pred)
 
-    # threshold sweep (small)
-    thresholds = np.quantile(score, np.linspace(0.80, 0.999, 20))
-    best = None
-    for th in thresholds:
-        yy = (score >= th).astype(int)
-        mm = _prf(y_true, yy)
-        mm["threshold"] = float(th)
-        if best is None or mm["f1"] > best["f1"]:
-            best = mm
+    # exact sweep: every distinct score is a candidate threshold
+    thr, prec, rec, tp, fp = pr_curve(y_true, score)
+    f1 = 2 * prec * rec / (prec + rec + 1e-12)
+    pos = int(y_true.sum())
+    if len(thr):
+        b = int(np.argmax(f1))
+        best = {
+            "tp": int(tp[b]), "fp": int(fp[b]), "fn": pos - int(tp[b]),
+            "precision": float(prec[b]), "recall": float(rec[b]), "f1": float(f1[b]),
+            "threshold": float(thr[b]),
+        }
+    else:
+        b = 0
+        best = dict(_prf(y_true, np.zeros_like(y_true)), threshold=float("inf"))
+    keep = _downsample(len(thr), b)
 
     out = {
         "run": str(runp),
@@ -77,6 +150,15 @@ def eval_main(run: str):
         "trained_threshold": float(model.threshold),
         "metrics_at_trained_threshold": m,
         "best_sweep": best,
+        "average_precision": average_precision(prec, rec),
+        "events_at_trained_threshold": event_metrics(y_true, y_pred),
+        "events_at_best_threshold": event_metrics(y_true, (score >= best["threshold"]).astype(int)),
+        "pr_curve": {
+            "points": int(len(thr)),
+            "threshold": thr[keep].astype(float).tolist(),
+            "precision": prec[keep].tolist(),
+            "recall": rec[keep].tolist(),
+        },
     }
     (runp / "eval.json").write_text(json.dumps(out, indent=2), encoding="utf-8")
 
@@ -86,6 +168,11 @@ def eval_main(run: str):
     t.add_column("recall", justify="right")
     t.add_column("f1", justify="right")
     t.add_row("trained_threshold", f"{m['precision']:.3f}", f"{m['recall']:.3f}", f"{m['f1']:.3f}")
-    t.add_row("best_sweep", f"{best['precision']:.3f}", f"{best['recall']:.3f}", f"{best['f1']:.3f}")
+    t.add_row(f"best_f1 (th={best['threshold']:.3f})", f"{best['precision']:.3f}", f"{best['recall']:.3f}", f"{best['f1']:.3f}")
     console.print(t)
+    ev = out["events_at_trained_threshold"]
+    console.print(
+        f"AP={out['average_precision']:.3f} | events detected {ev['detected']}/{ev['events']}"
+        f" | false alarm runs {ev['false_alarm_runs']} | median delay {ev['delay_rows_median']} rows"
+    )
     console.print(f"[green]OK[/green] wrote {runp/'eval.json'}")
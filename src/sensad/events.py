@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EVENT_COLUMNS = [
+    "start", "end", "duration_s", "start_row", "end_row", "rows",
+    "peak_score", "mean_score", "top_sensor", "top_abs_z",
+]
+
+def predict_with_z(scorer: Any, X: np.ndarray, work: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (score, pred, |z|) in one pass: every scorer's score() computes |z| into `work`
+    first, so the per-sensor values come for free (and stateful scorers advance once).
+    """
+    n = len(X)
+    if work is None or len(work) < n:
+        work = scorer.workspace(n)[1]
+    score, pred = scorer.predict(X, work=work)
+    return score, pred, work[:n]
+
+def _seconds(start: str, end: str) -> Optional[float]:
+    try:
+        return float(end) - float(start)
+    except ValueError:
+        pass
+    try:
+        return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    except ValueError:
+        return None
+
+@dataclass
+class _Open:
+    start_row: int
+    end_row: int
+    start: str
+    end: str
+    peak: float
+    total: float
+    count: int
+    zmax: np.ndarray  # (d,) max |z| per sensor over the event
+
+class EventTracker:
+    """
+    Run-length encodes flagged rows into events. Runs separated by at most `gap`
+    normal rows are one event. Each update() is vectorized over its block (one
+    reduceat per statistic over the flagged rows only); an event still open at the
+    end of a block continues into the next, so feeding a file in any block
+    partition, then flush(), yields the same events as one batch call.
+    """
+
+    def __init__(self, columns: Sequence[str], gap: int = 0):
+        self.columns = list(columns)
+        self.gap = max(0, int(gap))
+        self._offset = 0
+        self._open: Optional[_Open] = None
+
+    def update(self, score: np.ndarray, pred: np.ndarray, Z: np.ndarray,
+               times: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Consumes one block; returns the events that closed in it."""
+        n = len(score)
+        o = self._offset
+        self._offset += n
+        closed: List[Dict[str, Any]] = []
+        idx = np.flatnonzero(pred)
+        if len(idx):
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(idx) > self.gap + 1) + 1))
+            ends = np.append(starts[1:], len(idx)) - 1
+            s = np.asarray(score, dtype=np.float64)[idx]
+            peak = np.fmax.reduceat(s, starts)
+            total = np.add.reduceat(s, starts)
+            zmax = np.fmax.reduceat(np.asarray(Z)[idx], starts, axis=0)
+            first, last = idx[starts], idx[ends]
+            for k in range(len(starts)):
+                a, b = int(first[k]), int(last[k])
+                part = _Open(
+                    start_row=o + a, end_row=o + b,
+                    start="" if times is None else str(times[a]), end="" if times is None else str(times[b]),
+                    peak=float(peak[k]), total=float(total[k]), count=int(ends[k] - starts[k] + 1), zmax=zmax[k],
+                )
+                ev = self._open
+                if k == 0 and ev is not None and part.start_row - ev.end_row <= self.gap + 1:
+                    ev.end_row, ev.end = part.end_row, part.end
+                    ev.peak = max(ev.peak, part.peak)
+                    ev.total += part.total
+                    ev.count += part.count
+                    ev.zmax = np.fmax(ev.zmax, part.zmax)
+                else:
+                    if ev is not None:
+                        closed.append(self._close())
+                    self._open = part
+        if self._open is not None and (o + n - 1) - self._open.end_row > self.gap:
+            closed.append(self._close())
+        return closed
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Closes the event still open at end of input, if any."""
+        return [self._close()] if self._open is not None else []
+
+    def _close(self) -> Dict[str, Any]:
+        ev, self._open = self._open, None
+        j = int(np.nanargmax(ev.zmax)) if np.isfinite(ev.zmax).any() else 0
+        return {
+            "start": ev.start,
+            "end": ev.end,
+            "duration_s": _seconds(ev.start, ev.end) if ev.start else None,
+            "start_row": ev.start_row,
+            "end_row": ev.end_row,
+            "rows": ev.end_row - ev.start_row + 1,
+            "peak_score": ev.peak,
+            "mean_score": ev.total / ev.count,
+            "top_sensor": self.columns[j],
+            "top_abs_z": float(ev.zmax[j]),
+        }
+
+def find_events(columns: Sequence[str], score: np.ndarray, pred: np.ndarray, Z: np.ndarray,
+                times: Optional[Sequence[str]] = None, gap: int = 0) -> List[Dict[str, Any]]:
+    """Batch form: all events of one scored block."""
+    tracker = EventTracker(columns, gap=gap)
+    return tracker.update(score, pred, Z, times) + tracker.flush()
+
+def event_cells(ev: Dict[str, Any]) -> List[str]:
+    """An event as CSV cells, in EVENT_COLUMNS order."""
+    out = []
+    for c in EVENT_COLUMNS:
+        v = ev[c]
+        out.append("" if v is None else f"{v:.6f}" if isinstance(v, float) else str(v))
+    return out
@@ -1,9 +1,57 @@
 from __future__ import annotations
+
+import json
 from pathlib import Path
+import numpy as np
 from rich.console import Console
 
+from .ae import EXPORT_FILES, export_model
+from .models import model_from_config
+
 console = Console()
 
-def export_main(run: str, format: str):
+def export_main(run: str, format: str, activate: bool = True):
+    """
+    Writes the autoencoder's scoring net to <run>/ae.torchscript.pt or <run>/ae.onnx,
+    checks it against the numpy forward pass and records it in baseline.json
+    (with `activate`, as the runtime infer and the stream scorer use; only once
+    that check ran, so a runtime that does not load here never becomes active).
+    """
     runp = Path(run)
-    console.print(f"[yellow]Stub[/yellow] export {format} from {runp} (next step)")
+    path = runp / "baseline.json" if runp.is_dir() else runp
+    if format not in EXPORT_FILES:
+        raise ValueError(f"Unknown export format: {format} (expected torchscript|onnx)")
+    cfg = json.loads(path.read_text(encoding="utf-8"))
+    if cfg.get("type") != "autoencoder":
+        raise ValueError(
+            f"{path} holds a {cfg.get('type', 'baseline_robust_z')} model; only --model ae runs are exported "
+            "(baseline models already score with the numpy kernel)"
+        )
+    model = model_from_config(cfg, base=path.parent)
+    target = export_model(model, format, path.parent / EXPORT_FILES[format])
+    model.exports[format] = str(target)
+
+    # same windows through both runtimes
+    X = np.random.default_rng(0).normal(size=(512, len(model.columns))).astype(np.float32)
+    X = X * model.mad.astype(np.float32) * 3
+    X += model.med.astype(np.float32)
+    ref = model.compile("numpy").abs_z(X)
+    try:
+        got = model.compile(format).abs_z(X)
+    except ImportError as e:
+        console.print(f"[yellow]WARN[/yellow] exported, but not verified: {e}")
+        if activate:
+            console.print(f"[yellow]WARN[/yellow] {format} not made the active runtime (numpy keeps scoring); "
+                          "export again where it loads to activate it")
+            activate = False
+    else:
+        err = float(np.nanmax(np.abs(got - ref)))
+        if err > 1e-3:
+            raise RuntimeError(f"{format} export disagrees with the numpy model (max abs diff {err:.3g})")
+        console.print(f"verified against numpy forward: max abs diff {err:.2e}")
+
+    cfg.setdefault("exports", {})[format] = target.name
+    if activate:
+        cfg["runtime"] = format
+    path.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+    console.print(f"[green]OK[/green] exported {format} -> {target}" + (" (active runtime)" if activate else ""))
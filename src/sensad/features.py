@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .baseline import aggregate
+
+KINDS = ("mean", "std", "min", "max", "slope")
+
+def parse_kinds(spec: str) -> List[str]:
+    """'mean,std,slope' -> ['mean', 'std', 'slope'] (validated, in KINDS order)."""
+    kinds = [k.strip() for k in spec.split(",") if k.strip()]
+    bad = [k for k in kinds if k not in KINDS]
+    if bad:
+        raise ValueError(f"Unknown feature(s) {bad}; expected some of {list(KINDS)}")
+    return [k for k in KINDS if k in kinds]
+
+def feature_channels(columns: Sequence[str], kinds: Sequence[str]) -> List[str]:
+    """Scored channels: the raw sensors, then `<sensor>:<kind>` per feature."""
+    return list(columns) + [f"{c}:{k}" for k in kinds for c in columns]
+
+def _sliding(full: np.ndarray, w: int, op) -> np.ndarray:
+    # van Herk/Gil-Werman: per-block prefix and suffix extrema, O(1) per sample
+    m, d = full.shape
+    n = m - w + 1
+    k = -(-m // w)
+    F = np.concatenate([full, np.full((k * w - m, d), np.nan)]).reshape(k, w, d)
+    pre = op.accumulate(F, axis=1).reshape(-1, d)
+    suf = op.accumulate(F[:, ::-1], axis=1)[:, ::-1].reshape(-1, d)
+    return op(suf[:n], pre[w - 1:w - 1 + n])
+
+class RollingFeatures:
+    """
+    Per-sensor rolling mean/std/min/max/slope over the last `window` samples
+    (fewer while warming up), vectorized across sensors and across each block.
+
+    mean/std come from running prefix sums of centred values: window sums are
+    C[t] - C[t-w], with the last `window` prefix rows kept in a ring buffer.
+    The prefix sums are accumulated strictly in row order, so any block partition
+    produces bit-identical features. min/max use van Herk/Gil-Werman over the
+    last window-1 raw values (a second ring) plus the block. slope is the mean
+    first difference between the oldest and newest valid samples of the window,
+    (x_b - x_a) / (b - a) at their real lag (0 with a single valid sample). NaN
+    samples are skipped by every feature; a feature is NaN only if the window has
+    no valid sample.
+    """
+
+    def __init__(self, d: int, window: int, kinds: Sequence[str], center: Optional[np.ndarray] = None):
+        if window < 2:
+            raise ValueError("feature window must be >= 2")
+        self.d = int(d)
+        self.window = int(window)
+        self.kinds = list(kinds)
+        self.center = np.zeros(d) if center is None else np.asarray(center, dtype=np.float64)
+        w = self.window
+        # ring of prefix sums (count, sum, sum of squares) for the last w rows
+        self._pre = np.zeros((w, 3, d))
+        self._head = 0                   # ring slot of the oldest prefix row
+        self._last = np.zeros((3, d))    # prefix sums up to the latest row
+        # ring of the last w-1 raw values, for min/max/slope
+        self._vals = np.full((w - 1, d), np.nan)
+        self._vhead = 0
+        self._seen = 0
+
+    @property
+    def warmup_remaining(self) -> int:
+        """Rows still to come before the window is full (0 once it is)."""
+        return max(0, self.window - 1 - self._seen)
+
+    def _ordered(self, ring: np.ndarray, head: int) -> np.ndarray:
+        return ring[(head + np.arange(len(ring))) % len(ring)]
+
+    def _push(self, ring: np.ndarray, head: int, block: np.ndarray) -> int:
+        n = len(block)
+        if n >= len(ring):
+            ring[:] = block[-len(ring):]
+            return 0
+        ring[(head + np.arange(n)) % len(ring)] = block
+        return (head + n) % len(ring)
+
+    def _gap_slope(self, full: np.ndarray, ok: np.ndarray, n: int) -> np.ndarray:
+        # slope between the oldest and newest valid samples of each window full[i:i + w]
+        w, (m, d) = self.window, full.shape
+        pos = np.arange(m)[:, None]
+        newest = np.maximum.accumulate(np.where(ok, pos, -1), axis=0)[w - 1:]       # last valid <= i+w-1
+        oldest = np.minimum.accumulate(np.where(ok, pos, m)[::-1], axis=0)[::-1][:n]  # first valid >= i
+        has = oldest <= np.arange(w - 1, m)[:, None]
+        a, b = np.where(has, oldest, 0), np.where(has, newest, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = np.where(b > a, (np.take_along_axis(full, b, 0) - np.take_along_axis(full, a, 0)) / (b - a), 0.0)
+        return np.where(has, slope, np.nan)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """(n, d) raw block -> (n, d * (1 + len(kinds))) float32 channels."""
+        X = np.asarray(X, dtype=np.float64)
+        n, d = X.shape
+        w = self.window
+        valid = ~np.isnan(X)
+        feats = {}
+
+        if "mean" in self.kinds or "std" in self.kinds:
+            v = np.where(valid, X - self.center, 0.0)
+            stats = np.stack([valid.astype(np.float64), v, v * v], axis=1)   # (n, 3, d)
+            C = np.add.accumulate(np.concatenate([self._last[None], stats]), axis=0)[1:]
+            P = np.concatenate([self._ordered(self._pre, self._head), C])  # P[i]: prefix sums w rows before row i
+            S = C - P[:n]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = S[:, 1] / S[:, 0]
+                feats["mean"] = mean + self.center
+                feats["std"] = np.sqrt(np.maximum(S[:, 2] / S[:, 0] - mean * mean, 0.0))
+            self._last = C[-1]
+            self._head = self._push(self._pre, self._head, C)
+
+        full = np.concatenate([self._ordered(self._vals, self._vhead), X])  # (w-1+n, d)
+        if "min" in self.kinds:
+            feats["min"] = _sliding(full, w, np.fmin)
+        if "max" in self.kinds:
+            feats["max"] = _sliding(full, w, np.fmax)
+        if "slope" in self.kinds:
+            # window of row i of the block: full[i:i + w]; rows before the stream start
+            # are NaN in the ring, so warm-up windows simply have fewer valid samples
+            ok = ~np.isnan(full)
+            # sensors without gaps (and past warm-up): the window's ends are w-1 rows apart
+            slope = (full[w - 1:] - full[:n]) / (w - 1)
+            gaps = np.flatnonzero(~ok.all(axis=0))
+            if len(gaps):
+                slope[:, gaps] = self._gap_slope(full[:, gaps], ok[:, gaps], n)
+            feats["slope"] = slope
+
+        self._vhead = self._push(self._vals, self._vhead, X)
+        self._seen += n
+        out = [X] + [feats[k] for k in self.kinds]
+        return np.concatenate(out, axis=1).astype(np.float32)
+
+class FeatureScorer:
+    """
+    Feature stage + scoring kernel of the channels, behind the usual scorer interface.
+    Feature channels count as |z| = 0 until the window has filled (warm-up rows
+    would compare e.g. a 2-sample slope against full-window statistics).
+    """
+
+    def __init__(self, columns: List[str], channels: List[str], engine: RollingFeatures, kernel: Any):
+        self.columns = list(columns)
+        self.channels = list(channels)
+        self.engine = engine
+        self.kernel = kernel
+
+    @property
+    def threshold(self) -> float:
+        return self.kernel.threshold
+
+    @threshold.setter
+    def threshold(self, v: float) -> None:
+        self.kernel.threshold = v
+
+    @property
+    def agg(self) -> str:
+        return self.kernel.agg
+
+    @agg.setter
+    def agg(self, v: str) -> None:
+        self.kernel.agg = v
+
+    def workspace(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.kernel.workspace(n)
+
+    def abs_z(self, X: np.ndarray, work: Optional[np.ndarray] = None) -> np.ndarray:
+        warm = self.engine.warmup_remaining
+        Z = self.kernel.abs_z(self.engine.transform(X), work=work)
+        Z[:warm, len(self.columns):] = 0.0
+        return Z
+
+    def score(self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None) -> np.ndarray:
+        return aggregate(self.abs_z(X, work=work), self.agg, getattr(self.kernel, "weights", None), out)
+
+    def predict(
+        self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        score = self.score(X, out=out, work=work)
+        return score, (score >= self.threshold).astype(int)
+
+class FeatureModel:
+    """
+    A baseline or rolling model over feature channels. `columns` are the raw
+    sensors read from the input; `inner` scores `channels` (raw + features).
+    """
+
+    def __init__(self, inner: Any, columns: List[str], window: int, kinds: Sequence[str], center: Sequence[float]):
+        self.inner = inner
+        self.columns = list(columns)
+        self.window = int(window)
+        self.kinds = list(kinds)
+        self.center = [float(c) for c in center]
+
+    @property
+    def channels(self) -> List[str]:
+        return self.inner.columns
+
+    @property
+    def med(self):
+        return self.inner.med
+
+    @property
+    def mad(self):
+        return self.inner.mad
+
+    @property
+    def threshold(self) -> float:
+        return self.inner.threshold
+
+    @threshold.setter
+    def threshold(self, v: float) -> None:
+        self.inner.threshold = v
+
+    @property
+    def agg(self) -> str:
+        return self.inner.agg
+
+    @agg.setter
+    def agg(self, v: str) -> None:
+        self.inner.agg = v
+
+    def engine(self) -> RollingFeatures:
+        return RollingFeatures(len(self.columns), self.window, self.kinds, np.array(self.center))
+
+    def compile(self) -> FeatureScorer:
+        """Fresh scorer; keep it to carry the feature windows across blocks."""
+        return FeatureScorer(self.columns, self.channels, self.engine(), self.inner.compile())
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        return self.compile().score(X)
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.compile().predict(X)
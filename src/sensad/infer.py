@@ -1,75 +1,351 @@
 from __future__ import annotations
 
+import time
 from pathlib import Path
-import json
+from typing import Any, Callable, Tuple
 import numpy as np
 import pandas as pd
 from rich.console import Console
 from rich.table import Table
 
-from .baseline import BaselineModel
+from .baseline import parse_agg
+from .events import EVENT_COLUMNS, EventTracker, predict_with_z
+from .models import Model, load_model
+from .pipeline import TopK, run_pipeline
+from .registry import ModelRegistry
+from .tabular import EXT, FrameWriter, detect_format, iter_frames, read_frame, write_frame
+from .telemetry import make_metrics, timed_iter
 
 console = Console()
 
-def _load_baseline(path: Path) -> BaselineModel:
-    cfg = json.loads(path.read_text(encoding="utf-8"))
-    return BaselineModel(
-        columns=cfg["columns"],
-        med=cfg["med"],
-        mad=cfg["mad"],
-        threshold=float(cfg["threshold"]),
-        agg=cfg.get("agg", "max"),
-    )
-
-def infer_main(model_path: str, input_csv: str, out_csv: str = "", threshold: float = -1.0, agg: str = ""):
-    mp = Path(model_path)
-    if mp.is_dir():
-        mp = mp / "baseline.json"
-
-    if mp.suffix.lower() != ".json":
-        raise ValueError("For baseline inference, provide baseline.json or a run folder containing it.")
-
-    model = _load_baseline(mp)
-
-    # overrides
-    if threshold is not None and threshold >= 0:
-        model.threshold = float(threshold)
-    if agg:
-        if agg not in ("max", "mean"):
-            raise ValueError("--agg must be 'max' or 'mean'")
-        model.agg = agg
+FrameScorer = Callable[[pd.DataFrame], Tuple[np.ndarray, np.ndarray]]
+
+class _TimeCells:
+    """
+    Time cells of a frame as text ("" without a time column). Only the rows that
+    are read (top-k candidates, event edges) are converted, not the whole column.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.col = df["time"] if "time" in df.columns else None
+        # text columns (CSV input) are read as they are; typed ones are converted per cell
+        self.text = self.col.array if self.col is not None and pd.api.types.is_string_dtype(self.col) else None
 
-    df = pd.read_csv(input_csv)
+    def __getitem__(self, i: int) -> str:
+        if self.text is not None:
+            return str(self.text[i])
+        return "" if self.col is None else str(self.col.iloc[[i]].astype(str).iloc[0])
+
+def _check_columns(df: pd.DataFrame, model: Model):
     cols = [c for c in df.columns if c in model.columns]
     if cols != model.columns:
         raise ValueError(f"Input columns mismatch. Expected {model.columns}, got {cols}")
 
-    X = df[model.columns].to_numpy(dtype=np.float32)
-    score, pred = model.predict(X)
+def _model_scorer(model: Model, chunksize: int, kernel: Any = None) -> FrameScorer:
+    kernel = model.compile() if kernel is None else kernel
+    work = kernel.workspace(chunksize)[1] if chunksize else None
+    checked = False
+
+    def score_frame(df: pd.DataFrame):
+        nonlocal checked
+        if not checked:
+            _check_columns(df, model)
+            checked = True
+        X = df[model.columns].to_numpy(dtype=np.float32)
+        return kernel.predict(X, work=work)
+
+    return score_frame
+
+def _registry_scorer(registry: ModelRegistry, device_column: str) -> FrameScorer:
+    def score_frame(df: pd.DataFrame):
+        if device_column not in df.columns:
+            raise ValueError(f"Device column '{device_column}' not found in input")
+
+        def matrix(cols):
+            missing = [c for c in cols if c not in df.columns]
+            if missing:
+                raise ValueError(f"Input is missing sensor columns {missing}")
+            return df[cols].to_numpy(dtype=np.float32)
+
+        return registry.predict_grouped(df[device_column].to_numpy(), matrix)
+
+    return score_frame
+
+class _InferMetrics:
+    def __init__(self, metrics):
+        self.rows = metrics.counter("rows_total", "Rows scored")
+        self.anomalies = metrics.counter("anomalies_total", "Rows flagged as anomalous")
+        self.read = metrics.histogram("stage_seconds", "Time per chunk in each stage", stage="read")
+        self.score = metrics.histogram("stage_seconds", "Time per chunk in each stage", stage="score")
+        self.write = metrics.histogram("stage_seconds", "Time per chunk in each stage", stage="write")
+        metrics.rate("rows_per_second", self.rows, "Rows scored per second since the previous scrape")
+        metrics.gauge("anomaly_ratio", "Fraction of rows flagged", fn=lambda: self.anomalies.value / max(1, self.rows.value))
+
+def _infer_full(score_frame: FrameScorer, input_csv: str, fmt: str, out_path: Path, top: TopK, m: _InferMetrics) -> int:
+    t0 = time.perf_counter()
+    df = read_frame(input_csv, fmt=fmt)
+    t1 = time.perf_counter()
+    score, pred = score_frame(df)
+    t2 = time.perf_counter()
+
+    df["anomaly_score"] = score
+    df["is_anomaly"] = pred
+    write_frame(df, out_path)
+    m.read.observe(t1 - t0)
+    m.score.observe(t2 - t1)
+    m.write.observe(time.perf_counter() - t2)
+    m.rows.inc(len(df))
+    m.anomalies.inc(int(pred.sum()))
+
+    times = _TimeCells(df)
+    top.push(score, 0, (times, pred))
+    return len(df)
+
+def _infer_chunked(
+    score_frame: FrameScorer, input_csv: str, fmt: str, out_path: Path, top: TopK, chunksize: int, m: _InferMetrics
+) -> int:
+    """
+    Reads, scores and appends `chunksize` rows at a time. Reading, scoring and
+    writing run as overlapping pipeline stages; peak memory is a few chunks.
+    """
+    n_rows = 0
+
+    def score_chunk(df: pd.DataFrame) -> pd.DataFrame:
+        nonlocal n_rows
+        t0 = time.perf_counter()
+        score, pred = score_frame(df)
+        m.score.observe(time.perf_counter() - t0)
+        m.rows.inc(len(df))
+        m.anomalies.inc(int(pred.sum()))
+        df["anomaly_score"] = score
+        df["is_anomaly"] = pred
+        times = _TimeCells(df)
+        top.push(score, n_rows, (times, pred))
+        n_rows += len(df)
+        return df
+
+    with FrameWriter(out_path) as writer:
+        def write_chunk(df: pd.DataFrame):
+            t0 = time.perf_counter()
+            writer.write(df)
+            m.write.observe(time.perf_counter() - t0)
+
+        run_pipeline(timed_iter(iter_frames(input_csv, chunksize, fmt=fmt), m.read), score_chunk, write_chunk)
+    return n_rows
+
+def _infer_tail(model: Model, input_csv: str, out_path: Path, top: TopK, chunksize: int, m: _InferMetrics) -> Tuple[int, int, str]:
+    """
+    Scores only the rows appended to `input_csv` since the last run (see sensad.tail)
+    and appends them to `out_path`; rescores everything when the checkpoint does
+    not match. Returns (new rows, total rows, reason).
+    """
+    from .baseline import BaselineModel
+    from .pipeline import csv_header, read_csv_range
+    from .tail import checkpoint_path, complete_end, file_identity, load_checkpoint, model_fingerprint, resume_point, save_checkpoint
 
-    out = df.copy()
-    out["anomaly_score"] = score
-    out["is_anomaly"] = pred
+    stateful = not isinstance(model, BaselineModel)
+    offset, rows, kernel, reason = resume_point(load_checkpoint(out_path), model, input_csv, out_path, stateful)
+    names, data_start = csv_header(input_csv)
+    start = offset or data_start
+    end = complete_end(input_csv, start)
+    score_frame = _model_scorer(model, chunksize, kernel)
+    n_new = 0
+
+    def score_chunk(df: pd.DataFrame) -> pd.DataFrame:
+        nonlocal n_new
+        t0 = time.perf_counter()
+        score, pred = score_frame(df)
+        m.score.observe(time.perf_counter() - t0)
+        m.rows.inc(len(df))
+        m.anomalies.inc(int(pred.sum()))
+        df["anomaly_score"] = score
+        df["is_anomaly"] = pred
+        times = _TimeCells(df)
+        top.push(score, rows + n_new, (times, pred))
+        n_new += len(df)
+        return df
+
+    with FrameWriter(out_path, append=bool(offset)) as writer:
+        def write_chunk(df: pd.DataFrame):
+            t0 = time.perf_counter()
+            writer.write(df)
+            m.write.observe(time.perf_counter() - t0)
+
+        frames = read_csv_range(input_csv, start, end, names, chunksize) if end > start else iter(())
+        run_pipeline(timed_iter(frames, m.read), score_chunk, write_chunk)
+    if not offset and not n_new:
+        # no complete data row yet: drop any stale output, nothing to resume from
+        out_path.unlink(missing_ok=True)
+        checkpoint_path(out_path).unlink(missing_ok=True)
+        return 0, 0, reason
+
+    save_checkpoint(out_path, {
+        "model": model_fingerprint(model),
+        "input": file_identity(input_csv, end),
+        "offset": end,
+        "rows": rows + n_new,
+        "output_bytes": out_path.stat().st_size,
+    }, kernel if stateful else None)
+    return n_new, rows + n_new, reason
+
+def _infer_events(
+    model: Model, input_csv: str, fmt: str, out_path: Path, chunksize: int, gap: int, m: _InferMetrics
+) -> Tuple[int, pd.DataFrame]:
+    """
+    Scores the input and writes one row per anomaly event instead of one per input
+    row. Events are run-length encoded per chunk and carried across chunk edges.
+    """
+    kernel = model.compile()
+    work = kernel.workspace(chunksize)[1] if chunksize else None
+    tracker = EventTracker(getattr(kernel, "channels", model.columns), gap=gap)
+    frames = iter_frames(input_csv, chunksize, fmt=fmt) if chunksize else iter([read_frame(input_csv, fmt=fmt)])
+    events = []
+    n_rows = 0
+    for df in timed_iter(frames, m.read):
+        if n_rows == 0:
+            _check_columns(df, model)
+        t0 = time.perf_counter()
+        score, pred, Z = predict_with_z(kernel, df[model.columns].to_numpy(dtype=np.float32), work)
+        times = _TimeCells(df)
+        events += tracker.update(score, pred, Z, times)
+        m.score.observe(time.perf_counter() - t0)
+        m.rows.inc(len(df))
+        m.anomalies.inc(int(pred.sum()))
+        n_rows += len(df)
+    events += tracker.flush()
+
+    t0 = time.perf_counter()
+    ev = pd.DataFrame(events, columns=EVENT_COLUMNS)
+    if not events:
+        # typed like a non-empty frame (pandas would make every column object)
+        ev = ev.astype({c: "float64" for c in ("duration_s", "peak_score", "mean_score", "top_abs_z")}
+                       | {c: "int64" for c in ("start_row", "end_row", "rows")})
+    write_frame(ev, out_path)
+    m.write.observe(time.perf_counter() - t0)
+    return n_rows, ev
+
+def infer_main(
+    model_path: str,
+    input_csv: str,
+    out_csv: str = "",
+    threshold: float = -1.0,
+    agg: str = "",
+    chunksize: int = 0,
+    registry: str = "",
+    device_column: str = "",
+    cache_size: int = 64,
+    format: str = "auto",
+    metrics_port: int = 0,
+    metrics_file: str = "",
+    output: str = "rows",
+    event_gap: int = 0,
+    workers: int = 1,
+    tail: bool = False,
+) -> bool:
+    """Scores one file, or many (directory / glob) with `workers` processes. False if any file failed."""
+    from .batch import expand_inputs, infer_files, is_multi
+
+    if agg:
+        parse_agg(agg)
+    multi = is_multi(input_csv)
+    if output not in ("rows", "events") and not (multi and output == "summary"):
+        raise ValueError("--output must be 'rows' or 'events' ('summary' too for several input files)")
+    if output == "events" and registry:
+        raise ValueError("--output events needs a single --model (not --registry)")
+    if tail and (multi or registry or output != "rows"):
+        raise ValueError("--tail scores one CSV file with --model and --output rows")
+    override_thr = float(threshold) if threshold is not None and threshold >= 0 else None
+    chunksize = int(chunksize) if chunksize and chunksize > 0 else 0
+    fmt = format if multi else detect_format(input_csv, format)
+
+    if registry:
+        # mixed-device input: one model per device id, loaded lazily (LRU)
+        if not device_column:
+            raise ValueError("--registry requires --device-column")
+        reg = ModelRegistry(registry, capacity=cache_size, threshold=override_thr, agg=agg or None)
+        score_frame = _registry_scorer(reg, device_column)
+        default_dir = reg.source if reg.source.is_dir() else reg.source.parent
+    else:
+        mp = Path(model_path)
+        if mp.is_dir():
+            mp = mp / "baseline.json"
+
+        if mp.suffix.lower() != ".json":
+            raise ValueError("For baseline inference, provide baseline.json or a run folder containing it.")
+
+        model = load_model(mp)
+
+        # overrides
+        if override_thr is not None:
+            model.threshold = override_thr
+        if agg:
+            model.agg = agg
+        score_frame = _model_scorer(model, chunksize)
+        default_dir = mp.parent
+
+    if multi:
+        registry_args = None
+        if registry:
+            registry_args = {"source": registry, "capacity": cache_size, "threshold": override_thr, "agg": agg or None}
+        summary = infer_files(
+            expand_inputs(input_csv), Path(out_csv) if out_csv else default_dir / "predictions",
+            model=None if registry else model, registry_args=registry_args, device_column=device_column,
+            workers=max(1, int(workers)), chunksize=chunksize, format=format, output=output, event_gap=event_gap,
+        )
+        out_dir = Path(out_csv) if out_csv else default_dir / "predictions"
+        console.print(f"[green]OK[/green] wrote {out_dir}/ (summary.csv)")
+        return bool((summary["status"] == "ok").all())
 
     if out_csv:
         out_path = Path(out_csv)
     else:
-        out_path = mp.parent / "predictions.csv"
-
+        # same format as the input; otherwise the --out suffix decides
+        out_path = default_dir / (f"predictions{EXT[fmt]}" if output == "rows" else "events.csv")
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(out_path, index=False)
+    if tail and (fmt != "csv" or detect_format(out_path) != "csv"):
+        raise ValueError("--tail needs CSV input and CSV output")
+
+    top = TopK(10)
+    metrics = make_metrics(metrics_port, metrics_file)
+    try:
+        m = _InferMetrics(metrics)
+        if output == "events":
+            n_rows, events = _infer_events(model, input_csv, fmt, out_path, chunksize, event_gap, m)
+        elif tail:
+            n_new, n_rows, reason = _infer_tail(model, input_csv, out_path, top, chunksize or 65536, m)
+        elif chunksize:
+            _infer_chunked(score_frame, input_csv, fmt, out_path, top, chunksize, m)
+        else:
+            _infer_full(score_frame, input_csv, fmt, out_path, top, m)
+    finally:
+        metrics.close()
+
+    if output == "events":
+        t = Table(title=f"Top events by peak score ({len(events)} events in {n_rows} rows)")
+        for c in ("start", "rows", "peak_score", "mean_score", "top_sensor"):
+            t.add_column(c, justify="right" if c in ("rows", "peak_score", "mean_score") else "left")
+        for r in events.nlargest(10, "peak_score").itertuples():
+            t.add_row(str(r.start), str(r.rows), f"{r.peak_score:.3f}", f"{r.mean_score:.3f}", r.top_sensor)
+        console.print(t)
+        console.print(f"[green]OK[/green] wrote {out_path} | threshold={model.threshold:.3f} agg={model.agg}")
+        return True
 
     # show top anomalies
-    topk = min(10, len(out))
-    idx = np.argsort(-score)[:topk]
-    t = Table(title=f"Top {topk} anomalies (baseline)")
+    items = top.items()
+    t = Table(title=f"Top {len(items)} anomalies (baseline)")
     t.add_column("#", justify="right")
     t.add_column("time")
     t.add_column("score", justify="right")
     t.add_column("is_anomaly", justify="right")
-    for k, i in enumerate(idx, start=1):
-        tm = str(out.iloc[int(i)].get("time", ""))
-        t.add_row(str(k), tm, f"{score[int(i)]:.3f}", str(int(pred[int(i)])))
+    for k, (_, score, (tm, pred)) in enumerate(items, start=1):
+        t.add_row(str(k), str(tm), f"{score:.3f}", str(int(pred)))
     console.print(t)
 
-    console.print(f"[green]OK[/green] wrote {out_path} | threshold={model.threshold:.3f} agg={model.agg}")
+    if tail:
+        how = "appended" if reason == "resumed" else f"rescored everything ({reason})"
+        console.print(f"tail: {how}: {n_new} new rows, {n_rows} in total")
+    if registry:
+        console.print(f"[green]OK[/green] wrote {out_path} | registry={reg.source} models_loaded={reg.loads}")
+    else:
+        console.print(f"[green]OK[/green] wrote {out_path} | threshold={model.threshold:.3f} agg={model.agg}")
+    return True
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterator, List, Optional
+
+_EOF = None
+
+def _read_lines(fd: int, q: queue.Queue, block_size: int):
+    # Reads whatever is available (os.read returns early on pipes) and splits lines.
+    buf = b""
+    while True:
+        data = os.read(fd, block_size)
+        if not data:
+            if buf:
+                q.put([buf])
+            q.put(_EOF)
+            return
+        buf += data
+        parts = buf.split(b"\n")
+        buf = parts.pop()
+        if parts:
+            q.put(parts)
+
+def iter_line_batches(
+    fd: int,
+    max_batch: int = 1,
+    max_wait_s: float = 0.0,
+    block_size: int = 1 << 16,
+) -> Iterator[List[str]]:
+    """
+    Yields lists of text lines (without line endings) read from file descriptor `fd`.
+    A batch is emitted as soon as it holds `max_batch` lines or `max_wait_s` has
+    passed since its first line arrived, whichever comes first; with max_wait_s=0
+    only lines that are already buffered are coalesced, so latency is unchanged.
+    Line order is preserved. Reading happens in a background thread behind a bounded
+    queue, so a stalled consumer still back-pressures the upstream pipe.
+    """
+    max_batch = max(1, int(max_batch))
+    q: queue.Queue = queue.Queue(maxsize=64)
+    t = threading.Thread(target=_read_lines, args=(fd, q, block_size), name="sensad-stdin", daemon=True)
+    t.start()
+
+    pending: Deque[bytes] = deque()
+    batch: List[str] = []
+    deadline: Optional[float] = None
+    eof = False
+
+    def take():
+        while pending and len(batch) < max_batch:
+            line = pending.popleft()
+            batch.append(line.decode("utf-8").rstrip("\r"))
+
+    while True:
+        take()
+        if batch and deadline is None:
+            deadline = time.monotonic() + max_wait_s
+        if batch and (len(batch) >= max_batch or eof or time.monotonic() >= deadline):
+            yield batch
+            batch, deadline = [], None
+            continue
+        if eof:
+            return
+        try:
+            # without a pending batch, block until data arrives
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            item = q.get(timeout=timeout) if timeout is None or timeout > 0 else q.get_nowait()
+        except queue.Empty:
+            if batch:
+                yield batch
+                batch, deadline = [], None
+            continue
+        if item is _EOF:
+            eof = True
+        else:
+            pending.extend(item)
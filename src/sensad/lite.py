@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Sequence, Tuple, Union
+
+EPS = 1e-12
+_NAN = float("nan")
+
+# per-sensor parameters: a list in column order, or (older artifacts) {column: value}
+Params = Union[Sequence[float], Dict[str, float]]
+
+def _values(p: Params, columns: List[str]) -> List[float]:
+    if isinstance(p, dict):
+        return [float(p[c]) for c in columns]
+    if len(p) != len(columns):
+        raise ValueError(f"expected {len(columns)} per-sensor values, got {len(p)}")
+    return [float(v) for v in p]
+
+def _f32(values: Sequence[float]) -> List[float]:
+    # round through float32 like the numpy kernel stores its parameters
+    return array("f", values).tolist()
+
+def _sum_f32(z: List[float]) -> float:
+    # float32 sum in the order of numpy's add.reduce (pairwise_sum): 8 running sums
+    # per block of up to 128 values, halves above that; each store rounds to float32
+    n = len(z)
+    if n < 8:
+        acc = array("f", [0.0])
+        for v in z:
+            acc[0] += v
+        return acc[0]
+    if n <= 128:
+        r = array("f", z[:8])
+        m = n - n % 8
+        for i in range(8, m, 8):
+            for j in range(8):
+                r[j] += z[i + j]
+        r = array("f", [r[0] + r[1], r[2] + r[3], r[4] + r[5], r[6] + r[7]])
+        r = array("f", [r[0] + r[1], r[2] + r[3]])
+        acc = array("f", [r[0] + r[1]])
+        for v in z[m:]:
+            acc[0] += v
+        return acc[0]
+    h = n // 2
+    h -= h % 8
+    return array("f", [_sum_f32(z[:h]) + _sum_f32(z[h:])])[0]
+
+class LiteBaseline:
+    """
+    Pure-stdlib baseline_robust_z scorer for edge devices without numpy, or where
+    importing numpy costs too much at cold start. Mirrors CompiledBaseline: every
+    step is rounded to float32 and "mean" sums in numpy's pairwise order, so scores
+    match the numpy kernel bit for bit.
+    """
+
+    def __init__(self, columns: List[str], med: Params, mad: Params, threshold: float, agg: str):
+        self.columns = list(columns)
+        self.threshold = float(threshold)
+        self.agg = agg
+        self._med = _f32(_values(med, self.columns))
+        self._inv = _f32([1.0 / (1.4826 * v + EPS) for v in _values(mad, self.columns)])
+
+    def score_row(self, x: Sequence[float]) -> float:
+        # every step is rounded to float32 (array "f"), matching the numpy kernel
+        d = array("f", [v - m for v, m in zip(array("f", x), self._med)])
+        zs = array("f", [abs(v * s) for v, s in zip(d, self._inv)]).tolist()
+        if any(z != z for z in zs):
+            return _NAN
+        if self.agg == "mean":
+            return _sum_f32(zs) / len(zs)
+        return max(zs)
+
+    def score_rows(self, rows: Sequence[Sequence[float]]) -> Tuple[List[float], List[bool]]:
+        scores = array("f", [self.score_row(x) for x in rows]).tolist()
+        return scores, [s >= self.threshold for s in scores]
+
+def lite_from_config(cfg: dict) -> LiteBaseline:
+    kind = cfg.get("type", "baseline_robust_z")
+    if kind != "baseline_robust_z":
+        raise ValueError(f"Model type {kind} needs numpy; only baseline_robust_z has a pure-Python scorer")
+    if cfg.get("agg", "max") not in ("max", "mean") or cfg.get("weights") is not None:
+        raise ValueError("top-k aggregation and sensor weights need numpy; the pure-Python scorer does max/mean only")
+    if cfg.get("features"):
+        raise ValueError("Models with rolling features need numpy; the pure-Python scorer reads raw sensors only")
+    return LiteBaseline(
+        columns=cfg["columns"],
+        med=cfg["med"],
+        mad=cfg["mad"],
+        threshold=float(cfg["threshold"]),
+        agg=cfg.get("agg", "max"),
+    )
+
+def parse_cells(rows: Sequence[Sequence[str]], idx: Sequence[int]) -> List[List[float]]:
+    """Sensor cells -> floats; missing or unparsable cells become NaN (as in the numpy path)."""
+    out = []
+    for r in rows:
+        vals = []
+        n = len(r)
+        for i in idx:
+            try:
+                vals.append(float(r[i]) if i < n else _NAN)
+            except ValueError:
+                vals.append(_NAN)
+        out.append(vals)
+    return out
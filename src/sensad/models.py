@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from pathlib import Path
+import json
+from typing import Optional, Union
+
+from .ae import AEModel, ae_from_config, ae_to_config
+from .baseline import BaselineModel, param_array
+from .features import FeatureModel, feature_channels
+from .rolling import RollingBaselineModel
+
+Model = Union[BaselineModel, RollingBaselineModel, AEModel, FeatureModel]
+
+def model_from_config(cfg: dict, base: Optional[Path] = None) -> Model:
+    """
+    Builds a model from a baseline.json payload (dispatches on "type"). `base` is
+    the folder of baseline.json; files it references (AE exports) are resolved there.
+    """
+    feats = cfg.get("features")
+    if feats:
+        # feature stage in front of the model: the inner model scores the channels
+        inner = {k: v for k, v in cfg.items() if k != "features"}
+        inner["columns"] = feature_channels(cfg["columns"], feats["kinds"])
+        return FeatureModel(model_from_config(inner, base), cfg["columns"], feats["window"], feats["kinds"], feats["center"])
+    kind = cfg.get("type", "baseline_robust_z")
+    common = dict(
+        columns=cfg["columns"],
+        # lists in column order; older artifacts have {column: value} dicts
+        med=param_array(cfg["med"], cfg["columns"]),
+        mad=param_array(cfg["mad"], cfg["columns"]),
+        threshold=float(cfg["threshold"]),
+        agg=cfg.get("agg", "max"),
+        weights=cfg.get("weights"),
+    )
+    if kind == "baseline_robust_z":
+        return BaselineModel(**common)
+    if kind == "rolling_robust_z":
+        window = int(cfg["window"])
+        return RollingBaselineModel(window=window, min_periods=int(cfg.get("min_periods", window)), **common)
+    if kind == "autoencoder":
+        return ae_from_config(cfg, common, base)
+    raise ValueError(f"Unknown model type: {kind}")
+
+def model_to_config(model: Model) -> dict:
+    """Inverse of model_from_config (without training metadata)."""
+    if isinstance(model, FeatureModel):
+        cfg = model_to_config(model.inner)
+        cfg["columns"] = model.columns
+        cfg["features"] = {"window": model.window, "kinds": model.kinds, "center": model.center}
+        return cfg
+    cfg = {
+        "type": "baseline_robust_z",
+        "columns": model.columns,
+        "med": model.med.tolist(),
+        "mad": model.mad.tolist(),
+        "threshold": model.threshold,
+        "agg": model.agg,
+    }
+    if model.weights is not None:
+        cfg["weights"] = model.weights.tolist()
+    if isinstance(model, RollingBaselineModel):
+        cfg["type"] = "rolling_robust_z"
+        cfg["window"] = model.window
+        cfg["min_periods"] = model.min_periods
+    elif isinstance(model, AEModel):
+        cfg["type"] = "autoencoder"
+        cfg.update(ae_to_config(model))
+    return cfg
+
+def load_model(path: Path) -> Model:
+    path = Path(path)
+    return model_from_config(json.loads(path.read_text(encoding="utf-8")), base=path.parent)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Sequence
+
+# Output stage of the stream scorer. Scored blocks wait in a queue bounded in rows
+# and a writer thread renders and writes them, so a slow stdout consumer no longer
+# stalls reading and scoring directly. When the queue is full, the policy decides:
+#
+#   block        wait for the writer (lossless; the input backs up as before)
+#   drop-normal  drop normal rows, oldest queued block first, then the incoming one
+#   sample       like drop-normal, but keep every `sample_every`-th normal row
+#
+# Anomalies (and blocks without flags, e.g. events) are never dropped: when shedding
+# normal rows does not make room, the scorer waits as with `block`. A block is shed
+# at most once. Rows count against `max_rows` until their write returns, so a stalled
+# writer holds at most `max_rows` rows in total. Standard library only, so the lite
+# engine can use it.
+
+POLICIES = ("block", "drop-normal", "sample")
+
+def _take(seq: Any, idx: List[int]) -> Any:
+    if seq is None:
+        return None
+    if hasattr(seq, "take"):  # numpy array
+        return seq.take(idx, axis=0)
+    return [seq[i] for i in idx]
+
+class Block:
+    """
+    Scored rows waiting for the writer: per-row `fields` and their anomaly `flags`
+    (None = keep all); `tag` is passed through as is (e.g. the model version).
+    """
+
+    __slots__ = ("fields", "flags", "n", "t_in", "tag", "shed")
+
+    def __init__(self, fields: tuple, flags: Optional[Sequence[Any]], n: int, t_in: float, tag: Any = None):
+        self.fields = fields
+        self.flags = flags
+        self.n = n
+        self.t_in = t_in
+        self.tag = tag
+        self.shed = flags is None
+
+class OutputStage:
+    """
+    put() scored blocks from the scoring loop; `write(blocks)` runs on the writer
+    thread with every block queued at that moment (one write + flush per burst),
+    then `on_written(block)` for each of them. close() waits until the queue is
+    written and re-raises a writer error (also raised by the next put()).
+    max_rows=0 writes synchronously in put(), without a thread.
+    """
+
+    def __init__(self, write: Callable[[List[Block]], None], max_rows: int = 65536, policy: str = "block",
+                 sample_every: int = 10, on_written: Optional[Callable[[Block], None]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overload policy '{policy}' (expected one of {', '.join(POLICIES)})")
+        if sample_every < 1:
+            raise ValueError("sample_every must be >= 1")
+        self.write = write
+        self.max_rows = max(0, int(max_rows))
+        self.policy = policy
+        self.sample_every = int(sample_every)
+        self.on_written = on_written
+        self.rows = 0            # rows queued or being written
+        self.dropped = 0         # normal rows dropped by the policy
+        self.blocked_s = 0.0     # time put() waited for room
+        self._normal = 0         # normal rows seen by `sample`
+        self._q: Deque[Block] = deque()
+        self._cv = threading.Condition()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = None
+        if self.max_rows:
+            self._thread = threading.Thread(target=self._run, name="sensad-writer", daemon=True)
+            self._thread.start()
+
+    def _shed(self, b: Block) -> int:
+        # drops the normal rows of b the policy allows to drop; returns how many
+        b.shed = True
+        flags = b.flags.tolist() if hasattr(b.flags, "tolist") else b.flags
+        if self.policy == "sample":
+            keep, k, every = [], self._normal, self.sample_every
+            for i, f in enumerate(flags):
+                if not f:
+                    k += 1
+                    if (k - 1) % every:
+                        continue
+                keep.append(i)
+            self._normal = k
+        else:
+            keep = [i for i, f in enumerate(flags) if f]
+        gone = b.n - len(keep)
+        if gone:
+            b.fields = tuple(_take(f, keep) for f in b.fields)
+            b.flags = _take(b.flags, keep)
+            b.n = len(keep)
+            self.dropped += gone
+        return gone
+
+    def put(self, fields: tuple, flags: Optional[Sequence[Any]], n: int, t_in: float = 0.0, tag: Any = None) -> None:
+        if n <= 0:
+            return
+        b = Block(fields, flags, n, t_in, tag)
+        if self._thread is None:
+            self.write([b])
+            if self.on_written is not None:
+                self.on_written(b)
+            return
+        with self._cv:
+            self._check()
+            if self.rows + b.n > self.max_rows and self.policy != "block":
+                for old in self._q:
+                    if self.rows + b.n <= self.max_rows:
+                        break
+                    if not old.shed:
+                        self.rows -= self._shed(old)
+                if self.rows + b.n > self.max_rows and not b.shed:
+                    self._shed(b)
+            t = 0.0
+            while self.rows and self.rows + b.n > self.max_rows:
+                # a block larger than the whole queue still goes in once the queue is empty
+                if not t:
+                    t = time.perf_counter()
+                self._cv.wait()
+                self._check()
+            if t:
+                self.blocked_s += time.perf_counter() - t
+            if b.n:
+                self._q.append(b)
+                self.rows += b.n
+                self._cv.notify_all()
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._q and not self._closed:
+                    self._cv.wait()
+                if not self._q:
+                    return
+                blocks = list(self._q)
+                self._q.clear()
+            try:
+                self.write(blocks)
+                with self._cv:
+                    # room only once the write returned: a stalled writer still holds its rows
+                    self.rows -= sum(b.n for b in blocks)
+                    self._cv.notify_all()
+                if self.on_written is not None:
+                    for b in blocks:
+                        self.on_written(b)
+            except BaseException as e:  # e.g. BrokenPipeError: surfaces in the scoring loop
+                with self._cv:
+                    self._error = e
+                    self._closed = True
+                    self._q.clear()
+                    self.rows = 0
+                    self._cv.notify_all()
+                return
+
+    def close(self) -> None:
+        if self._thread is not None:
+            with self._cv:
+                self._closed = True
+                self._cv.notify_all()
+            self._thread.join()
+        self._check()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import io
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+_DONE = object()
+
+class _Failed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    # put that gives up once the pipeline is stopping (avoids deadlocks on errors)
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def run_pipeline(source: Iterable[Any], work: Callable[[Any], Any], sink: Callable[[Any], None], depth: int = 2) -> None:
+    """
+    Runs read -> work -> write as three overlapping stages:
+    `source` is iterated in a reader thread, `work` runs in the calling thread and
+    `sink` in a writer thread. At most `depth` items wait between two stages, so
+    memory stays bounded by a few chunks regardless of input size.
+    The first exception raised by any stage is re-raised here.
+    """
+    q_in: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    q_out: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def reader():
+        try:
+            for item in source:
+                if not _put(q_in, item, stop):
+                    return
+        except BaseException as e:  # forwarded to the caller
+            _put(q_in, _Failed(e), stop)
+            return
+        _put(q_in, _DONE, stop)
+
+    def writer():
+        while True:
+            item = q_out.get()
+            if item is _DONE:
+                return
+            if errors:
+                continue  # keep draining so the scoring stage never blocks
+            try:
+                sink(item)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+    tr = threading.Thread(target=reader, name="sensad-reader", daemon=True)
+    tw = threading.Thread(target=writer, name="sensad-writer", daemon=True)
+    tr.start()
+    tw.start()
+    try:
+        while not errors:
+            try:
+                item = q_in.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, _Failed):
+                raise item.exc
+            q_out.put(work(item))
+    finally:
+        q_out.put(_DONE)
+        tw.join()
+        stop.set()
+        tr.join()
+    if errors:
+        raise errors[0]
+
+class TopK:
+    """
+    Running top-k rows by score over a stream of chunks (min-heap of size k).
+    Each chunk is pre-filtered with argpartition, so the cost is O(n + k log k)
+    per chunk instead of a full argsort over all scores. NaN scores are ignored.
+    """
+
+    def __init__(self, k: int = 10):
+        self.k = int(k)
+        self._heap: List[Tuple[float, int, Tuple[Any, ...]]] = []
+
+    def push(self, scores: np.ndarray, offset: int = 0, fields: Sequence[Sequence[Any]] = ()) -> None:
+        """
+        scores: (n,) scores of one chunk whose first row has global index `offset`
+        fields: per-row payload columns (e.g. time, is_anomaly) kept for the top rows
+        """
+        if self.k <= 0 or len(scores) == 0:
+            return
+        s = np.asarray(scores)
+        cand = np.flatnonzero(~np.isnan(s))
+        if len(cand) > self.k:
+            part = np.argpartition(-s[cand], self.k - 1)[: self.k]
+            cand = cand[part]
+        for i in cand:
+            i = int(i)
+            item = (float(s[i]), -(offset + i), tuple(f[i] for f in fields))
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, item)
+            elif item[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, item)
+
+    def items(self) -> List[Tuple[int, float, Tuple[Any, ...]]]:
+        """Returns [(row_index, score, fields)] sorted by descending score."""
+        ordered = sorted(self._heap, key=lambda it: it[:2], reverse=True)
+        return [(-neg_idx, score, fields) for score, neg_idx, fields in ordered]
+
+class _ByteRange(io.RawIOBase):
+    # Read-only view of bytes [start, end) of a file.
+    def __init__(self, path: str, start: int, end: int):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._left = max(0, end - start)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self._left)
+        if n <= 0:
+            return 0
+        got = self._f.readinto(memoryview(b)[:n]) or 0
+        self._left -= got
+        return got
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+def csv_header(path: str) -> Tuple[List[str], int]:
+    """Returns (column names, byte offset of the first data row)."""
+    with open(path, "rb") as f:
+        line = f.readline()
+        return next(csv.reader([line.decode("utf-8").rstrip("\r\n")])), f.tell()
+
+def csv_shards(path: str, n: int) -> List[Tuple[int, int]]:
+    """
+    Splits the data rows of a CSV into up to n contiguous byte ranges that start
+    and end on line boundaries (rows must not contain quoted newlines).
+    """
+    _, start = csv_header(path)
+    size = os.path.getsize(path)
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, max(1, n)):
+            pos = start + (size - start) * i // n
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos - 1)
+            f.readline()  # move to the start of the next line
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def read_csv_range(path: str, start: int, end: int, names: List[str], chunksize: int) -> Iterator[Any]:
+    """Yields DataFrame chunks for the rows stored in bytes [start, end) of a CSV."""
+    import pandas as pd
+
+    with io.BufferedReader(_ByteRange(path, start, end), buffer_size=1 << 20) as fh:
+        yield from pd.read_csv(fh, header=None, names=names, chunksize=chunksize)
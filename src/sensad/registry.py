@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .models import Model, load_model
+
+@dataclass
+class _Entry:
+    model: Model
+    scorer: Any       # compiled (possibly stateful) scorer
+    stamp: Tuple[int, int]
+    checked_at: float
+
+def _resolve_artifact(p: Path) -> Path:
+    return p / "baseline.json" if p.is_dir() else p
+
+def _stamp(p: Path) -> Tuple[int, int]:
+    st = os.stat(p)
+    return st.st_mtime_ns, st.st_size
+
+class ModelRegistry:
+    """
+    Maps device ids to model artifacts and loads them lazily into an LRU cache.
+
+    `source` is either a directory with one run folder per device
+    (<dir>/<device>/baseline.json) or a JSON file {"<device>": "<run folder or
+    baseline.json>"} with paths relative to that file. At most `capacity` models
+    (and their compiled scorers) are kept; the least recently used one is evicted.
+    Artifacts are re-stat'ed at most every `check_interval` seconds and reloaded
+    when they change. Stateful scorers (rolling) keep their windows while cached.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        capacity: int = 64,
+        check_interval: float = 5.0,
+        threshold: Optional[float] = None,
+        agg: Optional[str] = None,
+    ):
+        self.source = Path(source)
+        self.capacity = max(1, int(capacity))
+        self.check_interval = float(check_interval)
+        self.threshold = threshold
+        self.agg = agg
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._mapping: Optional[Dict[str, str]] = None
+        if self.source.is_file():
+            self._mapping = json.loads(self.source.read_text(encoding="utf-8"))
+        elif not self.source.is_dir():
+            raise FileNotFoundError(self.source)
+        self.loads = 0
+        self._warned: set = set()
+
+    def path_for(self, device: str) -> Path:
+        if self._mapping is not None:
+            if device not in self._mapping:
+                raise KeyError(device)
+            return _resolve_artifact(self.source.parent / self._mapping[device])
+        if not device or device in (".", "..") or "/" in device or "\\" in device:
+            raise KeyError(device)
+        p = _resolve_artifact(self.source / device)
+        if not p.exists():
+            raise KeyError(device)
+        return p
+
+    def _load(self, device: str) -> _Entry:
+        path = self.path_for(device)
+        stamp = _stamp(path)
+        model = load_model(path)
+        if self.threshold is not None:
+            model.threshold = float(self.threshold)
+        if self.agg:
+            model.agg = self.agg
+        self.loads += 1
+        return _Entry(model=model, scorer=model.compile(), stamp=stamp, checked_at=time.monotonic())
+
+    def _entry(self, device: str) -> _Entry:
+        entry = self._cache.get(device)
+        now = time.monotonic()
+        if entry is not None:
+            self._cache.move_to_end(device)
+            if now - entry.checked_at >= self.check_interval:
+                entry.checked_at = now
+                try:
+                    changed = _stamp(self.path_for(device)) != entry.stamp
+                except (OSError, KeyError):
+                    changed = False  # keep serving the cached model if the artifact vanished
+                if changed:
+                    entry = self._cache[device] = self._load(device)
+            return entry
+        entry = self._load(device)
+        self._cache[device] = entry
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return entry
+
+    def get(self, device: str) -> Model:
+        return self._entry(device).model
+
+    def scorer(self, device: str):
+        return self._entry(device).scorer
+
+    def predict_grouped(
+        self, devices: Sequence[Any], matrix: Callable[[List[str]], np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores rows from many devices: rows are grouped by device (order kept within
+        a group) and each group is scored in one vectorized call.
+        `matrix(columns)` returns the (n, d) float32 block for those columns.
+        Rows of unknown devices get score NaN and is_anomaly 0.
+        """
+        keys = np.asarray([str(d) for d in devices], dtype=object)
+        n = len(keys)
+        score = np.full(n, np.nan, dtype=np.float32)
+        pred = np.zeros(n, dtype=int)
+        if n == 0:
+            return score, pred
+        uniq, inv = np.unique(keys, return_inverse=True)
+        order = np.argsort(inv, kind="stable")
+        bounds = np.searchsorted(inv[order], np.arange(len(uniq) + 1))
+        blocks: Dict[Tuple[str, ...], np.ndarray] = {}
+        for g, dev in enumerate(uniq):
+            rows = order[bounds[g]:bounds[g + 1]]
+            try:
+                scorer = self.scorer(dev)
+            except KeyError:
+                if dev not in self._warned:
+                    self._warned.add(dev)
+                    print(f"WARN: no model for device {dev!r}; rows left unscored", file=sys.stderr)
+                continue
+            cols = tuple(scorer.columns)
+            if cols not in blocks:
+                blocks[cols] = matrix(list(cols))
+            s, p = scorer.predict(blocks[cols][rows])
+            score[rows] = s
+            pred[rows] = p
+        return score, pred
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+# Hot reload for long-running scorers. A daemon thread re-stats the model artifact
+# every `interval` seconds; when it changed, the new version is parsed, built and
+# checked there, off the hot path. The scoring loop calls take() between batches,
+# swaps in what it returns and calls activate(), so a batch is always scored by one
+# model. A version
+# that fails to load (half-written file, wrong columns, ...) is logged and skipped;
+# the running model keeps scoring. Standard library only (the lite engine uses it).
+
+def artifact_version(data: bytes) -> str:
+    """Short content hash of a model artifact, used as its version."""
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def read_artifact(path: Any) -> Tuple[dict, str]:
+    """(config, version) of a baseline.json, from one read of the file."""
+    data = Path(path).read_bytes()
+    return json.loads(data), artifact_version(data)
+
+def warmup_rows(scorer: Any) -> int:
+    """
+    Rows a freshly built scorer needs before its state matches a long-running one:
+    its rolling / AE window, plus the feature window in front; 0 if stateless.
+    """
+    engine = getattr(scorer, "engine", None)
+    if engine is not None:
+        return engine.window - 1 + warmup_rows(scorer.kernel)
+    return int(getattr(scorer, "window", 0))
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _log(msg: str) -> None:
+    print(msg, file=sys.stderr, flush=True)
+
+class ModelWatcher:
+    """
+    Watches `path` (baseline.json) for the scorer currently running `version`.
+    `build(cfg)` turns a changed artifact into whatever the scorer swaps in; with
+    `columns`, its `.columns` must match them exactly (any exception rejects the
+    version). take() returns (built, version) once per accepted version, else None;
+    activate(version) records the switch once the scorer actually runs it.
+    """
+
+    def __init__(self, path: Any, build: Callable[[dict], Any], version: str, interval: float = 5.0,
+                 columns: Optional[Sequence[str]] = None, log: Callable[[str], None] = _log,
+                 on_reject: Optional[Callable[[str, Exception], None]] = None, start: bool = True):
+        self.path = Path(path)
+        self.build = build
+        self.version = version
+        self.interval = float(interval)
+        self.columns = None if columns is None else list(columns)
+        self.log = log
+        self.on_reject = on_reject
+        self.reloads = 0
+        self.rejected = 0
+        self._seen = version            # last version loaded or rejected: not tried again
+        try:
+            self._stamp: Optional[Tuple[int, int]] = _stamp(self.path)
+        except OSError:
+            self._stamp = None
+        self._pending: Optional[Tuple[Any, str]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if start and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="sensad-reload", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self) -> bool:
+        """One poll (the watcher thread calls it every `interval`); True if a new version is ready."""
+        try:
+            stamp = _stamp(self.path)
+        except OSError:
+            return False  # artifact moved away: keep scoring with the current model
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        version = "?"
+        try:
+            cfg, version = read_artifact(self.path)
+            if version == self._seen:
+                return False
+            self._seen = version
+            built = self.build(cfg)
+            if self.columns is not None and list(built.columns) != self.columns:
+                raise ValueError(f"columns {list(built.columns)} differ from the running model's {self.columns}")
+        except Exception as e:  # noqa: BLE001 - any failure rejects this version only
+            self.rejected += 1
+            self.log(f"reload: rejected {self.path} (version {version}): {e}")
+            if self.on_reject is not None:
+                self.on_reject(version, e)
+            return False
+        with self._lock:
+            self._pending = (built, version)
+        return True
+
+    def take(self) -> Optional[Tuple[Any, str]]:
+        """The new (built, version) to swap in, once; None when nothing changed."""
+        if self._pending is None:
+            return None
+        with self._lock:
+            pending, self._pending = self._pending, None
+        return pending
+
+    def activate(self, version: str, note: str = "") -> None:
+        """Logs and records that the scorer now runs `version` (taken earlier)."""
+        self.log(f"reload: model version {self.version} -> {version} ({self.path}){note}")
+        self.version = version
+        self.reloads += 1
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import os
+import time
+from bisect import bisect_right
+from datetime import datetime
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Iterator, List, Optional
+
+# stdlib only: edge/stream_csv.py uses this without numpy/pandas
+
+class Jitter:
+    """
+    Lateness of each write against the deadline of its oldest row. Per-row mean is
+    exact; percentiles come from a log2 histogram of per-write worst lateness (µs).
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.writes = 0
+        self.late_sum = 0.0
+        self.late_max = 0.0
+        self.hist = [0] * 48
+        self.elapsed = 0.0
+
+    def add(self, rows: int, late_first: float, late_sum: float) -> None:
+        self.rows += rows
+        self.writes += 1
+        self.late_sum += late_sum
+        if late_first > self.late_max:
+            self.late_max = late_first
+        self.hist[min(len(self.hist) - 1, max(0, int(late_first * 1e6)).bit_length())] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (seconds) of the q-quantile of per-write lateness."""
+        if not self.writes:
+            return 0.0
+        need, acc = q * self.writes, 0
+        for b, c in enumerate(self.hist):
+            acc += c
+            if acc >= need:
+                return (1 << b) / 1e6 if b else 0.0
+        return self.late_max
+
+    def summary(self) -> str:
+        rate = self.rows / self.elapsed if self.elapsed > 0 else 0.0
+        mean = self.late_sum / self.rows if self.rows else 0.0
+        return (
+            f"replay: rows={self.rows} writes={self.writes} elapsed={self.elapsed:.3f}s rate={rate:.0f}/s"
+            f" | lateness mean={mean * 1e6:.0f}us p50<={self.percentile(0.5) * 1e6:.0f}us"
+            f" p99<={self.percentile(0.99) * 1e6:.0f}us max={self.late_max * 1e6:.0f}us"
+        )
+
+def _parse_time(raw: bytes) -> float:
+    s = raw.decode("utf-8").strip().strip('"')
+    try:
+        return float(s)
+    except ValueError:
+        return datetime.fromisoformat(s).timestamp()
+
+def read_header(path: str) -> bytes:
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                return line if line.endswith(b"\n") else line + b"\n"
+    return b""
+
+def _line_blocks(path: str, block_rows: int) -> Iterator[List[bytes]]:
+    # data lines (header skipped) in blocks of raw bytes, each ending in "\n"
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                break
+        while True:
+            raw = list(islice(f, block_rows))
+            if not raw:
+                return
+            block = [ln for ln in raw if ln.strip()]
+            if not block:
+                continue
+            if not block[-1].endswith(b"\n"):
+                block[-1] += b"\n"
+            yield block
+
+def _chain(first: List[bytes], rest: Iterator[List[bytes]]) -> Iterator[List[bytes]]:
+    yield first
+    yield from rest
+
+def replay(
+    path: str,
+    out: BinaryIO,
+    rate: float = 1.0,
+    speedup: float = 0.0,
+    loop: bool = False,
+    header: bool = True,
+    block_rows: int = 4096,
+    max_batch: int = 65536,
+    clock: Callable[[], float] = time.perf_counter,
+    sleep: Callable[[float], None] = time.sleep,
+    encoder: Optional[Any] = None,
+) -> Jitter:
+    """
+    Replays a CSV as a live feed. Row i is due at an absolute deadline (i / rate,
+    or its `time` offset / speedup when speedup > 0), so timing errors never
+    accumulate; every wake-up writes all rows that are due in one write.
+    rate <= 0 without speedup replays as fast as the consumer reads.
+    The file is read in small blocks, so memory does not grow with its size and
+    reading never stalls the schedule for long. With an `encoder` (see
+    sensad.wire.BlockEncoder) each block is converted once and rows go out as its
+    frames instead of text lines.
+    """
+    hdr = read_header(path)
+    if not hdr:
+        return Jitter()
+    names = [c.strip().strip('"') for c in hdr.decode("utf-8").rstrip("\r\n").split(",")]
+    cadence = speedup > 0
+    if cadence and "time" not in names:
+        raise ValueError("--speedup replays the 'time' column cadence, but the input has no 'time' column")
+    ti = names.index("time") if cadence else -1
+    throttled = cadence or rate > 0
+    period = 1.0 / rate if rate > 0 else 0.0
+
+    jit = Jitter()
+    base = 0.0       # offset of the current pass (loop)
+    n_done = 0
+    blocks = _line_blocks(path, block_rows)
+    first = next(blocks, None)
+    enc = encoder.block(first) if encoder is not None and first is not None else None
+    t0 = clock()     # the schedule starts once the first block is in memory
+    try:
+        if header:
+            out.write(hdr if encoder is None else encoder.header())
+            out.flush()
+        while first is not None:
+            t_first: Optional[float] = None
+            last_off = prev_off = base
+            for lines in _chain(first, blocks):
+                n = len(lines)
+                if encoder is not None and lines is not first:
+                    enc = encoder.block(lines)
+                if cadence:
+                    offs = []
+                    for ln in lines:
+                        t = _parse_time(ln.split(b",", ti + 1)[ti])
+                        if t_first is None:
+                            t_first = t
+                        # deadlines never go backwards, even if the time column does
+                        prev_off, last_off = last_off, max(last_off, base + (t - t_first) / speedup)
+                        offs.append(last_off)
+                else:
+                    offs = [(n_done + k) * period for k in range(n)]
+                i = 0
+                while i < n:
+                    hi = min(n, i + max_batch)
+                    if throttled:
+                        now = clock() - t0
+                        j = bisect_right(offs, now, i, hi)
+                        if j == i:
+                            sleep(offs[i] - now)
+                            continue
+                    else:
+                        j = hi
+                    out.write(b"".join(lines[i:j]) if encoder is None else encoder.frame(enc, i, j))
+                    out.flush()
+                    if throttled:
+                        t_emit = clock() - t0
+                        jit.add(j - i, t_emit - offs[i], (j - i) * t_emit - sum(offs[i:j]))
+                    else:
+                        jit.add(j - i, 0.0, 0.0)
+                    i = j
+                n_done += n
+            if not loop:
+                break
+            # next pass starts one sample interval after the last row (rate mode
+            # deadlines just continue from the running row count)
+            base = last_off + (last_off - prev_off)
+            blocks = _line_blocks(path, block_rows)
+            first = next(blocks, None)
+            if encoder is not None and first is not None:
+                enc = encoder.block(first)
+    except BrokenPipeError:
+        # the consumer went away (e.g. `| head`): stop quietly
+        try:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        except (OSError, AttributeError, ValueError):
+            pass
+    jit.elapsed = clock() - t0
+    return jit
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Tuple
+import numpy as np
+
+from .baseline import EPS, aggregate, fit_baseline, param_array, weight_array
+
+class SortedWindow:
+    """
+    Order-statistics multiset of floats for one sliding window.
+    Values live in sorted blocks of at most 2*load items; a Fenwick tree over the
+    block sizes finds the block holding the i-th smallest value. add/remove/[i]
+    are O(log w) plus a memmove bounded by the (constant) block size.
+    """
+
+    def __init__(self, load: int = 256):
+        self._load = load
+        self._blocks: List[List[float]] = []
+        self._maxes: List[float] = []
+        self._tree: List[int] = [0]
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _rebuild(self):
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, b in enumerate(self._blocks, start=1):
+            tree[i] += len(b)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _bump(self, pos: int, delta: int):
+        i = pos + 1
+        n = len(self._blocks)
+        while i <= n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def add(self, v: float):
+        if not self._blocks:
+            self._blocks.append([v])
+            self._maxes.append(v)
+            self._rebuild()
+            self._len = 1
+            return
+        pos = bisect_left(self._maxes, v)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._blocks[pos].append(v)
+            self._maxes[pos] = v
+        else:
+            insort(self._blocks[pos], v)
+        self._len += 1
+        block = self._blocks[pos]
+        if len(block) > 2 * self._load:
+            self._blocks[pos:pos + 1] = [block[: self._load], block[self._load:]]
+            self._maxes[pos:pos + 1] = [block[self._load - 1], block[-1]]
+            self._rebuild()
+        else:
+            self._bump(pos, 1)
+
+    def remove(self, v: float):
+        pos = bisect_left(self._maxes, v)
+        block = self._blocks[pos]
+        i = bisect_left(block, v)
+        if i == len(block) or block[i] != v:
+            raise KeyError(v)
+        del block[i]
+        self._len -= 1
+        if not block:
+            del self._blocks[pos]
+            del self._maxes[pos]
+            self._rebuild()
+        else:
+            self._maxes[pos] = block[-1]
+            self._bump(pos, -1)
+
+    def __getitem__(self, k: int) -> float:
+        # Fenwick descent to the block containing the k-th smallest value
+        tree = self._tree
+        pos = 0
+        bit = 1 << (len(self._blocks).bit_length() - 1) if self._blocks else 0
+        while bit:
+            nxt = pos + bit
+            if nxt < len(tree) and tree[nxt] <= k:
+                pos = nxt
+                k -= tree[nxt]
+            bit >>= 1
+        return self._blocks[pos][k]
+
+    def count_le(self, v: float) -> int:
+        """Number of values <= v."""
+        pos = bisect_right(self._maxes, v)
+        i, before = pos, 0
+        while i > 0:
+            before += self._tree[i]
+            i -= i & -i
+        if pos == len(self._blocks):
+            return before
+        return before + bisect_right(self._blocks[pos], v)
+
+    def median(self) -> float:
+        n = self._len
+        if n % 2:
+            return self[n // 2]
+        return 0.5 * (self[n // 2 - 1] + self[n // 2])
+
+    def mad(self, med: float) -> float:
+        """
+        Median of |x - med| without materializing the deviations: the deviations
+        left and right of the median form two sorted sequences, and the k-th
+        smallest of their union is found with O(log w) order-statistic lookups.
+        """
+        n = self._len
+        p = self.count_le(med)
+        left = lambda i: med - self[p - 1 - i]  # noqa: E731
+        right = lambda i: self[p + i] - med  # noqa: E731
+        kth = lambda k: _kth_of_two(left, p, right, n - p, k)  # noqa: E731
+        if n % 2:
+            return kth(n // 2)
+        return 0.5 * (kth(n // 2 - 1) + kth(n // 2))
+
+def _kth_of_two(a, na: int, b, nb: int, k: int) -> float:
+    # k-th smallest (0-based) of the union of sorted sequences a[0:na], b[0:nb]
+    lo, hi = max(0, k + 1 - nb), min(k + 1, na)
+    while lo < hi:
+        i = (lo + hi) // 2
+        j = k + 1 - i
+        if j > 0 and a(i) < b(j - 1):
+            lo = i + 1
+        else:
+            hi = i
+    i, j = lo, k + 1 - lo
+    cand = []
+    if i > 0:
+        cand.append(a(i - 1))
+    if j > 0:
+        cand.append(b(j - 1))
+    return max(cand)
+
+class RollingScorer:
+    """
+    Stateful robust-z scorer over per-sensor sliding windows of the last `window`
+    non-NaN samples. Row t is scored against median/MAD of the window *before* t,
+    then its values enter the window. Until a sensor has `min_periods` samples the
+    trained median/MAD are used. Scoring the same rows in any block partition gives
+    identical results, so batch (one block) and stream (micro-batches) agree.
+    """
+
+    def __init__(self, columns: List[str], med: np.ndarray, mad: np.ndarray, window: int,
+                 min_periods: int, threshold: float, agg: str, weights: Optional[np.ndarray] = None):
+        self.columns = list(columns)
+        self.window = int(window)
+        self.min_periods = int(min_periods)
+        self.threshold = float(threshold)
+        self.agg = agg
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float32)
+        self._med0 = [float(v) for v in med]
+        self._mad0 = [float(v) for v in mad]
+        self._wins = [SortedWindow() for _ in self.columns]
+        self._fifo: List[Deque[float]] = [deque() for _ in self.columns]
+
+    def workspace(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Preallocates (out, work) buffers for blocks of up to n rows."""
+        d = len(self.columns)
+        return np.empty(n, dtype=np.float32), np.empty((n, d), dtype=np.float32)
+
+    def _params(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # per-row (med, 1/(1.4826*mad+eps)) before each row enters the window
+        n, d = X.shape
+        M = np.empty((n, d), dtype=np.float32)
+        S = np.empty((n, d), dtype=np.float64)
+        cols = X.T.tolist()
+        for j in range(d):
+            win, fifo = self._wins[j], self._fifo[j]
+            med0, mad0 = self._med0[j], self._mad0[j]
+            mj, sj = M[:, j], S[:, j]
+            for t, x in enumerate(cols[j]):
+                if len(win) >= max(1, self.min_periods):
+                    m = win.median()
+                    s = max(win.mad(m), 1e-9)
+                else:
+                    m, s = med0, mad0
+                mj[t] = m
+                sj[t] = s
+                if x == x:  # skip NaN
+                    if len(fifo) == self.window:
+                        win.remove(fifo.popleft())
+                    fifo.append(x)
+                    win.add(x)
+        return M, (1.0 / (1.4826 * S + EPS)).astype(np.float32)
+
+    def abs_z(self, X: np.ndarray, work: Optional[np.ndarray] = None) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        M, inv = self._params(X)
+        Z = np.empty(X.shape, dtype=np.float32) if work is None else work[:n]
+        np.subtract(X, M, out=Z)
+        np.multiply(Z, inv, out=Z)
+        np.abs(Z, out=Z)
+        return Z
+
+    def score(self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None) -> np.ndarray:
+        return aggregate(self.abs_z(X, work=work), self.agg, self.weights, out)
+
+    def predict(
+        self, X: np.ndarray, out: Optional[np.ndarray] = None, work: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        score = self.score(X, out=out, work=work)
+        pred = (score >= self.threshold).astype(int)
+        return score, pred
+
+@dataclass
+class RollingBaselineModel:
+    columns: List[str]
+    med: np.ndarray
+    mad: np.ndarray
+    # Sliding window length (samples per sensor) and warm-up before it is used
+    window: int = 600
+    min_periods: int = 600
+    threshold: float = 3.5
+    agg: str = "max"
+    weights: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.med = param_array(self.med, self.columns)
+        self.mad = param_array(self.mad, self.columns)
+        self.weights = weight_array(self.weights, self.columns)
+
+    def compile(self) -> RollingScorer:
+        """Returns a fresh scorer (empty windows); keep it to carry state across blocks."""
+        return RollingScorer(
+            columns=self.columns,
+            med=self.med,
+            mad=self.mad,
+            window=self.window,
+            min_periods=self.min_periods,
+            threshold=self.threshold,
+            agg=self.agg,
+            weights=self.weights,
+        )
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        return self.compile().score(X)
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.compile().predict(X)
+
+def fit_rolling_baseline(
+    X: np.ndarray, columns: List[str], window: int, min_periods: Optional[int] = None, agg: str = "max"
+) -> RollingBaselineModel:
+    """Trained median/MAD seed the windows during warm-up; the threshold is fit separately."""
+    bm = fit_baseline(X, columns=columns, agg=agg)
+    return RollingBaselineModel(
+        columns=columns,
+        med=bm.med,
+        mad=bm.mad,
+        window=int(window),
+        min_periods=int(window if min_periods is None else min_periods),
+        threshold=bm.threshold,
+        agg=agg,
+    )
@@ -0,0 +1,549 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+from rich.console import Console
+
+from .baseline import BaselineModel, parse_agg
+from .models import Model, model_from_config
+from .telemetry import NULL, SIZE_BUCKETS, make_metrics
+
+console = Console(stderr=True)
+
+_READ_BYTES = 65536
+_UDP_MAX_PAYLOAD = 60_000
+
+def _matrix(cells: List[List[str]]) -> np.ndarray:
+    # same conversion as the stdin scorer: empty / unparsable cells become NaN
+    try:
+        return np.array(cells, dtype=np.float32)
+    except ValueError:
+        X = np.empty((len(cells), len(cells[0]) if cells else 0), dtype=np.float32)
+        for k, row in enumerate(cells):
+            for j, v in enumerate(row):
+                try:
+                    X[k, j] = float(v)
+                except ValueError:
+                    X[k, j] = np.nan
+        return X
+
+@dataclass(eq=False)
+class _Conn:
+    id: int
+    idx: List[int]                       # positions of the model columns in a row
+    scorer: Any
+    out: Optional[asyncio.Queue] = None  # TCP: verdict payloads for the writer task
+    addr: Any = None                     # UDP: peer address
+    inflight: int = 0
+    gen: int = 0                         # model generation its scorer was compiled from
+    eof: bool = False
+    failed: bool = False                 # a batch with its rows failed: the feed is closed
+    room: asyncio.Event = field(default_factory=asyncio.Event)
+
+class ScoringServer:
+    """
+    Scores CSV line-protocol feeds from many TCP connections and UDP peers.
+
+    Every feed starts with a header line; each following line is a row and gets a
+    verdict line back (`<row>,<anomaly_score>,<is_anomaly>`, as edge/score_stream.py
+    prints). Rows from all feeds go through one bounded queue and are scored in
+    coalesced batches (up to `max_batch` rows or `max_wait_s`). A TCP connection may
+    have at most `conn_inflight` rows waiting for their verdicts to be written; past
+    that its socket is not read, so a slow client only slows itself down. UDP has no
+    flow control: rows are dropped (and counted) when the queue is full.
+
+    With a `watcher` (sensad.reload.ModelWatcher), new model versions are swapped
+    in between batches; each feed moves to the new model at its next batch (stateful
+    feeds start a fresh window). `version_column` appends the model version to
+    every verdict.
+
+    A batch that fails to score fails the feeds it holds rows of (TCP: an `ERROR`
+    line, then the connection is closed; UDP: the peer must send a header again);
+    the server keeps scoring the others. A failed `sink` write stops the server:
+    wait() returns and `error` holds the exception.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        max_batch: int = 1024,
+        max_wait_s: float = 0.005,
+        queue_items: int = 1024,
+        conn_inflight: int = 4096,
+        only_anomalies: bool = False,
+        sink: Optional[BinaryIO] = None,
+        metrics=NULL,
+        udp_peers: int = 4096,
+        watcher=None,
+        version: str = "",
+        version_column: bool = False,
+    ):
+        self.columns = list(model.columns)
+        self._gen = 0
+        self.watcher = watcher
+        self.version_column = version_column
+        self.swap(model, version or (watcher.version if watcher is not None else ""))
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = float(max_wait_s)
+        self.queue_items = max(1, int(queue_items))
+        self.conn_inflight = max(1, int(conn_inflight))
+        self.only_anomalies = only_anomalies
+        self.sink = sink
+        self.udp_peers = udp_peers
+        self._ids = itertools.count(1)
+        self._queue: Optional[asyncio.Queue] = None
+        self._udp: "OrderedDict[Any, _Conn]" = OrderedDict()
+        self._servers: list = []
+        self._tasks: list = []
+        self._open = 0
+        self._stopped: Optional[asyncio.Event] = None
+        self.error: Optional[BaseException] = None
+
+        self.m_conns = metrics.counter("connections_total", "Connections accepted")
+        metrics.gauge("connections_open", "Open TCP connections", fn=lambda: self._open)
+        self.m_rows = metrics.counter("rows_total", "Rows scored")
+        self.m_anom = metrics.counter("anomalies_total", "Rows flagged as anomalous")
+        self.m_dropped = metrics.counter("udp_dropped_rows_total", "UDP rows dropped (queue full or no header)")
+        self.m_batch = metrics.histogram("batch_rows", "Rows per coalesced batch", buckets=SIZE_BUCKETS)
+        self.m_score = metrics.histogram("stage_seconds", "Time per batch in each stage", stage="score")
+        metrics.gauge("queue_items", "Row chunks waiting to be scored", fn=lambda: self._queue.qsize() if self._queue else 0)
+        metrics.rate("rows_per_second", self.m_rows, "Rows scored per second since the previous scrape")
+        self.m_reload = metrics.counter("model_reloads_total", "New model versions swapped in")
+        self.m_reject = metrics.counter("model_reload_errors_total", "Model versions rejected (unreadable or column mismatch)")
+        self.m_failed = metrics.counter("batch_errors_total", "Batches that failed to score (their feeds were closed)")
+        if watcher is not None:
+            watcher.on_reject = lambda version, e: self.m_reject.inc()
+
+    def swap(self, model: Model, version: str = "") -> None:
+        """Makes `model` the one new batches are scored with (same columns as before)."""
+        if list(model.columns) != self.columns:
+            raise ValueError(f"columns {list(model.columns)} differ from {self.columns}")
+        self.model = model
+        self.version = version
+        self.stateful = not isinstance(model, BaselineModel)  # rolling/AE/features: one state per feed
+        self._shared = None if self.stateful else model.compile()
+        self._suffix = b"," + version.encode() if self.version_column else b""
+        self._gen += 1
+
+    # --- feeds ---------------------------------------------------------------
+
+    def _new_conn(self, header: str, **kw) -> _Conn:
+        names = [c.strip() for c in header.split(",")]
+        missing = [c for c in self.columns if c not in names]
+        if missing:
+            raise ValueError(f"missing columns {missing}")
+        scorer = self.model.compile() if self.stateful else self._shared
+        conn = _Conn(id=next(self._ids), idx=[names.index(c) for c in self.columns], scorer=scorer, gen=self._gen, **kw)
+        conn.room.set()
+        self.m_conns.inc()
+        return conn
+
+    def _verdict_header(self, header: str) -> bytes:
+        return (header + ",anomaly_score,is_anomaly" + (",model_version" if self.version_column else "") + "\n").encode()
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._open += 1
+        conn = None
+        writer_task = None
+        try:
+            buf = b""
+            while conn is None:
+                data = await reader.read(_READ_BYTES)
+                if not data:
+                    return
+                buf += data
+                while b"\n" in buf and conn is None:
+                    line, buf = buf.split(b"\n", 1)
+                    header = line.decode("utf-8", "replace").strip()
+                    if not header:
+                        continue
+                    try:
+                        conn = self._new_conn(header, out=asyncio.Queue())
+                    except ValueError as e:
+                        writer.write(f"ERROR {e}\n".encode())
+                        await writer.drain()
+                        return
+                    writer.write(self._verdict_header(header))
+            writer_task = asyncio.create_task(self._write_verdicts(conn, writer))
+
+            while True:
+                lines = buf.split(b"\n")
+                buf = lines.pop()
+                rows = [ln.rstrip(b"\r") for ln in lines if ln.strip()]
+                if rows:
+                    conn.inflight += len(rows)
+                    if conn.inflight >= self.conn_inflight:
+                        conn.room.clear()
+                    await self._queue.put((conn, rows))
+                # backpressure: stop reading while too many verdicts are pending
+                await conn.room.wait()
+                data = await reader.read(_READ_BYTES)
+                if not data:
+                    if buf.strip():
+                        buf += b"\n"
+                        continue
+                    break
+                buf += data
+            # the feed ended: the writer stops once every queued row has its verdict
+            conn.eof = True
+            if conn.inflight == 0:
+                conn.out.put_nowait(None)
+            await writer_task
+            writer_task = None
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._open -= 1
+            if writer_task is not None:
+                writer_task.cancel()
+            writer.close()
+
+    async def _write_verdicts(self, conn: _Conn, writer: asyncio.StreamWriter):
+        while True:
+            item = await conn.out.get()
+            if item is None:
+                await writer.drain()
+                return
+            if isinstance(item, str):
+                # the feed failed: tell the client, then the reader sees EOF
+                writer.write(f"ERROR {item}\n".encode())
+                await writer.drain()
+                writer.close()
+                return
+            payload, n = item
+            if payload:
+                writer.write(payload)
+                await writer.drain()
+            conn.inflight -= n
+            if conn.inflight < self.conn_inflight:
+                conn.room.set()
+            if conn.eof and conn.inflight == 0:
+                await writer.drain()
+                return
+
+    def _udp_datagram(self, data: bytes, addr: Any):
+        lines = [ln.rstrip(b"\r") for ln in data.split(b"\n") if ln.strip()]
+        conn = self._udp.get(addr)
+        if conn is None:
+            if not lines:
+                return
+            try:
+                conn = self._new_conn(lines[0].decode("utf-8", "replace").strip(), addr=addr)
+            except ValueError:
+                self.m_dropped.inc(len(lines))
+                return
+            self._udp[addr] = conn
+            while len(self._udp) > self.udp_peers:
+                self._udp.popitem(last=False)
+            lines = lines[1:]
+        else:
+            self._udp.move_to_end(addr)
+        if not lines:
+            return
+        try:
+            self._queue.put_nowait((conn, lines))
+        except asyncio.QueueFull:
+            self.m_dropped.inc(len(lines))
+
+    # --- scoring -------------------------------------------------------------
+
+    async def _next_batch(self) -> List[Tuple[_Conn, List[bytes]]]:
+        items = [await self._queue.get()]
+        n = len(items[0][1])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait_s
+        while n < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            n += len(item[1])
+        return items
+
+    def _score_items(self, items: List[Tuple[_Conn, List[bytes]]]):
+        # group by scorer: a shared baseline kernel scores the whole batch in one call
+        groups: Dict[int, List[Tuple[_Conn, List[bytes]]]] = {}
+        for conn, rows in items:
+            if conn.gen != self._gen:
+                # the model was swapped since this feed's last batch
+                conn.scorer = self.model.compile() if self.stateful else self._shared
+                conn.gen = self._gen
+            groups.setdefault(id(conn.scorer), []).append((conn, rows))
+        results = []
+        for group in groups.values():
+            cells = []
+            for conn, rows in group:
+                idx = conn.idx
+                for r in rows:
+                    f = r.split(b",")
+                    cells.append([f[i] if i < len(f) else b"" for i in idx])
+            score, pred = group[0][0].scorer.predict(_matrix(cells))
+            k = 0
+            for conn, rows in group:
+                results.append((conn, rows, score[k:k + len(rows)], pred[k:k + len(rows)]))
+                k += len(rows)
+        return results
+
+    def _emit(self, conn: _Conn, rows: List[bytes], score: np.ndarray, pred: np.ndarray) -> bytes:
+        out = []
+        tag = self._suffix
+        for r, s, p in zip(rows, score.tolist(), pred.tolist()):
+            if self.only_anomalies and not p:
+                continue
+            out.append(b"%s,%.6f,%d%s\n" % (r, s, p, tag))
+        return b"".join(out)
+
+    def _fail(self, conn: _Conn, msg: str) -> None:
+        # closes a feed whose rows could not be scored; rows it still has queued are skipped
+        if conn.failed:
+            return
+        conn.failed = True
+        if conn.out is not None:
+            conn.out.put_nowait(msg)
+            conn.room.set()
+        elif self._udp.get(conn.addr) is conn:
+            del self._udp[conn.addr]
+
+    async def _score_loop(self):
+        clock = time.perf_counter
+        while True:
+            items = [it for it in await self._next_batch() if not it[0].failed]
+            if not items:
+                continue
+            new = None if self.watcher is None else self.watcher.take()
+            if new is not None:
+                # built and checked on the watcher thread; swapped between batches
+                self.swap(*new)
+                self.watcher.activate(new[1], "; stateful feeds start a fresh window" if self.stateful else "")
+                self.m_reload.inc()
+            t0 = clock()
+            try:
+                results = [(conn, rows, self._emit(conn, rows, score, pred), int(pred.sum()))
+                           for conn, rows, score, pred in self._score_items(items)]
+            except Exception as e:  # noqa: BLE001 - one bad batch must not stop the server
+                self.m_failed.inc()
+                console.print(f"[red]ERROR[/red] scoring a batch of {sum(len(r) for _, r in items)} rows failed: {e!r}")
+                for conn, _ in items:
+                    self._fail(conn, f"scoring failed: {e}")
+                continue
+            n_rows = n_anom = 0
+            sink_parts = []
+            for conn, rows, payload, anom in results:
+                n_rows += len(rows)
+                n_anom += anom
+                if conn.out is not None:
+                    conn.out.put_nowait((payload, len(rows)))
+                elif payload and self._udp_transport is not None:
+                    for a in range(0, len(payload), _UDP_MAX_PAYLOAD):
+                        cut = payload.rfind(b"\n", a, a + _UDP_MAX_PAYLOAD) + 1 or len(payload)
+                        self._udp_transport.sendto(payload[a:cut], conn.addr)
+                if self.sink is not None and payload:
+                    tag = b"%d," % conn.id
+                    sink_parts.append(tag + payload[:-1].replace(b"\n", b"\n" + tag) + b"\n")
+            if sink_parts:
+                try:
+                    self.sink.write(b"".join(sink_parts))
+                    self.sink.flush()
+                except OSError as e:
+                    # verdicts can no longer be recorded: stop instead of serving without them
+                    console.print(f"[red]ERROR[/red] writing to the sink failed, stopping: {e}")
+                    self.error = e
+                    self._stopped.set()
+                    return
+            self.m_score.observe(clock() - t0)
+            self.m_batch.observe(n_rows)
+            self.m_rows.inc(n_rows)
+            self.m_anom.inc(n_anom)
+
+    # --- lifecycle -----------------------------------------------------------
+
+    _udp_transport = None
+
+    async def start(self, host: str = "127.0.0.1", tcp_port: Optional[int] = 0, udp_port: Optional[int] = None):
+        """Binds the listeners; returns (tcp_port, udp_port) actually bound (None if off)."""
+        self._queue = asyncio.Queue(maxsize=self.queue_items)
+        self._stopped = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._score_loop()))
+        bound_tcp = bound_udp = None
+        if tcp_port is not None:
+            server = await asyncio.start_server(self._handle_tcp, host, tcp_port, limit=_READ_BYTES)
+            self._servers.append(server)
+            bound_tcp = server.sockets[0].getsockname()[1]
+        if udp_port is not None:
+            srv = self
+
+            class _Udp(asyncio.DatagramProtocol):
+                def datagram_received(self, data, addr):
+                    srv._udp_datagram(data, addr)
+
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(_Udp, local_addr=(host, udp_port))
+            self._udp_transport = transport
+            bound_udp = transport.get_extra_info("sockname")[1]
+        return bound_tcp, bound_udp
+
+    async def wait(self):
+        """Returns when the server stopped on its own (see `error`)."""
+        await self._stopped.wait()
+
+    async def close(self):
+        for s in self._servers:
+            s.close()
+            await s.wait_closed()
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        for t in self._tasks:
+            t.cancel()
+        if self.watcher is not None:
+            self.watcher.close()
+
+# --- test client -----------------------------------------------------------------
+
+async def _client(host: str, port: int, header: bytes, rows: List[bytes], rate: float, stats: Dict[str, float]):
+    reader, writer = await asyncio.open_connection(host, port, limit=_READ_BYTES)
+
+    async def recv():
+        first = await reader.readline()
+        if first.startswith(b"ERROR"):
+            raise RuntimeError(first.decode().strip())
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            stats["verdicts"] += 1
+            if line.rstrip().endswith(b",1"):
+                stats["anomalies"] += 1
+
+    rx = asyncio.create_task(recv())
+    writer.write(header)
+    period = 1.0 / rate if rate > 0 else 0.0
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+    i = 0
+    while i < len(rows):
+        # absolute deadlines; all rows that are due go out in one write
+        j = min(len(rows), int((loop.time() - t0) / period) + 1) if period else len(rows)
+        if j <= i:
+            await asyncio.sleep(i * period - (loop.time() - t0))
+            continue
+        writer.write(b"".join(rows[i:j]))
+        await writer.drain()
+        stats["sent"] += j - i
+        i = j
+    writer.write_eof()
+    await rx
+    writer.close()
+
+async def run_clients(
+    host: str, port: int, input_csv: str, connections: int = 10, rate: float = 100.0, limit: int = 0
+) -> Dict[str, float]:
+    """Opens `connections` concurrent TCP feeds replaying `input_csv`; returns counts."""
+    with open(input_csv, "rb") as f:
+        lines = [ln if ln.endswith(b"\n") else ln + b"\n" for ln in f if ln.strip()]
+    header, rows = lines[0], lines[1:]
+    if limit > 0:
+        rows = rows[:limit]
+    stats = {"connections": connections, "sent": 0, "verdicts": 0, "anomalies": 0}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, header, rows, rate, stats) for _ in range(connections)))
+    stats["elapsed_s"] = time.perf_counter() - t0
+    return stats
+
+# --- entry points ----------------------------------------------------------------
+
+def serve_main(
+    model_path: str,
+    host: str = "127.0.0.1",
+    port: int = 7878,
+    udp_port: int = -1,
+    max_batch: int = 1024,
+    max_wait_ms: float = 5.0,
+    conn_inflight: int = 4096,
+    only_anomalies: bool = False,
+    sink: str = "",
+    threshold: float = -1.0,
+    agg: str = "",
+    metrics_port: int = 0,
+    metrics_file: str = "",
+    reload_interval: float = 5.0,
+    version_column: bool = False,
+) -> bool:
+    """Serves until interrupted; False if the server stopped on an error (e.g. the sink failed)."""
+    from pathlib import Path
+
+    from .reload import ModelWatcher, read_artifact
+
+    mp = Path(model_path)
+    artifact = mp / "baseline.json" if mp.is_dir() else mp
+    if agg:
+        parse_agg(agg)
+
+    def build(cfg: dict) -> Model:
+        model = model_from_config(cfg, base=artifact.parent)
+        if threshold is not None and threshold >= 0:
+            model.threshold = float(threshold)
+        if agg:
+            model.agg = agg
+        return model
+
+    cfg, version = read_artifact(artifact)
+    model = build(cfg)
+
+    async def main():
+        metrics = make_metrics(metrics_port, metrics_file)
+        sink_fh = None
+        if sink == "-":
+            sink_fh = sys.stdout.buffer
+        elif sink:
+            sink_fh = open(sink, "ab")
+        # new versions of the artifact are built on the watcher thread (0 = no hot reload)
+        watcher = ModelWatcher(artifact, build, version, interval=reload_interval, columns=model.columns)
+        server = ScoringServer(
+            model, max_batch=max_batch, max_wait_s=max_wait_ms / 1000.0, conn_inflight=conn_inflight,
+            only_anomalies=only_anomalies, sink=sink_fh, metrics=metrics, watcher=watcher,
+            version_column=version_column,
+        )
+        tcp, udp = await server.start(host, port, udp_port if udp_port >= 0 else None)
+        console.print(
+            f"[green]OK[/green] serving {model_path} on tcp://{host}:{tcp}"
+            + (f" udp://{host}:{udp}" if udp is not None else "")
+            + f" | model version {version} | max_batch={max_batch} max_wait_ms={max_wait_ms}"
+        )
+        try:
+            await server.wait()
+        finally:
+            await server.close()
+            metrics.close()
+            if sink_fh is not None and sink_fh is not sys.stdout.buffer:
+                try:
+                    sink_fh.close()
+                except OSError:
+                    pass  # already reported as server.error
+        return server.error is None
+
+    try:
+        return asyncio.run(main())
+    except KeyboardInterrupt:
+        console.print("stopped")
+        return True
+
+def client_main(input_csv: str, host: str = "127.0.0.1", port: int = 7878, connections: int = 10, rate: float = 100.0, limit: int = 0):
+    stats = asyncio.run(run_clients(host, port, input_csv, connections, rate, limit))
+    rate_out = stats["verdicts"] / stats["elapsed_s"] if stats["elapsed_s"] > 0 else 0.0
+    console.print(
+        f"[green]OK[/green] connections={stats['connections']} sent={stats['sent']} verdicts={stats['verdicts']}"
+        f" anomalies={stats['anomalies']} elapsed={stats['elapsed_s']:.2f}s ({rate_out:,.0f} verdicts/s)"
+    )
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import List, Optional
+import numpy as np
+
+def rank_error(k: int) -> float:
+    """
+    Normalized rank error of a single quantile query for sketch parameter k
+    (empirical KLL bound at 99% confidence, as used by Apache DataSketches).
+    k=200 -> ~1.3%, k=400 -> ~0.7%, k=1000 -> ~0.3%.
+    """
+    return 2.296 / float(k) ** 0.9723
+
+def _weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> np.ndarray:
+    # values (N, d) with NaN = missing, weights (N,) -> (d,)
+    n, d = values.shape
+    if n == 0:
+        return np.full(d, np.nan)
+    order = np.argsort(values, axis=0, kind="stable")  # NaN sorts last
+    v = np.take_along_axis(values, order, axis=0)
+    w = np.where(np.isnan(v), 0.0, weights[order])
+    cum = np.cumsum(w, axis=0)
+    total = cum[-1]
+    idx = np.minimum((cum < q * total).sum(axis=0), n - 1)
+    out = v[idx, np.arange(d)].astype(np.float64)
+    out[total <= 0] = np.nan
+    return out
+
+class QuantileSketch:
+    """
+    Mergeable KLL-style quantile sketch over d columns (one sketch per sensor,
+    compacted together). Level h holds items of weight 2**h; a full level is
+    sorted and every other item (random offset) is promoted to level h+1.
+
+    Memory is about 3*k items per column regardless of the stream length.
+    A quantile query has normalized rank error of about rank_error(k) with 99%
+    confidence, i.e. the returned value has a true rank within q +/- eps.
+    The MAD is the median of |x - median| over the same weighted items, so its
+    rank error is at most about 2*eps. NaNs are ignored (they keep their place
+    in the compactor, which adds at most the same order of error).
+    Sketches built on separate shards merge into a sketch of the union.
+    """
+
+    def __init__(self, d: int, k: int = 400, seed: Optional[int] = None):
+        self.d = int(d)
+        self.k = int(k)
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty((0, self.d), dtype=np.float32)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            buf = self.levels[h]
+            if len(buf) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty((0, self.d), dtype=np.float32))
+                keep = buf[-1:] if len(buf) % 2 else buf[:0]
+                body = np.sort(buf[: len(buf) - len(keep)], axis=0)
+                offset = int(self._rng.integers(0, 2))
+                self.levels[h] = keep.copy()
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], body[offset::2]], axis=0)
+            h += 1
+
+    def update(self, X: np.ndarray) -> "QuantileSketch":
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.d)
+        self.n += len(X)
+        self.levels[0] = np.concatenate([self.levels[0], X], axis=0)
+        self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.d != self.d:
+            raise ValueError(f"Cannot merge sketches over {self.d} and {other.d} columns")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty((0, self.d), dtype=np.float32))
+        for h, buf in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], buf], axis=0)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _items(self):
+        values = np.concatenate(self.levels, axis=0)
+        weights = np.concatenate([np.full(len(b), 2.0 ** h) for h, b in enumerate(self.levels)])
+        return values, weights
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Per-column q-quantile, shape (d,)."""
+        values, weights = self._items()
+        return _weighted_quantile(values, weights, q)
+
+    def median(self) -> np.ndarray:
+        return self.quantile(0.5)
+
+    def mad(self, med: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per-column median absolute deviation around `med` (default: sketch median)."""
+        values, weights = self._items()
+        if med is None:
+            med = _weighted_quantile(values, weights, 0.5)
+        dev = np.abs(values.astype(np.float64) - np.asarray(med, dtype=np.float64))
+        return _weighted_quantile(dev, weights, 0.5)
+
+class RowSample:
+    """
+    Uniform random sample of at most `size` rows (bottom-k by random priority).
+    Mergeable: the union of two samples keeps the `size` lowest priorities, which
+    is again a uniform sample of the combined stream. Used where a statistic
+    depends on whole rows (e.g. the max-|z| score quantile), not just marginals.
+    For a quantile q estimated from m rows the rank standard error is
+    sqrt(q * (1 - q) / m), e.g. ~0.03% for q=0.995 and m=65536.
+    """
+
+    def __init__(self, d: int, size: int = 65536, seed: Optional[int] = None):
+        self.d = int(d)
+        self.size = int(size)
+        self.rows = np.empty((0, self.d), dtype=np.float32)
+        self.keys = np.empty(0, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+
+    def _trim(self, rows: np.ndarray, keys: np.ndarray):
+        if len(keys) > self.size:
+            sel = np.argpartition(keys, self.size - 1)[: self.size]
+            rows, keys = rows[sel], keys[sel]
+        return rows, keys
+
+    def update(self, X: np.ndarray) -> "RowSample":
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.d)
+        rows, keys = self._trim(X, self._rng.random(len(X)))
+        self.rows, self.keys = self._trim(
+            np.concatenate([self.rows, rows], axis=0), np.concatenate([self.keys, keys])
+        )
+        return self
+
+    def merge(self, other: "RowSample") -> "RowSample":
+        self.rows, self.keys = self._trim(
+            np.concatenate([self.rows, other.rows], axis=0), np.concatenate([self.keys, other.keys])
+        )
+        return self
@@ -1,54 +1,39 @@
 from __future__ import annotations
 
-import time
+import sys
 from pathlib import Path
-import pandas as pd
 from rich.console import Console
 
-console = Console()
+from .replay import read_header, replay
 
-def stream_main(input_csv: str, rate_hz: float = 1.0, loop: bool = False, no_header: bool = False):
+# stdout carries the feed; status goes to stderr
+console = Console(stderr=True)
+
+def stream_main(
+    input_csv: str, rate_hz: float = 1.0, loop: bool = False, no_header: bool = False,
+    speedup: float = 0.0, wire: str = "text",
+):
     """
-    Stream a CSV row-by-row to stdout at a fixed rate (simulates edge sensor feed).
+    Stream a CSV to stdout as a live sensor feed: at a fixed rate, or at the
+    cadence of its `time` column scaled by `speedup`. Reports timing jitter.
+    wire="binary" sends sensad.wire frames instead of CSV lines.
     """
     p = Path(input_csv)
     if not p.exists():
         raise FileNotFoundError(p)
+    if wire not in ("text", "binary"):
+        raise ValueError(f"Unknown wire format: {wire} (expected text|binary)")
 
-    df = pd.read_csv(p)
-    if len(df) == 0:
-        return
-
-    # Ensure time col exists; if not, still stream
-    cols = list(df.columns)
-
-    period = 1.0 / max(rate_hz, 1e-6)
-
-    def emit_header():
-        print(",".join(cols), flush=True)
-
-    def emit_row(row):
-        # Keep as CSV line
-        vals = []
-        for c in cols:
-            v = row[c]
-            vals.append("" if pd.isna(v) else str(v))
-        print(",".join(vals), flush=True)
-
-    if not no_header:
-        emit_header()
+    encoder = None
+    if wire == "binary":
+        if no_header:
+            raise ValueError("--wire binary always sends its header frame (drop --no-header)")
+        from .wire import BlockEncoder
 
-    while True:
-        t0 = time.time()
-        for _, row in df.iterrows():
-            emit_row(row)
-            # timing
-            dt = time.time() - t0
-            sleep_s = period - dt
-            if sleep_s > 0:
-                time.sleep(sleep_s)
-            t0 = time.time()
-        if not loop:
-            break
+        names = [c.strip().strip('"') for c in read_header(str(p)).decode("utf-8").rstrip("\r\n").split(",")]
+        encoder = BlockEncoder(names)
 
+    jit = replay(str(p), sys.stdout.buffer, rate=rate_hz, speedup=speedup, loop=loop, header=not no_header,
+                 encoder=encoder)
+    console.print(jit.summary())
     console.print("[green]OK[/green] stream finished")
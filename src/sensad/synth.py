@@ -1,58 +1,230 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import List, Optional, Tuple
 import numpy as np
 import pandas as pd
 from rich.console import Console
 
+from .tabular import EXT, FrameWriter, detect_format
+
 console = Console()
 
-def synth_main(out: str, minutes: int, freq: str, seed: int):
-    """
-    Generates synthetic multi-sensor data with injected anomalies.
-    Writes: train.csv, test.csv (with anomaly labels)
-    """
-    outp = Path(out)
-    outp.mkdir(parents=True, exist_ok=True)
+# sensor families: (name, level, amplitude, period in samples, noise sigma)
+_FAMILIES = [
+    ("temp", 50.0, 2.0, 600, 0.25),
+    ("pressure", 5.0, 0.2, 300, 0.05),
+    ("vibration", 0.8, 0.1, 120, 0.03),
+]
+_LEVEL = np.array([f[1] for f in _FAMILIES], dtype=np.float32)
+_AMP = np.array([f[2] for f in _FAMILIES], dtype=np.float32)
+_PERIOD = np.array([f[3] for f in _FAMILIES], dtype=np.float64)
+_SIGMA = np.array([f[4] for f in _FAMILIES], dtype=np.float32)
+_SPIKE_LEN, _DRIFT_LABEL_LEN, _DROPOUT_LEN = 3, 60, 20
+
+@dataclass
+class _Plan:
+    # everything a worker needs to generate any chunk independently
+    n: int
+    cut: int
+    chunk_rows: int
+    seed: int
+    names: List[str]
+    family: np.ndarray          # (d,) family index per sensor
+    phase: np.ndarray           # (d,) phase offset per sensor
+    start_ns: int
+    step_ns: int
+    spikes: Tuple[np.ndarray, np.ndarray, np.ndarray]    # pos (sorted), sensor, magnitude
+    drifts: Tuple[np.ndarray, np.ndarray, np.ndarray]    # start, sensor, amplitude
+    dropouts: Tuple[np.ndarray, np.ndarray]              # pos (sorted), sensor
+
+def sensor_names(d: int) -> List[str]:
+    """temp, pressure, vibration, temp_1, pressure_1, ..."""
+    return [
+        _FAMILIES[i % 3][0] if i < 3 else f"{_FAMILIES[i % 3][0]}_{i // 3}"
+        for i in range(d)
+    ]
+
+def _make_plan(n: int, d: int, freq: str, seed: int) -> _Plan:
+    if n < 300:
+        raise ValueError("Need at least 300 rows to place anomalies.")
+    rng = np.random.default_rng(np.random.SeedSequence([seed]))
+    family = np.arange(d) % 3
+    phase = np.where(np.arange(d) < 3, 0.0, rng.uniform(0, 2 * np.pi, d))
+    # ~16 MB of float32 per chunk whatever the width; fixed for a given d, so the
+    # output does not depend on the number of workers
+    chunk_rows = max(1024, 4_000_000 // d)
+
+    def pick(fam: int, k: int) -> np.ndarray:
+        cols = np.flatnonzero(family == fam)
+        return rng.choice(cols, k) if len(cols) else np.zeros(0, dtype=int)
+
+    # spikes on temp-like sensors, a drift per pressure-like sensor, dropouts on
+    # vibration-like sensors; counts scale with length (6 / 1 / 3 per hour at 1 Hz)
+    sp_sensor = pick(0, max(6, 6 * n // 3600))
+    sp_pos = rng.integers(50, n - 50, len(sp_sensor))
+    sp_mag = rng.uniform(6, 12, len(sp_sensor))
+    o = np.argsort(sp_pos, kind="stable")
+
+    dr_sensor = np.flatnonzero(family == 1)
+    dr_start = rng.integers(n // 3, n // 2, len(dr_sensor))
+    dr_amp = rng.uniform(0.6, 1.2, len(dr_sensor))
+
+    do_sensor = pick(2, max(3, 3 * n // 3600))
+    do_pos = rng.integers(100, n - 100, len(do_sensor))
+    # keep each gap (plus its two anchor rows) inside one chunk so it can be interpolated locally
+    c = do_pos // chunk_rows
+    c_end = np.minimum((c + 1) * chunk_rows, n)
+    short = (c_end - c * chunk_rows) < _DROPOUT_LEN + 2
+    c = np.where(short, c - 1, c)
+    c_end = np.minimum((c + 1) * chunk_rows, n)
+    do_pos = np.clip(do_pos, c * chunk_rows + 1, c_end - _DROPOUT_LEN - 1)
+    od = np.argsort(do_pos, kind="stable")
+
+    return _Plan(
+        n=n,
+        cut=int(n * 0.8),
+        chunk_rows=chunk_rows,
+        seed=seed,
+        names=sensor_names(d),
+        family=family,
+        phase=phase,
+        start_ns=pd.Timestamp("2026-01-01").value,
+        step_ns=pd.Timedelta(freq).value,
+        spikes=(sp_pos[o], sp_sensor[o], sp_mag[o]),
+        drifts=(dr_start, dr_sensor, dr_amp),
+        dropouts=(do_pos[od], do_sensor[od]),
+    )
 
-    rng = np.random.default_rng(seed)
+def _generate(plan: _Plan, c: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows [c*chunk_rows, ...) -> (time ns, X (m, d) float32, labels)."""
+    a = c * plan.chunk_rows
+    b = min(a + plan.chunk_rows, plan.n)
+    m, d = b - a, len(plan.names)
+    rng = np.random.default_rng(np.random.SeedSequence([plan.seed, c]))
 
-    # timeline
-    dt = pd.date_range("2026-01-01", periods=int((minutes*60)/pd.Timedelta(freq).total_seconds()), freq=freq)
-    n = len(dt)
+    t = np.arange(a, b, dtype=np.float64)[:, None]
+    f = plan.family
+    X = (_LEVEL[f] + _AMP[f] * np.sin(2 * np.pi * t / _PERIOD[f] + plan.phase)).astype(np.float32)
+    X += rng.standard_normal((m, d), dtype=np.float32) * _SIGMA[f]
+    y = np.zeros(m, dtype=np.int8)
 
-    # 3 sensors: temp, pressure, vibration (toy)
-    t = np.arange(n)
-    temp = 50 + 2*np.sin(2*np.pi*t/600) + rng.normal(0, 0.25, n)
-    press = 5 + 0.2*np.sin(2*np.pi*t/300) + rng.normal(0, 0.05, n)
-    vib = 0.8 + 0.1*np.sin(2*np.pi*t/120) + rng.normal(0, 0.03, n)
+    pos, sensor, mag = plan.spikes
+    lo, hi = np.searchsorted(pos, [a - _SPIKE_LEN + 1, b])
+    for k in range(_SPIKE_LEN):
+        r = pos[lo:hi] + k
+        ok = (r >= a) & (r < b)
+        np.add.at(X, (r[ok] - a, sensor[lo:hi][ok]), mag[lo:hi][ok].astype(np.float32))
+        y[r[ok] - a] = 1
 
-    y = np.zeros(n, dtype=int)
+    for s, j, am in zip(*plan.drifts):
+        if s < b:
+            r0 = max(a, s)
+            X[r0 - a:, j] += (am * (np.arange(r0, b) - s) / max(1, plan.n - s - 1)).astype(np.float32)
+            y[r0 - a:max(r0, min(b, s + _DRIFT_LABEL_LEN)) - a] = 1
 
-    # anomalies: spikes, drift, dropouts
-    for _ in range(6):
-        idx = int(rng.integers(50, n-50))
-        temp[idx:idx+3] += rng.uniform(6, 12)
-        y[idx:idx+3] = 1
+    # dropouts are linearly interpolated between the samples around the gap
+    pos, sensor = plan.dropouts
+    lo, hi = np.searchsorted(pos, [a, b])
+    w = (np.arange(1, _DROPOUT_LEN + 1) / (_DROPOUT_LEN + 1)).astype(np.float32)
+    for p, j in zip(pos[lo:hi] - a, sensor[lo:hi]):
+        x0, x1 = X[p - 1, j], X[p + _DROPOUT_LEN, j]
+        X[p:p + _DROPOUT_LEN, j] = x0 + (x1 - x0) * w
+        y[p:p + _DROPOUT_LEN] = 1
 
-    drift_start = int(rng.integers(n//3, n//2))
-    press[drift_start:] += np.linspace(0, rng.uniform(0.6, 1.2), n-drift_start)
-    y[drift_start:drift_start+60] = 1  # mark early drift window as anomaly-ish label
+    times = plan.start_ns + np.arange(a, b, dtype=np.int64) * plan.step_ns
+    return times, X, y
+
+def _frames(plan: _Plan, c: int):
+    times, X, y = _generate(plan, c)
+    df = pd.DataFrame(X, columns=plan.names, copy=False)
+    df.insert(0, "time", pd.to_datetime(times, unit="ns"))
+    df["anomaly"] = y.astype(int)
+    k = max(0, min(len(df), plan.cut - c * plan.chunk_rows))
+    train = df.iloc[:k].drop(columns=["anomaly"]) if k else None
+    test = df.iloc[k:] if k < len(df) else None
+    return train, test
+
+_PLAN: Optional[_Plan] = None
+
+def _init_worker(plan: _Plan):
+    global _PLAN
+    _PLAN = plan
+
+def _chunk_job(c: int, fmt: str):
+    # runs in a worker; CSV text is formatted here so the writer only appends bytes
+    train, test = _frames(_PLAN, c)
+    if fmt == "csv":
+        return tuple(None if f is None else f.to_csv(index=False, header=False) for f in (train, test))
+    return train, test
+
+class _CsvText:
+    def __init__(self, path: Path, header: List[str]):
+        self.header = ",".join(header) + "\n"
+        self.fh = path.open("w", newline="", encoding="utf-8")
+        self.fh.write(self.header)
+
+    def write(self, text: str):
+        self.fh.write(text)
+
+    def close(self):
+        self.fh.close()
+
+def synth_main(
+    out: str, minutes: int, freq: str, seed: int, format: str = "csv",
+    sensors: int = 3, rows: int = 0, workers: int = 1,
+):
+    """
+    Generates synthetic multi-sensor data with injected anomalies.
+    Writes: train.<ext>, test.<ext> (with anomaly labels); ext from `format`
+
+    Data is generated in fixed-size chunks, each from its own seed
+    (SeedSequence([seed, chunk])), and written as it is produced, so memory is
+    bounded and the output is identical for any number of workers.
+    """
+    outp = Path(out)
+    outp.mkdir(parents=True, exist_ok=True)
+    fmt = detect_format("", format or "csv")
+    ext = EXT[fmt]
 
-    for _ in range(3):
-        idx = int(rng.integers(100, n-100))
-        vib[idx:idx+20] = np.nan  # dropout
-        y[idx:idx+20] = 1
+    n = int(rows) if rows and rows > 0 else int((minutes * 60) / pd.Timedelta(freq).total_seconds())
+    plan = _make_plan(n, max(1, int(sensors)), freq, seed)
+    n_chunks = -(-n // plan.chunk_rows)
 
-    df = pd.DataFrame({"time": dt, "temp": temp, "pressure": press, "vibration": vib, "anomaly": y})
-    df = df.interpolate(limit_direction="both")
+    train_path, test_path = outp / f"train{ext}", outp / f"test{ext}"
+    if fmt == "csv":
+        writers = (_CsvText(train_path, ["time"] + plan.names), _CsvText(test_path, ["time"] + plan.names + ["anomaly"]))
+    else:
+        writers = (FrameWriter(train_path, fmt), FrameWriter(test_path, fmt))
 
-    # split: last 20% test
-    cut = int(n*0.8)
-    train = df.iloc[:cut].drop(columns=["anomaly"])
-    test = df.iloc[cut:]
+    def emit(parts):
+        for w, part in zip(writers, parts):
+            if part is not None:
+                w.write(part)
 
-    train.to_csv(outp/"train.csv", index=False)
-    test.to_csv(outp/"test.csv", index=False)
+    try:
+        if workers > 1 and n_chunks > 1:
+            # at most 2 chunks per worker in flight; results are written in chunk order
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plan,)) as ex:
+                pending: deque = deque()
+                for c in range(n_chunks):
+                    pending.append(ex.submit(_chunk_job, c, fmt))
+                    if len(pending) >= 2 * workers:
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+        else:
+            _init_worker(plan)
+            for c in range(n_chunks):
+                emit(_chunk_job(c, fmt))
+    finally:
+        for w in writers:
+            w.close()
 
-    console.print(f"[green]OK[/green] wrote {outp/'train.csv'} and {outp/'test.csv'}  (test includes anomaly labels)")
+    console.print(
+        f"[green]OK[/green] wrote {train_path} and {test_path}  (test includes anomaly labels)"
+        f" | rows={n} sensors={len(plan.names)}"
+    )
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+FORMATS = ("csv", "parquet", "arrow", "npy")
+
+_SUFFIX = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".npy": "npy",
+}
+
+EXT = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "npy": ".npy"}
+
+def detect_format(path: Any, fmt: str = "auto") -> str:
+    """csv | parquet | arrow | npy, from `fmt` or else the file suffix (default csv)."""
+    if fmt and fmt != "auto":
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (expected one of {', '.join(FORMATS)})")
+        return fmt
+    return _SUFFIX.get(Path(path).suffix.lower(), "csv")
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Arrow I/O needs pyarrow (pip install pyarrow)") from e
+    return pa
+
+# --- npy + sidecar schema -------------------------------------------------------
+#
+# <name>.npy             (n, d) float32 matrix of the numeric columns (memory-mappable)
+# <name>.npy.schema.json {"columns": [...], "time": "<name>.time.npy" | null}
+# <name>.time.npy        (n,) int64 timestamps in ns since epoch (optional)
+
+def schema_path(path: Any) -> Path:
+    p = Path(path)
+    return p.with_name(p.name + ".schema.json")
+
+def _npy_schema(path: Any) -> dict:
+    sp = schema_path(path)
+    if not sp.exists():
+        raise FileNotFoundError(f"Missing column schema {sp} for {path}")
+    return json.loads(sp.read_text(encoding="utf-8"))
+
+def _npy_open(path: Any) -> Tuple[np.ndarray, dict, Optional[np.ndarray]]:
+    schema = _npy_schema(path)
+    M = np.load(path, mmap_mode="r")
+    t = None
+    if schema.get("time"):
+        t = np.load(Path(path).with_name(schema["time"]), mmap_mode="r")
+    return M, schema, t
+
+class _NpyStreamWriter:
+    # Appends rows to a .npy file; the header is rewritten with the final shape on close.
+    _HEADER_BYTES = 128
+
+    def __init__(self, path: Path, dtype: str, width: Optional[int]):
+        self.path = path
+        self.dtype = dtype
+        self.width = width
+        self.n = 0
+        self._f = open(path, "wb")
+        self._f.write(self._header())
+
+    def _header(self) -> bytes:
+        shape = (self.n,) if self.width is None else (self.n, self.width)
+        d = "{'descr': '%s', 'fortran_order': False, 'shape': %r, }" % (self.dtype, shape)
+        body = d.ljust(self._HEADER_BYTES - 10 - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(body)) + body.encode("latin1")
+
+    def write(self, a: np.ndarray):
+        self._f.write(np.ascontiguousarray(a).tobytes())
+        self.n += len(a)
+
+    def close(self):
+        self._f.seek(0)
+        self._f.write(self._header())
+        self._f.close()
+
+# --- readers --------------------------------------------------------------------
+
+def read_columns(path: Any, fmt: str = "auto") -> List[str]:
+    """Column names without reading the data."""
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        import pandas as pd
+
+        return list(pd.read_csv(path, nrows=0).columns)
+    if fmt == "npy":
+        schema = _npy_schema(path)
+        return (["time"] if schema.get("time") else []) + list(schema["columns"])
+    pa = _pyarrow()
+    if fmt == "parquet":
+        return list(pa.parquet.ParquetFile(path).schema_arrow.names)
+    with pa.memory_map(str(path)) as src:
+        return list(pa.ipc.open_file(src).schema.names)
+
+def _table_to_matrix(table, columns: List[str]) -> np.ndarray:
+    # one copy per column straight into the float32 result (no pandas in between);
+    # nulls become NaN
+    M = np.empty((table.num_rows, len(columns)), dtype=np.float32, order="F")
+    for j, c in enumerate(columns):
+        M[:, j] = table.column(c).to_numpy(zero_copy_only=False)
+    return M
+
+def read_matrix(path: Any, columns: List[str], fmt: str = "auto") -> np.ndarray:
+    """
+    Reads only `columns` as an (n, d) float32 matrix. For npy files this is a
+    memory-mapped view when the columns are stored contiguously (no copy);
+    Parquet/Arrow columns are converted directly into the result array.
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        import pandas as pd
+
+        df = pd.read_csv(path, usecols=columns, dtype={c: np.float32 for c in columns})
+        return df[columns].to_numpy(dtype=np.float32)
+    if fmt == "npy":
+        M, schema, _ = _npy_open(path)
+        stored = list(schema["columns"])
+        missing = [c for c in columns if c not in stored]
+        if missing:
+            raise ValueError(f"Columns {missing} not in {path}")
+        idx = [stored.index(c) for c in columns]
+        if idx == list(range(idx[0], idx[0] + len(idx))):
+            return M[:, idx[0]:idx[0] + len(idx)]
+        return np.asarray(M[:, idx])
+    pa = _pyarrow()
+    if fmt == "parquet":
+        return _table_to_matrix(pa.parquet.read_table(path, columns=columns), columns)
+    with pa.memory_map(str(path)) as src:
+        return _table_to_matrix(pa.ipc.open_file(src).read_all().select(columns), columns)
+
+def _npy_frame(M: np.ndarray, schema: dict, t: Optional[np.ndarray], rows: slice, columns: Optional[List[str]]):
+    import pandas as pd
+
+    stored = list(schema["columns"])
+    want = stored if columns is None else [c for c in columns if c in stored]
+    data = {}
+    if t is not None and (columns is None or "time" in columns):
+        data["time"] = pd.to_datetime(np.asarray(t[rows]), unit="ns")
+    for c in want:
+        data[c] = np.asarray(M[rows, stored.index(c)])
+    return pd.DataFrame(data)
+
+def read_frame(path: Any, columns: Optional[List[str]] = None, fmt: str = "auto"):
+    """Reads a whole table as a DataFrame (optionally only `columns`)."""
+    import pandas as pd
+
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        return pd.read_csv(path, usecols=columns)
+    if fmt == "npy":
+        M, schema, t = _npy_open(path)
+        return _npy_frame(M, schema, t, slice(None), columns)
+    pa = _pyarrow()
+    if fmt == "parquet":
+        return pa.parquet.read_table(path, columns=columns).to_pandas()
+    with pa.memory_map(str(path)) as src:
+        table = pa.ipc.open_file(src).read_all()
+        return (table if columns is None else table.select(columns)).to_pandas()
+
+def iter_frames(path: Any, chunksize: int, columns: Optional[List[str]] = None, fmt: str = "auto") -> Iterator[Any]:
+    """Yields DataFrame chunks of about `chunksize` rows."""
+    import pandas as pd
+
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+        return
+    if fmt == "npy":
+        M, schema, t = _npy_open(path)
+        for a in range(0, len(M), chunksize):
+            yield _npy_frame(M, schema, t, slice(a, a + chunksize), columns)
+        return
+    pa = _pyarrow()
+    if fmt == "parquet":
+        pf = pa.parquet.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    with pa.memory_map(str(path)) as src:
+        reader = pa.ipc.open_file(src)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for a in range(0, batch.num_rows, chunksize):
+                yield batch.slice(a, chunksize).to_pandas()
+
+# --- shards (parallel single-pass readers) --------------------------------------
+
+def shard_ranges(path: Any, n: int, fmt: str = "auto") -> List[Tuple[int, int]]:
+    """
+    Splits a table into at most `n` contiguous [start, end) shards. Units depend on
+    the format: bytes (csv, line-aligned), rows (npy), row groups (parquet),
+    record batches (arrow).
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        from .pipeline import csv_shards
+
+        return csv_shards(str(path), n)
+    if fmt == "npy":
+        total = len(np.load(path, mmap_mode="r"))
+    else:
+        pa = _pyarrow()
+        if fmt == "parquet":
+            total = pa.parquet.ParquetFile(path).num_row_groups
+        else:
+            with pa.memory_map(str(path)) as src:
+                total = pa.ipc.open_file(src).num_record_batches
+    n = max(1, min(int(n), total))
+    bounds = np.linspace(0, total, n + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+def iter_shard(path: Any, start: int, end: int, columns: List[str], chunksize: int, fmt: str = "auto") -> Iterator[np.ndarray]:
+    """Yields (m, d) float32 blocks of `columns` for one shard from shard_ranges."""
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        from .pipeline import csv_header, read_csv_range
+
+        names, _ = csv_header(str(path))
+        for chunk in read_csv_range(str(path), start, end, names, chunksize):
+            yield chunk[columns].to_numpy(dtype=np.float32)
+        return
+    if fmt == "npy":
+        M = read_matrix(path, columns, fmt)
+        for a in range(start, end, chunksize):
+            yield M[a:min(a + chunksize, end)]
+        return
+    pa = _pyarrow()
+    if fmt == "parquet":
+        pf = pa.parquet.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, row_groups=list(range(start, end)), columns=columns):
+            yield _table_to_matrix(batch, columns)
+        return
+    with pa.memory_map(str(path)) as src:
+        reader = pa.ipc.open_file(src)
+        for i in range(start, end):
+            batch = reader.get_batch(i)
+            for a in range(0, batch.num_rows, chunksize):
+                yield _table_to_matrix(batch.slice(a, chunksize), columns)
+
+# --- writers --------------------------------------------------------------------
+
+class FrameWriter:
+    """
+    Appends DataFrame chunks to a csv / parquet / arrow / npy file.
+    Use as a context manager; the first chunk fixes the schema. `append` (csv only)
+    adds rows to an existing file without writing the header again.
+    """
+
+    def __init__(self, path: Any, fmt: str = "auto", append: bool = False):
+        self.path = Path(path)
+        self.fmt = detect_format(path, fmt)
+        if append and self.fmt != "csv":
+            raise ValueError("Appending is supported for csv output only")
+        self.append = append
+        self._fh = None
+        self._writer = None
+        self._schema = None
+        self._npy: Optional[_NpyStreamWriter] = None
+        self._npy_time: Optional[_NpyStreamWriter] = None
+        self._columns: Optional[List[str]] = None
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df) -> None:
+        if self.fmt == "csv":
+            first = self._fh is None
+            if first:
+                self._fh = self.path.open("a" if self.append else "w", newline="", encoding="utf-8")
+            df.to_csv(self._fh, index=False, header=first and not self.append)
+        elif self.fmt == "npy":
+            self._write_npy(df)
+        else:
+            pa = _pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is not None:
+                # later chunks may infer different dtypes (e.g. int vs float with NaN)
+                table = table.cast(self._schema)
+            else:
+                self._schema = table.schema
+                if self.fmt == "parquet":
+                    self._writer = pa.parquet.ParquetWriter(str(self.path), table.schema)
+                else:
+                    self._fh = pa.OSFile(str(self.path), "wb")
+                    self._writer = pa.ipc.new_file(self._fh, table.schema)
+            self._writer.write_table(table)
+
+    def _write_npy(self, df) -> None:
+        import pandas as pd
+
+        has_time = "time" in df.columns
+        cols = [c for c in df.columns if c != "time"]
+        if self._npy is None:
+            bad = [c for c in cols if not pd.api.types.is_numeric_dtype(df[c])]
+            if bad:
+                raise ValueError(f"npy output supports numeric columns only (got {bad})")
+            self._columns = cols
+            self._npy = _NpyStreamWriter(self.path, "<f4", len(cols))
+            if has_time:
+                self._npy_time = _NpyStreamWriter(self.path.with_name(self.path.stem + ".time.npy"), "<i8", None)
+        self._npy.write(df[self._columns].to_numpy(dtype=np.float32))
+        if self._npy_time is not None:
+            t = pd.to_datetime(df["time"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            self._npy_time.write(t)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self._npy is not None:
+            self._npy.close()
+            schema = {
+                "columns": self._columns,
+                "dtype": "float32",
+                "time": self._npy_time.path.name if self._npy_time is not None else None,
+            }
+            if self._npy_time is not None:
+                self._npy_time.close()
+            schema_path(self.path).write_text(json.dumps(schema, indent=2), encoding="utf-8")
+            self._npy = self._npy_time = None
+
+def write_frame(df, path: Any, fmt: str = "auto") -> None:
+    with FrameWriter(path, fmt) as w:
+        w.write(df)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .models import Model, model_to_config
+
+# Checkpoint for `sensad infer --tail` (append-only CSV input, CSV output):
+#
+# <out>.checkpoint.json  {"version": 1, "model": sha256, "input": {...}, "offset": bytes,
+#                         "rows": n, "output_bytes": size of <out>, "state": file name | null}
+# <out>.checkpoint.state pickled scorer state at `offset` (stateful models only)
+#
+# A run resumes at `offset` only if everything still matches; otherwise it rescores
+# the whole file. Only complete lines are consumed, so a row that is still being
+# written is picked up by the next run.
+
+VERSION = 1
+_HEAD_BYTES = 64 << 10  # identity: hash of the first bytes (header + first rows) ...
+_EDGE_BYTES = 4 << 10   # ... and of the bytes just before the offset
+
+def checkpoint_path(out_path: Any) -> Path:
+    p = Path(out_path)
+    return p.with_name(p.name + ".checkpoint.json")
+
+def model_fingerprint(model: Model) -> str:
+    """sha256 of the canonical model config (threshold and agg overrides included)."""
+    body = json.dumps(model_to_config(model), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+def _sha(f, start: int, end: int) -> str:
+    f.seek(start)
+    return hashlib.sha256(f.read(max(0, end - start))).hexdigest()
+
+def file_identity(path: Any, offset: int) -> Dict[str, Any]:
+    """Device/inode plus hashes of the head and of the bytes ending at `offset`."""
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        return {
+            "path": str(Path(path).resolve()),
+            "dev": st.st_dev,
+            "ino": st.st_ino,
+            "head": _sha(f, 0, min(offset, _HEAD_BYTES)),
+            "edge": _sha(f, max(0, offset - _EDGE_BYTES), offset),
+        }
+
+def complete_end(path: Any, start: int) -> int:
+    """Byte offset just past the last newline at or after `start` (`start` if none)."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = size
+        while pos > start:
+            a = max(start, pos - (1 << 16))
+            f.seek(a)
+            k = f.read(pos - a).rfind(b"\n")
+            if k >= 0:
+                return a + k + 1
+            pos = a
+    return start
+
+def load_checkpoint(out_path: Any) -> Optional[Dict[str, Any]]:
+    p = checkpoint_path(out_path)
+    try:
+        ck = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return ck if isinstance(ck, dict) and ck.get("version") == VERSION else None
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def save_checkpoint(out_path: Any, ck: Dict[str, Any], kernel: Any = None) -> None:
+    """Writes the state file (if `kernel` is given), then the checkpoint itself."""
+    ck = dict(ck, version=VERSION, state=None)
+    if kernel is not None:
+        sp = checkpoint_path(out_path).with_suffix(".state")
+        # instance attributes except functions (an AE forward pass is rebuilt by compile())
+        state = {k: v for k, v in vars(kernel).items() if not callable(v)}
+        _write_atomic(sp, pickle.dumps({"offset": ck["offset"], "state": state}, protocol=pickle.HIGHEST_PROTOCOL))
+        ck["state"] = sp.name
+    _write_atomic(checkpoint_path(out_path), json.dumps(ck, indent=2).encode("utf-8"))
+
+def resume_point(
+    ck: Optional[Dict[str, Any]], model: Model, input_path: Any, out_path: Any, stateful: bool,
+) -> Tuple[int, int, Any, str]:
+    """
+    (offset, rows, scorer, reason): where to continue and a scorer carrying the
+    state at that offset. offset 0 means rescore everything; `reason` says why.
+    """
+    kernel = model.compile()
+    if ck is None:
+        return 0, 0, kernel, "no checkpoint"
+    if ck.get("model") != model_fingerprint(model):
+        return 0, 0, kernel, "model changed"
+    offset = int(ck.get("offset", 0))
+    out_path = Path(out_path)
+    if not out_path.exists() or out_path.stat().st_size != ck.get("output_bytes"):
+        return 0, 0, kernel, "output changed"
+    if os.path.getsize(input_path) < offset:
+        return 0, 0, kernel, "input truncated"
+    if file_identity(input_path, offset) != ck.get("input"):
+        return 0, 0, kernel, "input replaced or rewritten"
+    if stateful:
+        sp = out_path.with_name(ck["state"]) if ck.get("state") else None
+        try:
+            with open(sp, "rb") as f:
+                saved = pickle.load(f)
+        except (TypeError, OSError, pickle.UnpicklingError, EOFError):
+            return 0, 0, kernel, "scorer state missing"
+        if saved.get("offset") != offset:
+            return 0, 0, kernel, "scorer state out of date"
+        vars(kernel).update(saved["state"])
+    return offset, int(ck.get("rows", 0)), kernel, "resumed"
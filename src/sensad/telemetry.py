@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# stdlib only (the lite stream scorer uses it); http.server is imported only when serving.
+
+# seconds: 10 µs .. 10 s
+LATENCY_BUCKETS = (1e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+def _labels(labels: Dict[str, str], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels.items()]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, labels: Dict[str, str]):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+    def samples(self, name: str) -> List[str]:
+        return [f"{name}{_labels(self.labels)} {self.value}"]
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, labels: Dict[str, str], fn: Optional[Callable[[], float]] = None):
+        self.labels = labels
+        self.value = 0.0
+        self._fn = fn
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def samples(self, name: str) -> List[str]:
+        v = self._fn() if self._fn is not None else self.value
+        return [f"{name}{_labels(self.labels)} {v:.6g}"]
+
+class Histogram:
+    """Fixed buckets: memory stays constant however many values are observed."""
+
+    kind = "histogram"
+
+    def __init__(self, labels: Dict[str, str], buckets: Sequence[float]):
+        self.labels = labels
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def samples(self, name: str) -> List[str]:
+        out, acc = [], 0
+        for b, c in zip(self.bounds + (float("inf"),), self.counts):
+            acc += c
+            le = 'le="+Inf"' if b == float("inf") else f'le="{b:g}"'
+            out.append(f"{name}_bucket{_labels(self.labels, le)} {acc}")
+        out.append(f"{name}_sum{_labels(self.labels)} {self.sum:.6g}")
+        out.append(f"{name}_count{_labels(self.labels)} {self.count}")
+        return out
+
+class Metrics:
+    """
+    A small Prometheus-style registry. Metrics are created once, outside the hot
+    loop, and updated with plain attribute arithmetic; `render()` produces the
+    text exposition format.
+    """
+
+    enabled = True
+
+    def __init__(self, prefix: str = "sensad"):
+        self.prefix = prefix
+        self._families: Dict[str, Tuple[str, str, list]] = {}
+        self._exporters: list = []
+        self.started = time.time()
+        self.gauge("uptime_seconds", "Seconds since start", fn=lambda: time.time() - self.started)
+
+    def _add(self, name: str, help: str, metric):
+        full = f"{self.prefix}_{name}"
+        fam = self._families.setdefault(full, (metric.kind, help, []))
+        fam[2].append(metric)
+        return metric
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        return self._add(name, help, Counter(labels))
+
+    def gauge(self, name: str, help: str = "", fn: Optional[Callable[[], float]] = None, **labels: str) -> Gauge:
+        return self._add(name, help, Gauge(labels, fn))
+
+    def histogram(self, name: str, help: str = "", buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str) -> Histogram:
+        return self._add(name, help, Histogram(labels, buckets))
+
+    def rate(self, name: str, counter: Counter, help: str = "") -> Gauge:
+        """Gauge with the per-second increase of `counter` since the previous scrape."""
+        last = [time.monotonic(), counter.value]
+
+        def value() -> float:
+            now, v = time.monotonic(), counter.value
+            dt = now - last[0]
+            r = (v - last[1]) / dt if dt > 0 else 0.0
+            last[0], last[1] = now, v
+            return r
+
+        return self.gauge(name, help, fn=value)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help, metrics) in self._families.items():
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for m in metrics:
+                lines.extend(m.samples(name))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        # atomic replace, so a scraper never reads a half-written file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def close(self) -> None:
+        for stop in self._exporters:
+            stop()
+        self._exporters.clear()
+
+class _NullMetric:
+    value = 0
+    count = 0
+
+    def inc(self, n: float = 1) -> None:
+        pass
+
+    def set(self, v: float) -> None:
+        pass
+
+    def observe(self, v: float) -> None:
+        pass
+
+class NullMetrics:
+    """Disabled telemetry: every metric is a shared no-op object."""
+
+    enabled = False
+    _metric = _NullMetric()
+
+    def counter(self, *a, **k):
+        return self._metric
+
+    gauge = histogram = counter
+
+    def rate(self, *a, **k):
+        return self._metric
+
+    def render(self) -> str:
+        return ""
+
+    def close(self) -> None:
+        pass
+
+NULL = NullMetrics()
+
+def timed_iter(iterable: Iterable[Any], hist) -> Iterator[Any]:
+    """Yields from `iterable`, observing the time each item took to produce."""
+    it = iter(iterable)
+    clock = time.perf_counter
+    while True:
+        t0 = clock()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        hist.observe(clock() - t0)
+        yield item
+
+def serve_http(metrics: Metrics, port: int, host: str = "127.0.0.1") -> int:
+    """Serves GET /metrics on host:port from a daemon thread; returns the bound port."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+
+    metrics._exporters.append(stop)
+    return server.server_address[1]
+
+def write_periodically(metrics: Metrics, path: str, interval: float = 5.0) -> None:
+    """Rewrites `path` every `interval` seconds and once more on close()."""
+    done = threading.Event()
+
+    def loop():
+        while not done.wait(interval):
+            metrics.write(path)
+
+    threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+
+    def stop():
+        done.set()
+        metrics.write(path)
+
+    metrics._exporters.append(stop)
+
+def make_metrics(port: int = 0, path: str = "", interval: float = 5.0, host: str = "127.0.0.1"):
+    """Metrics exported over HTTP and/or to a file, or NULL when neither is set."""
+    if not port and not path:
+        return NULL
+    metrics = Metrics()
+    if port:
+        serve_http(metrics, port, host)
+    if path:
+        write_periodically(metrics, path, interval)
+    return metrics
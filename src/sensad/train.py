@@ -1,46 +1,186 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import json
-import pandas as pd
+import time
+from typing import List, Optional, Tuple
 import numpy as np
 from rich.console import Console
 
-from .baseline import fit_baseline, choose_threshold_from_train
+from .ae import fit_ae
+from .baseline import fit_baseline, fit_baseline_sketch, choose_threshold_from_train
+from .features import FeatureModel, RollingFeatures, feature_channels, parse_kinds
+from .models import Model, model_to_config
+from .rolling import fit_rolling_baseline
+from .sketch import QuantileSketch, RowSample, rank_error
+from .tabular import detect_format, iter_shard, read_columns, read_matrix, shard_ranges
+from .telemetry import make_metrics
 
 console = Console()
 
-def train_main(data: str, out: str, model: str, device: str):
+def _sketch_shard(
+    data: str, fmt: str, start: int, end: int, cols: List[str],
+    chunksize: int, k: int, sample_rows: int, seed: int, features: Optional[dict] = None,
+) -> Tuple[QuantileSketch, RowSample, Optional[np.ndarray]]:
+    # one pass over a shard of the input; runs in a worker process
+    width = len(feature_channels(cols, features["kinds"])) if features else len(cols)
+    sketch = QuantileSketch(width, k=k, seed=seed)
+    sample = RowSample(width, size=sample_rows, seed=seed + 1)
+    engine = center = None
+    for X in iter_shard(data, start, end, cols, chunksize, fmt):
+        if features:
+            if engine is None:
+                # centring only conditions the running sums; the first chunk is close enough
+                center = np.nan_to_num(np.nanmedian(X, axis=0))
+                engine = RollingFeatures(len(cols), features["window"], features["kinds"], center)
+            warm = engine.warmup_remaining
+            X = engine.transform(X)[warm:]  # fit on full windows only
+        sketch.update(X)
+        sample.update(X)
+    return sketch, sample, center
+
+def _fit_streaming(
+    data: str, fmt: str, cols: List[str], q: float,
+    chunksize: int, workers: int, k: int, sample_rows: int, features: Optional[dict] = None,
+) -> Tuple[Model, int]:
+    """
+    Single pass over the input in bounded memory: per-sensor median/MAD from mergeable
+    quantile sketches, threshold from a uniform row sample. With workers > 1 the file
+    is split into shards that are sketched in a process pool and merged.
+    """
+    shards = shard_ranges(data, max(1, workers), fmt)
+    jobs = [(data, fmt, a, b, cols, chunksize, k, sample_rows, 1000 + 2 * i, features) for i, (a, b) in enumerate(shards)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_sketch_shard, *zip(*jobs)))
+    else:
+        parts = [_sketch_shard(*j) for j in jobs]
+
+    sketch, sample, center = parts[0]
+    for sk, sa, _ in parts[1:]:
+        sketch.merge(sk)
+        sample.merge(sa)
+
+    channels = feature_channels(cols, features["kinds"]) if features else cols
+    bm = fit_baseline_sketch(sketch, columns=channels, agg="max")
+    # the sample holds feature rows already, so the inner model sets the threshold
+    bm.threshold = choose_threshold_from_train(bm, sample.rows, q=q)
+    if features:
+        bm = FeatureModel(bm, cols, features["window"], features["kinds"], center)
+    return bm, sketch.n
+
+def train_main(
+    data: str,
+    out: str,
+    model: str,
+    device: str,
+    streaming: bool = False,
+    chunksize: int = 100_000,
+    workers: int = 1,
+    sketch_k: int = 400,
+    sample_rows: int = 65536,
+    window: int = 600,
+    min_periods: int = -1,
+    format: str = "auto",
+    metrics_port: int = 0,
+    metrics_file: str = "",
+    ae_window: int = 16,
+    epochs: int = 10,
+    hidden: int = 64,
+    latent: int = 8,
+    features: str = "",
+    feature_window: int = 60,
+):
+    metrics = make_metrics(metrics_port, metrics_file)
+    ae_params = {"window": ae_window, "epochs": epochs, "hidden": hidden, "latent": latent}
+    feats = {"window": int(feature_window), "kinds": parse_kinds(features)} if features else None
+    try:
+        _train(data, out, model, device, streaming, chunksize, workers, sketch_k, sample_rows,
+               window, min_periods, format, metrics, ae_params, feats)
+    finally:
+        metrics.close()
+
+def _train(data, out, model, device, streaming, chunksize, workers, sketch_k, sample_rows,
+           window, min_periods, format, metrics, ae_params, feats):
     outp = Path(out)
     outp.mkdir(parents=True, exist_ok=True)
+    q = 0.995
+    fmt = detect_format(data, format)
+    m_rows = metrics.counter("train_rows_total", "Training rows read")
+
+    def stage(name: str):
+        # duration of each training stage, as a gauge (one value per run)
+        return metrics.gauge("train_stage_seconds", "Seconds spent in each training stage", stage=name)
 
-    df = pd.read_csv(data)
     # Expect a time column; keep only sensor columns
-    cols = [c for c in df.columns if c != "time"]
+    cols = [c for c in read_columns(data, fmt) if c != "time"]
     if not cols:
         raise ValueError("No sensor columns found (expected columns besides 'time').")
 
-    X = df[cols].to_numpy(dtype=np.float32)
+    kind = model.lower()
+    if kind not in ("baseline", "rolling", "ae"):
+        raise ValueError("Only model=baseline|rolling|ae implemented right now.")
+    if streaming and kind != "baseline":
+        raise ValueError("--streaming supports model=baseline only (rolling and ae need one ordered pass).")
+    if feats and kind == "ae":
+        raise ValueError("--features works with model=baseline|rolling (the autoencoder sees windows already).")
+    if feats and streaming and workers > 1:
+        raise ValueError("--features with --streaming needs --workers 1 (feature windows run across the whole file in order).")
+
+    clock = time.perf_counter
+    if streaming:
+        t0 = clock()
+        bm, n_rows = _fit_streaming(data, fmt, cols, q, chunksize, workers, sketch_k, sample_rows, feats)
+        stage("sketch").set(clock() - t0)
+        fit_info = {
+            "method": "kll_sketch",
+            "sketch_k": sketch_k,
+            "rank_error": rank_error(sketch_k),
+            "sample_rows": sample_rows,
+            "workers": workers,
+        }
+    else:
+        t0 = clock()
+        X = read_matrix(data, cols, fmt)
+        n_rows = int(len(X))
+        fcols = cols
+        if feats:
+            center = np.nan_to_num(np.nanmedian(X, axis=0))
+            raw = X
+            # fit on full windows only; warm-up rows are not scored on their features
+            X = RollingFeatures(len(cols), feats["window"], feats["kinds"], center).transform(X)[feats["window"] - 1:]
+            fcols = feature_channels(cols, feats["kinds"])
+        t1 = clock()
+        if kind == "rolling":
+            mp = None if min_periods < 0 else min_periods
+            bm = fit_rolling_baseline(X, columns=fcols, window=window, min_periods=mp, agg="max")
+        elif kind == "ae":
+            bm = fit_ae(X, columns=cols, device=device, agg="max", **ae_params)
+        else:
+            bm = fit_baseline(X, columns=fcols, agg="max")
+        t2 = clock()
+        if feats:
+            bm = FeatureModel(bm, cols, feats["window"], feats["kinds"], center)
+            X = raw
+        bm.threshold = choose_threshold_from_train(bm, X, q=q)
+        stage("read").set(t1 - t0)
+        stage("fit").set(t2 - t1)
+        stage("threshold").set(clock() - t2)
+        fit_info = {"method": "exact"}
+        if kind == "ae":
+            fit_info.update(ae_params)
+    if feats:
+        fit_info["features"] = feats
+    m_rows.inc(n_rows)
 
-    meta = {"model": model, "device": device, "n_rows": int(len(df)), "columns": cols}
+    meta = {"model": model, "device": device, "n_rows": int(n_rows), "columns": cols, "format": fmt, "fit": fit_info,
+            "data": str(data)}
     (outp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
 
-    if model.lower() != "baseline":
-        raise ValueError("Only model=baseline implemented right now.")
-
-    bm = fit_baseline(X, columns=cols, agg="max")
-    bm.threshold = choose_threshold_from_train(bm, X, q=0.995)
-
-    baseline_payload = {
-        "type": "baseline_robust_z",
-        "columns": bm.columns,
-        "med": bm.med,
-        "mad": bm.mad,
-        "threshold": bm.threshold,
-        "agg": bm.agg,
-        "train_quantile": 0.995,
-    }
+    baseline_payload = model_to_config(bm)
+    baseline_payload["train_quantile"] = q
     (outp / "baseline.json").write_text(json.dumps(baseline_payload, indent=2), encoding="utf-8")
 
-    console.print(f"[green]OK[/green] baseline trained -> {outp/'baseline.json'}")
-    console.print(f"Threshold set from train quantile 0.995: {bm.threshold:.3f}")
+    console.print(f"[green]OK[/green] {kind} trained -> {outp/'baseline.json'}")
+    console.print(f"Threshold set from train quantile {q}: {bm.threshold:.3f}")
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from .baseline import aggregate, parse_agg
+from .eval import event_metrics
+from .models import Model, load_model, model_to_config
+from .tabular import detect_format, read_columns, read_matrix
+
+console = Console()
+
+# Per-sensor |z| of the train and labelled files is computed once and cached in
+# <run>/tune_cache/ as .npy memmaps; every (agg, weights, quantile) setting is then
+# scored from the cache alone:
+#
+# train.z.npy  (n_train, d) float32 |z| (d = scored channels, incl. features)
+# eval.z.npy   (n_eval, d)  float32 |z|
+# eval.y.npy   (n_eval,)    int8 labels
+# cache.json   model / file fingerprints the cache was built for
+
+_BLOCK = 65536
+_PARAMS = ("threshold", "agg", "weights", "train_quantile")  # what tune changes: not part of the cache key
+
+def _file_key(path: Path) -> Dict[str, Any]:
+    st = path.stat()
+    return {"path": str(path.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _z_key(model: Model) -> str:
+    cfg = {k: v for k, v in model_to_config(model).items() if k not in _PARAMS}
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _write_z(model: Model, X: np.ndarray, dst: Path) -> None:
+    # in file order with one fresh scorer, so stateful models see the rows as infer does
+    kernel = model.compile()
+    d = len(getattr(kernel, "channels", model.columns))
+    Z = np.lib.format.open_memmap(dst, mode="w+", dtype=np.float32, shape=(len(X), d))
+    work = kernel.workspace(_BLOCK)[1]
+    for a in range(0, len(X), _BLOCK):
+        Z[a:a + _BLOCK] = kernel.abs_z(X[a:a + _BLOCK], work=work)
+    Z.flush()
+    del Z
+
+def z_cache(
+    run: Path, model: Model, train: Path, data: Path, fmt_train: str, fmt_data: str, rebuild: bool = False,
+) -> Tuple[Path, bool]:
+    """Builds <run>/tune_cache/ unless it matches model and files already. (folder, hit)."""
+    cache = run / "tune_cache"
+    key = {"model": _z_key(model), "train": _file_key(train), "data": _file_key(data)}
+    meta = cache / "cache.json"
+    if not rebuild and meta.exists() and json.loads(meta.read_text(encoding="utf-8")) == key:
+        return cache, True
+    cache.mkdir(parents=True, exist_ok=True)
+    meta.unlink(missing_ok=True)
+    _write_z(model, read_matrix(train, model.columns, fmt_train), cache / "train.z.npy")
+    M = read_matrix(data, model.columns + ["anomaly"], fmt_data)
+    np.save(cache / "eval.y.npy", M[:, -1].astype(np.int8))
+    _write_z(model, M[:, :-1], cache / "eval.z.npy")
+    meta.write_text(json.dumps(key, indent=2), encoding="utf-8")
+    return cache, False
+
+def balanced_weights(Z: np.ndarray, q: float = 0.99, max_rows: int = 100_000) -> np.ndarray:
+    """1 / (q-quantile of each sensor's train |z|), scaled to mean 1: heavy-tailed sensors count less."""
+    rows = np.unique(np.linspace(0, len(Z) - 1, min(len(Z), max_rows)).astype(int))
+    hi = np.nanquantile(np.asarray(Z[rows], dtype=np.float64), q, axis=0)
+    w = 1.0 / np.maximum(np.nan_to_num(hi, nan=1.0), 1e-6)
+    return w / w.mean()
+
+def _scores(Z: np.ndarray, agg: str, weights: Optional[np.ndarray]) -> np.ndarray:
+    s = np.empty(len(Z), dtype=np.float32)
+    for a in range(0, len(Z), _BLOCK):
+        # aggregate() scales in place: work on a copy of the (read-only) cache block
+        aggregate(np.array(Z[a:a + _BLOCK]), agg, weights, s[a:a + _BLOCK])
+    return s
+
+def threshold_metrics(y: np.ndarray, score: np.ndarray, thresholds: np.ndarray) -> Dict[str, np.ndarray]:
+    """Row precision / recall / F1 at every threshold from one sort (score >= th flags)."""
+    ok = ~np.isnan(score)
+    order = np.argsort(score[ok], kind="stable")
+    s = score[ok][order]
+    cy = np.r_[0, np.cumsum(y[ok][order], dtype=np.int64)]
+    i = np.searchsorted(s, thresholds, side="left")
+    flagged = len(s) - i
+    tp = cy[-1] - cy[i]
+    precision = tp / (flagged + 1e-12)
+    recall = tp / (int(y.sum()) + 1e-12)
+    return {"tp": tp, "fp": flagged - tp, "precision": precision, "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall + 1e-12)}
+
+def _evaluate(cache: str, agg: str, wname: str, weights: Optional[np.ndarray], quantiles: List[float]) -> List[dict]:
+    # one (agg, weights) pair: train and eval scores once, then every quantile
+    cache_dir = Path(cache)
+    y = np.load(cache_dir / "eval.y.npy")
+    s_tr = _scores(np.load(cache_dir / "train.z.npy", mmap_mode="r"), agg, weights)
+    s_ev = _scores(np.load(cache_dir / "eval.z.npy", mmap_mode="r"), agg, weights)
+    thr = np.nanquantile(s_tr, quantiles)
+    m = threshold_metrics(y, s_ev, thr)
+    rows = []
+    for k, q in enumerate(quantiles):
+        ev = event_metrics(y, s_ev >= thr[k])
+        ep, er = ev["event_precision"], ev["event_recall"]
+        rows.append({
+            "agg": agg, "weights": wname, "quantile": float(q), "threshold": float(thr[k]),
+            "precision": float(m["precision"][k]), "recall": float(m["recall"][k]), "f1": float(m["f1"][k]),
+            "event_precision": ep, "event_recall": er, "event_f1": 2 * ep * er / (ep + er + 1e-12),
+            "false_alarm_runs": ev["false_alarm_runs"],
+        })
+    return rows
+
+def _floats(spec: str) -> List[float]:
+    return [float(v) for v in spec.split(",") if v.strip()]
+
+def tune_main(
+    run: str,
+    data: str,
+    train: str = "",
+    aggs: str = "max,mean,top2,top3,top5",
+    quantiles: str = "0.99,0.995,0.998,0.999,0.9995,0.9999",
+    weights: str = "none,balanced",
+    metric: str = "f1",
+    workers: int = 1,
+    write: bool = True,
+    rebuild: bool = False,
+    format: str = "auto",
+) -> dict:
+    """
+    Grid search over aggregation x sensor weights x train quantile, scored against
+    the labels in `data`. The best setting is written to baseline.json (`write`).
+    """
+    runp = Path(run)
+    model_path = runp / "baseline.json"
+    model = load_model(model_path)
+    if metric not in ("f1", "event_f1"):
+        raise ValueError("--metric must be 'f1' or 'event_f1'")
+    qs = _floats(quantiles)
+    if not qs or any(not 0.0 < q < 1.0 for q in qs):
+        raise ValueError("--quantiles must be values in (0, 1)")
+    wnames = [w.strip() for w in weights.split(",") if w.strip()]
+    if not wnames or any(w not in ("none", "balanced") for w in wnames):
+        raise ValueError("--weights takes 'none' and/or 'balanced'")
+    if not train:
+        meta = runp / "meta.json"
+        train = json.loads(meta.read_text(encoding="utf-8")).get("data", "") if meta.exists() else ""
+        if not train:
+            raise ValueError("This run does not record its training file; pass --train")
+    train_p, data_p = Path(train), Path(data)
+    for p in (train_p, data_p):
+        if not p.exists():
+            raise FileNotFoundError(p)
+    fmt_train, fmt_data = detect_format(train_p, format), detect_format(data_p, format)
+    if "anomaly" not in read_columns(data_p, fmt_data):
+        raise ValueError(f"{data_p.name} must contain 'anomaly' label column (0/1).")
+
+    t0 = time.perf_counter()
+    cache, hit = z_cache(runp, model, train_p, data_p, fmt_train, fmt_data, rebuild)
+    t1 = time.perf_counter()
+    Ztr = np.load(cache / "train.z.npy", mmap_mode="r")
+    d = Ztr.shape[1]
+    agg_list = []
+    for a in (a.strip() for a in aggs.split(",")):
+        # top<k> >= d is the mean again
+        if a and (parse_agg(a) < d) and a not in agg_list:
+            agg_list.append(a)
+    wts = {"none": None, "balanced": balanced_weights(Ztr).astype(np.float32) if "balanced" in wnames else None}
+    jobs = [(str(cache), a, w, wts[w], qs) for a in agg_list for w in wnames]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            parts = list(ex.map(_evaluate, *zip(*jobs)))
+    else:
+        parts = [_evaluate(*j) for j in jobs]
+    results = [r for part in parts for r in part]
+    t2 = time.perf_counter()
+
+    # the trained setting, for comparison
+    y = np.load(cache / "eval.y.npy")
+    cur_w = getattr(getattr(model, "inner", model), "weights", None)
+    s_cur = _scores(np.load(cache / "eval.z.npy", mmap_mode="r"), model.agg, cur_w)
+    cm = threshold_metrics(y, s_cur, np.array([model.threshold]))
+    ev = event_metrics(y, s_cur >= model.threshold)
+    ep, er = ev["event_precision"], ev["event_recall"]
+    current = {"agg": model.agg, "weights": "trained" if cur_w is not None else "none", "threshold": float(model.threshold),
+               "precision": float(cm["precision"][0]), "recall": float(cm["recall"][0]), "f1": float(cm["f1"][0]),
+               "event_f1": 2 * ep * er / (ep + er + 1e-12)}
+
+    # ties go to the higher quantile (fewer alarms on normal data)
+    best = max(results, key=lambda r: (r[metric], r["quantile"]))
+    out = {
+        "run": str(runp), "train": str(train_p), "data": str(data_p), "metric": metric,
+        "configs": len(results), "cache_hit": hit,
+        "seconds": {"cache": t1 - t0, "search": t2 - t1},
+        "current": current, "best": best, "results": results,
+    }
+    (runp / "tune.json").write_text(json.dumps(out, indent=2), encoding="utf-8")
+
+    t = Table(title=f"Top settings by {metric} ({len(results)} evaluated)")
+    for c in ("agg", "weights", "quantile", "threshold", "precision", "recall", "f1", "event_f1"):
+        t.add_column(c, justify="left" if c in ("agg", "weights") else "right")
+    for r in sorted(results, key=lambda r: (r[metric], r["quantile"]), reverse=True)[:10]:
+        t.add_row(r["agg"], r["weights"], f"{r['quantile']:g}", f"{r['threshold']:.3f}", f"{r['precision']:.3f}",
+                  f"{r['recall']:.3f}", f"{r['f1']:.3f}", f"{r['event_f1']:.3f}")
+    console.print(t)
+    console.print(
+        f"|z| cache {'reused' if hit else 'built'} in {t1 - t0:.2f}s | {len(results)} settings in {t2 - t1:.2f}s"
+        f" | trained {metric}={current[metric]:.3f} -> best {best[metric]:.3f}"
+    )
+
+    if write:
+        cfg = json.loads(model_path.read_text(encoding="utf-8"))
+        cfg["agg"] = best["agg"]
+        cfg["threshold"] = best["threshold"]
+        cfg["train_quantile"] = best["quantile"]
+        if best["weights"] == "balanced":
+            cfg["weights"] = wts["balanced"].astype(float).tolist()
+        else:
+            cfg.pop("weights", None)
+        model_path.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+        console.print(f"[green]OK[/green] wrote {model_path} (agg={best['agg']} weights={best['weights']} q={best['quantile']:g})")
+    console.print(f"[green]OK[/green] wrote {runp / 'tune.json'}")
+    return out
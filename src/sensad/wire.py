@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas is imported by the encoding side only; the scorer reads frames with numpy alone
+
+# Binary framing for `sensad stream --wire binary | edge/score_stream.py --wire binary`.
+#
+#   stream  := MAGIC header batch*
+#   frame   := kind (1 byte) | payload length (uint32 LE) | payload
+#   header  := kind b"H", UTF-8 JSON {"version": 1, "columns": [...], "time": "number"|"iso"|null}
+#   batch   := kind b"B", n (uint64 LE) | time[n] (if the schema has time) | float32[n, d] row-major
+#
+# "iso" times travel as int64 nanoseconds since the epoch (INT64_MIN = missing),
+# "number" times as the float64 values themselves (NaN = missing; scaling them to
+# ns would overflow int64 for epoch milliseconds); sensors as float32 with NaN for
+# missing cells. A batch is read straight into numpy
+# with np.frombuffer: no per-value parsing on the scoring side.
+
+MAGIC = b"SADW"
+VERSION = 2
+HEADER, BATCH = b"H", b"B"
+_FRAME = struct.Struct("<cI")
+_COUNT = struct.Struct("<Q")
+
+Batch = Tuple[Optional[np.ndarray], np.ndarray]  # (times (n,) or None, X (n, d) float32)
+
+def time_dtype(kind: Optional[str]) -> str:
+    """Wire dtype of the times of a `kind` feed."""
+    return "<f8" if kind == "number" else "<i8"
+
+def header_bytes(columns: Sequence[str], time_kind: Optional[str]) -> bytes:
+    """MAGIC + header frame for a feed of `columns` (time column not included)."""
+    body = json.dumps({"version": VERSION, "columns": list(columns), "time": time_kind}).encode("utf-8")
+    return MAGIC + _FRAME.pack(HEADER, len(body)) + body
+
+def batch_bytes(times: Optional[np.ndarray], X: np.ndarray) -> bytes:
+    """One batch frame; `times` must be given iff the header has a time kind."""
+    X = np.ascontiguousarray(X, dtype="<f4")
+    parts = [_COUNT.pack(len(X))]
+    if times is not None:
+        parts.append(np.ascontiguousarray(times, dtype="<f8" if times.dtype.kind == "f" else "<i8").tobytes())
+    parts.append(X.tobytes())
+    size = sum(len(p) for p in parts)
+    return _FRAME.pack(BATCH, size) + b"".join(parts)
+
+# --- text <-> binary --------------------------------------------------------------
+
+def _time_kind(col: pd.Series) -> str:
+    import pandas as pd
+
+    if pd.to_numeric(col, errors="coerce").notna().any():
+        return "number"
+    if pd.to_datetime(col, errors="coerce", format="ISO8601").notna().any():
+        return "iso"
+    raise ValueError("--wire binary needs a numeric or ISO 8601 'time' column (or none at all)")
+
+def encode_times(col: pd.Series, kind: str) -> np.ndarray:
+    """
+    Text time cells -> float64 values ("number") or int64 ns ("iso"); unparsable
+    cells become NaN / the NaT value.
+    """
+    import pandas as pd
+
+    if kind == "number":
+        return pd.to_numeric(col, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    t = pd.to_datetime(col, errors="coerce", format="ISO8601", utc=True)
+    return t.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+def format_times(times: np.ndarray, kind: Optional[str]) -> List[str]:
+    """Wire times -> text cells, the inverse of encode_times (up to formatting)."""
+    if kind == "iso":
+        nat = times == np.iinfo(np.int64).min
+        # one unit per batch (the coarsest exact one), so cells line up
+        ok = times[~nat]
+        unit = next((u for u, q in (("s", 10**9), ("ms", 10**6), ("us", 10**3)) if (ok % q == 0).all()), "ns")
+        out = np.datetime_as_string(times.view("datetime64[ns]"), unit=unit)
+        return np.where(nat, "", out).tolist()
+    # integers (epoch s / ms / us) as such, fractions in their shortest round-trip form
+    whole = (times == np.floor(times)) & (np.abs(times) < 2.0**63)
+    if whole.all():
+        return np.char.mod("%d", times.astype(np.int64)).tolist()
+    return ["" if v != v else str(int(v)) if w else repr(v) for v, w in zip(times.tolist(), whole.tolist())]
+
+class LazyTimes:
+    """Time cells of one batch, formatted only when indexed (events need a few)."""
+
+    def __init__(self, ns: np.ndarray, kind: Optional[str]):
+        self.ns = ns
+        self.kind = kind
+
+    def __getitem__(self, i: int) -> str:
+        return format_times(self.ns[i:i + 1], self.kind)[0]
+
+class BlockEncoder:
+    """
+    Turns blocks of CSV lines into batch frames for replay(): each block is parsed
+    once (pandas C parser), then any row range of it is framed with one slice.
+    Every column except `time` is sent as float32 (non-numeric cells become NaN).
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self.columns = [c for c in self.names if c != "time"]
+        self.has_time = "time" in self.names
+        self.time_kind: Optional[str] = None
+
+    def header(self) -> bytes:
+        """Call after block() of the first block: the time kind is detected from it."""
+        kind = (self.time_kind or "number") if self.has_time else None
+        return header_bytes(self.columns, kind)
+
+    def block(self, lines: List[bytes]) -> Batch:
+        import pandas as pd
+
+        df = pd.read_csv(io.BytesIO(b"".join(lines)), header=None, names=self.names,
+                         dtype={"time": str} if self.has_time else None, keep_default_na=False,
+                         na_values=[""], skip_blank_lines=True)
+        X = np.empty((len(df), len(self.columns)), dtype=np.float32)
+        for j, c in enumerate(self.columns):
+            col = df[c]
+            if not pd.api.types.is_numeric_dtype(col):
+                col = pd.to_numeric(col, errors="coerce")
+            X[:, j] = col.to_numpy(dtype=np.float32, na_value=np.nan)
+        times = None
+        if self.has_time:
+            if self.time_kind is None:
+                self.time_kind = _time_kind(df["time"])
+            times = encode_times(df["time"], self.time_kind)
+        return times, X
+
+    def frame(self, blk: Batch, i: int, j: int) -> bytes:
+        times, X = blk
+        return batch_bytes(None if times is None else times[i:j], X[i:j])
+
+class BatchWriter:
+    """Writes a binary feed (e.g. scored rows) to a byte stream."""
+
+    def __init__(self, out: BinaryIO, columns: Sequence[str], time_kind: Optional[str]):
+        self.out = out
+        self.time_kind = time_kind
+        out.write(header_bytes(columns, time_kind))
+
+    def write(self, times: Optional[np.ndarray], X: np.ndarray) -> None:
+        self.out.write(batch_bytes(times if self.time_kind else None, X))
+
+# --- reading ----------------------------------------------------------------------
+
+def _read_exact(fd: int, n: int) -> bytes:
+    chunks, got = [], 0
+    while got < n:
+        data = os.read(fd, min(n - got, 1 << 20))
+        if not data:
+            break
+        chunks.append(data)
+        got += len(data)
+    return b"".join(chunks)
+
+def _read_frame(fd: int) -> Optional[Tuple[bytes, bytes]]:
+    head = _read_exact(fd, _FRAME.size)
+    if not head:
+        return None
+    if len(head) < _FRAME.size:
+        raise ValueError("truncated frame header")
+    kind, size = _FRAME.unpack(head)
+    body = _read_exact(fd, size)
+    if len(body) < size:
+        raise ValueError("truncated frame")
+    return kind, body
+
+def read_header(fd: int) -> Dict[str, Any]:
+    """Reads MAGIC + header frame; returns the schema."""
+    magic = _read_exact(fd, len(MAGIC))
+    if not magic:
+        raise ValueError("empty input (no binary header)")
+    if magic != MAGIC:
+        raise ValueError("input is not a binary sensad feed (text CSV? use --wire text)")
+    frame = _read_frame(fd)
+    if frame is None or frame[0] != HEADER:
+        raise ValueError("binary feed does not start with a header frame")
+    schema = json.loads(frame[1].decode("utf-8"))
+    if schema.get("version") != VERSION:
+        raise ValueError(f"unsupported wire version {schema.get('version')}")
+    return schema
+
+def decode_batch(body: bytes, d: int, time_kind: Optional[str]) -> Batch:
+    (n,) = _COUNT.unpack_from(body)
+    off = _COUNT.size
+    times = None
+    if time_kind is not None:
+        times = np.frombuffer(body, dtype=time_dtype(time_kind), count=n, offset=off)
+        off += 8 * n
+    X = np.frombuffer(body, dtype="<f4", count=n * d, offset=off).reshape(n, d)
+    return times, X
+
+_EOF = None
+
+def _read_batches(fd: int, d: int, time_kind: Optional[str], q: queue.Queue):
+    try:
+        while True:
+            frame = _read_frame(fd)
+            if frame is None:
+                break
+            kind, body = frame
+            if kind == BATCH:
+                q.put(decode_batch(body, d, time_kind))
+            # unknown frame kinds are skipped (room for later additions)
+    except ValueError as e:
+        q.put(e)
+    q.put(_EOF)
+
+def iter_batches(
+    fd: int, schema: Dict[str, Any], max_batch: int = 1, max_wait_s: float = 0.0,
+) -> Iterator[Batch]:
+    """
+    Yields (times, X) batches of at most `max_batch` rows read from `fd` (after
+    read_header). Frames are coalesced or split like iter_line_batches coalesces
+    lines: a batch is emitted when full, or `max_wait_s` after its first row arrived.
+    """
+    max_batch = max(1, int(max_batch))
+    d, kind = len(schema["columns"]), schema.get("time")
+    has_time = kind is not None
+    q: queue.Queue = queue.Queue(maxsize=64)
+    t = threading.Thread(target=_read_batches, args=(fd, d, kind, q), name="sensad-wire", daemon=True)
+    t.start()
+
+    pending: Deque[Batch] = deque()
+    parts: List[Batch] = []
+    rows = 0
+    deadline: Optional[float] = None
+    eof = False
+
+    def take():
+        nonlocal rows
+        while pending and rows < max_batch:
+            tm, X = pending.popleft()
+            k = max_batch - rows
+            if len(X) > k:
+                pending.appendleft((None if tm is None else tm[k:], X[k:]))
+                tm, X = (None if tm is None else tm[:k]), X[:k]
+            parts.append((tm, X))
+            rows += len(X)
+
+    def emit() -> Batch:
+        nonlocal parts, rows, deadline
+        if len(parts) == 1:
+            out = parts[0]
+        else:
+            out = (None if not has_time else np.concatenate([p[0] for p in parts]),
+                   np.concatenate([p[1] for p in parts]))
+        parts, rows, deadline = [], 0, None
+        return out
+
+    while True:
+        take()
+        if rows and deadline is None:
+            deadline = time.monotonic() + max_wait_s
+        if rows and (rows >= max_batch or eof or time.monotonic() >= deadline):
+            yield emit()
+            continue
+        if eof:
+            return
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            item = q.get(timeout=timeout) if timeout is None or timeout > 0 else q.get_nowait()
+        except queue.Empty:
+            if rows:
+                yield emit()
+            continue
+        if item is _EOF:
+            eof = True
+        elif isinstance(item, Exception):
+            raise item
+        elif len(item[1]):
+            pending.append(item)
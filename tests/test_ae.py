@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from sensad.ae import AEModel, init_layers
+from sensad.models import load_model, model_to_config
+
+
+def _model(d=3, window=4):
+    cols = [f"s{j}" for j in range(d)]
+    return AEModel(columns=cols, med={c: 1.0 for c in cols}, mad={c: 0.5 for c in cols},
+                   layers=init_layers(window * d, 16, 4, seed=1), window=window, threshold=2.0)
+
+
+def test_ae_scores_do_not_depend_on_block_partition():
+    X = np.random.default_rng(0).normal(1.0, 0.5, size=(500, 3)).astype(np.float32)
+    X[17, 1] = np.nan
+    model = _model()
+    whole = model.compile().score(X)
+    scorer = model.compile()
+    parts = np.concatenate([scorer.score(X[a:a + 37]) for a in range(0, len(X), 37)])
+    np.testing.assert_allclose(parts, whole, rtol=1e-5, atol=1e-5)
+    assert np.isnan(whole[17]) and np.isfinite(whole[18])
+
+
+def test_ae_config_roundtrip(tmp_path):
+    model = _model()
+    p = tmp_path / "baseline.json"
+    p.write_text(json.dumps(model_to_config(model)), encoding="utf-8")
+    loaded = load_model(p)
+    X = np.random.default_rng(1).normal(1.0, 0.5, size=(100, 3))
+    np.testing.assert_array_equal(loaded.score(X), model.score(X))
+
+
+def test_ae_exports_match_numpy(tmp_path):
+    pytest.importorskip("torch")
+    from sensad.ae import EXPORT_FILES, export_model, fit_ae
+
+    X = np.random.default_rng(2).normal(0.0, 1.0, size=(400, 3)).astype(np.float32)
+    model = fit_ae(X, ["a", "b", "c"], window=4, hidden=16, latent=2, epochs=2)
+    ref = model.compile("numpy").score(X)
+    np.testing.assert_allclose(model.compile("torch").score(X), ref, rtol=1e-4, atol=1e-4)
+    model.exports["torchscript"] = str(export_model(model, "torchscript", tmp_path / EXPORT_FILES["torchscript"]))
+    np.testing.assert_allclose(model.compile("torchscript").score(X), ref, rtol=1e-4, atol=1e-4)
+
+
+def test_export_is_not_activated_when_its_runtime_is_missing(tmp_path):
+    pytest.importorskip("torch")
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        pytest.skip("onnxruntime is installed: the export is verified and activated")
+    from sensad.export import export_main
+
+    p = tmp_path / "baseline.json"
+    p.write_text(json.dumps(model_to_config(_model())), encoding="utf-8")
+    export_main(str(tmp_path), "onnx")
+    cfg = json.loads(p.read_text(encoding="utf-8"))
+    assert cfg["exports"]["onnx"] == "ae.onnx" and cfg.get("runtime", "numpy") == "numpy"
+    assert load_model(p).compile() is not None  # still scores with numpy
@@ -0,0 +1,77 @@
+import json
+import warnings
+
+import numpy as np
+
+from sensad.baseline import BaselineModel, fit_baseline
+from sensad.lite import lite_from_config
+from sensad.models import model_from_config, model_to_config
+
+
+def _reference_score(model: BaselineModel, X: np.ndarray) -> np.ndarray:
+    zs = []
+    for j, col in enumerate(model.columns):
+        zs.append(np.abs((X[:, j] - model.med[j]) / (1.4826 * model.mad[j] + 1e-12)))
+    Z = np.stack(zs, axis=1)
+    return np.mean(Z, axis=1) if model.agg == "mean" else np.max(Z, axis=1)
+
+
+def test_compiled_score_matches_reference():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 4)).astype(np.float32)
+    cols = ["a", "b", "c", "d"]
+    for agg in ("max", "mean"):
+        model = fit_baseline(X, columns=cols, agg=agg)
+        np.testing.assert_allclose(model.score(X), _reference_score(model, X), rtol=1e-5)
+
+
+def test_compiled_score_reuses_buffers():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(64, 3)).astype(np.float32)
+    kernel = fit_baseline(X, columns=["a", "b", "c"]).compile()
+    out, work = kernel.workspace(64)
+    s1 = kernel.score(X[:40], out=out, work=work)
+    assert s1.base is out or s1 is out
+    s2 = kernel.score(X, out=out, work=work)
+    np.testing.assert_allclose(s2, kernel.score(X))
+
+
+def test_lite_scores_match_numpy_kernel_for_wide_models():
+    rng = np.random.default_rng(3)
+    for d in (9, 20, 64, 200):
+        X = (rng.normal(size=(400, d)) * rng.uniform(0.1, 50, size=d)).astype(np.float32)
+        X[5, d // 2] = np.nan
+        for agg in ("mean", "max"):
+            model = fit_baseline(X[:200], columns=[f"s{j}" for j in range(d)], agg=agg)
+            cfg = model_to_config(model)
+            lite, _ = lite_from_config(cfg).score_rows(X.tolist())
+            expected = model.compile().score(X)
+            np.testing.assert_array_equal(np.array(lite, dtype=np.float32), expected, err_msg=f"{agg}, d={d}")
+
+
+def test_wide_fit_matches_nanmedian_per_column():
+    rng = np.random.default_rng(2)
+    for n in (1, 6, 301):
+        X = (rng.normal(size=(n, 50)) * rng.uniform(0.1, 100, 50)).astype(np.float32)
+        X[rng.random(X.shape) < 0.2] = np.nan  # a different valid count per column
+        X[:, 7] = np.nan
+        X[:, 8] = 3.0
+        model = fit_baseline(np.asfortranarray(X), columns=[f"s{j}" for j in range(50)])
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            med = np.nanmedian(X, axis=0)
+            mad = np.nanmedian(np.abs(X - med), axis=0)
+        np.testing.assert_array_equal(model.med, med.astype(np.float64))
+        mad = mad.astype(np.float64)
+        np.testing.assert_array_equal(model.mad, np.where(mad < 1e-9, 1e-9, mad))
+
+
+def test_config_stores_arrays_and_reads_legacy_dicts():
+    X = np.random.default_rng(3).normal(size=(100, 3))
+    model = fit_baseline(X, columns=["a", "b", "c"])
+    cfg = model_to_config(model)
+    assert isinstance(cfg["med"], list) and len(cfg["mad"]) == 3
+    legacy = dict(cfg, med=dict(zip("abc", cfg["med"])), mad=dict(zip("abc", cfg["mad"])))
+    for c in (cfg, legacy):
+        back = model_from_config(json.loads(json.dumps(c)))
+        np.testing.assert_array_equal(back.score(X), model.score(X))
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from sensad.baseline import BaselineModel
+from sensad.batch import expand_inputs
+from sensad.infer import infer_main
+from sensad.models import model_to_config
+
+
+def test_multi_file_infer_with_failures(tmp_path):
+    model = BaselineModel(columns=["a", "b"], med={"a": 0.0, "b": 0.0}, mad={"a": 1.0, "b": 1.0}, threshold=2.5)
+    run = tmp_path / "run"
+    run.mkdir()
+    (run / "baseline.json").write_text(json.dumps(model_to_config(model)), encoding="utf-8")
+
+    rng = np.random.default_rng(0)
+    src = tmp_path / "in"
+    (src / "day2").mkdir(parents=True)
+    frames = {}
+    for name, n in [("h1.csv", 50), ("h2.csv", 400), ("day2/h1.csv", 120)]:
+        df = pd.DataFrame(rng.normal(size=(n, 2)), columns=["a", "b"])
+        df.insert(0, "time", range(n))
+        df.to_csv(src / name, index=False)
+        frames[name] = df
+    (src / "broken.csv").write_text("time,c\n0,1\n", encoding="utf-8")
+    assert len(expand_inputs(str(src))) == 4
+
+    out = tmp_path / "out"
+    ok = infer_main(str(run), str(src), str(out), workers=2)
+    assert not ok
+    summary = pd.read_csv(out / "summary.csv").set_index("file")
+    assert summary.loc[str(src / "broken.csv"), "status"] == "failed"
+    assert (summary["status"] == "ok").sum() == 3
+    for name, df in frames.items():
+        pred = pd.read_csv(out / name.replace(".csv", ".pred.csv"))
+        _, expected = model.predict(df[["a", "b"]].to_numpy())
+        np.testing.assert_array_equal(pred["is_anomaly"].to_numpy(), expected)
+        assert summary.loc[str(src / name), "rows"] == len(df)
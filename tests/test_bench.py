@@ -0,0 +1,16 @@
+import json
+
+from sensad.bench import bench_main, compare
+
+
+def test_bench_writes_json_and_flags_regressions(tmp_path):
+    out = tmp_path / "bench.json"
+    assert bench_main(rows=2000, sensors=4, repeat=1, out=str(out), stream_rows=200, stream_rate=2000.0, chunksize=500)
+    report = json.loads(out.read_text())
+    assert {"fit", "threshold", "score", "infer_csv", "stream"} <= set(report["results"])
+    assert report["results"]["stream"]["rows"] == 200
+
+    slower = json.loads(json.dumps(report))
+    slower["results"]["score"]["rows_per_s"] /= 2
+    bad = [r for r in compare(slower, report, 0.2) if r["regressed"]]
+    assert [(r["bench"], r["metric"]) for r in bad] == [("score", "rows_per_s")]
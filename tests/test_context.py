@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from sensad.context import ContextCapture, load_snapshot
+
+
+def _windows(flags, pre, post):
+    # merged [start, end] rows around flagged rows (a flag whose pre-window reaches an open window extends it)
+    out, start, end = [], None, -1
+    for h in np.flatnonzero(flags).tolist():
+        if start is not None and h - pre <= end:
+            end = max(end, h + post)
+            continue
+        if start is not None:
+            out.append((start, end))
+        start, end = max(0, h - pre), h + post
+    if start is not None:
+        out.append((start, end))
+    return [(a, min(b, len(flags) - 1)) for a, b in out]
+
+
+def _feed(cap, X, times, score, flags, rng):
+    a = 0
+    while a < len(X):
+        b = min(len(X), a + int(rng.integers(1, 300)))
+        cap.update(X[a:b], None if times is None else times[a:b], score[a:b], flags[a:b])
+        a = b
+    cap.close()
+
+
+def test_snapshots_merge_and_match_stream(tmp_path):
+    rng = np.random.default_rng(0)
+    n, pre, post = 3000, 20, 15
+    X = rng.normal(size=(n, 3)).astype(np.float32)
+    score = rng.random(n).astype(np.float32)
+    flags = rng.random(n) < 0.01
+    flags[1500:1700] = True   # long run: split over several files with a small buffer
+    flags[n - 5] = True       # post-window cut short by the end of the stream
+    times = np.array([f"t{i}" for i in range(n)])
+    expected = _windows(flags, pre, post)
+
+    for sub, max_rows in (("whole", 10_000), ("split", 0)):
+        cap = ContextCapture(["a", "b", "c"], pre, post, tmp_path / sub, max_rows=max_rows, times="text")
+        _feed(cap, X, times, score, flags, np.random.default_rng(1))
+        snaps = [load_snapshot(p) for p in sorted((tmp_path / sub).glob("ctx_*.npz"))]
+        assert cap.snapshots == len(snaps)
+        # consecutive files of one capture join up
+        got = []
+        for s in snaps:
+            r = s["row"]
+            assert np.array_equal(r, np.arange(r[0], r[-1] + 1))
+            np.testing.assert_array_equal(s["X"], X[r])
+            np.testing.assert_array_equal(s["time"], times[r])
+            np.testing.assert_array_equal(s["is_anomaly"], flags[r])
+            if got and got[-1][1] + 1 == r[0] and sub == "split":
+                got[-1] = (got[-1][0], int(r[-1]))
+            else:
+                got.append((int(r[0]), int(r[-1])))
+        if sub == "whole":
+            assert got == expected
+        else:
+            assert len(snaps) > len(expected)
+            covered = {i for a, b in got for i in range(a, b + 1)}
+            assert covered == {i for a, b in expected for i in range(a, b + 1)}
+
+
+def test_parquet_snapshot_without_time(tmp_path):
+    pytest.importorskip("pyarrow")
+    X = np.arange(40, dtype=np.float32).reshape(20, 2)
+    flags = np.zeros(20, dtype=bool)
+    flags[10] = True
+    cap = ContextCapture(["a", "b"], 3, 2, tmp_path, fmt="parquet")
+    _feed(cap, X, None, X[:, 0], flags, np.random.default_rng(0))
+    (path,) = tmp_path.glob("ctx_*.parquet")
+    s = load_snapshot(path)
+    assert s["row"].tolist() == list(range(7, 13)) and "time" not in s
+    np.testing.assert_array_equal(s["X"], X[7:13])
+
+
+def test_snapshots_are_saved_off_the_scoring_thread(tmp_path):
+    release = threading.Event()
+    X = np.zeros((400, 1), dtype=np.float32)
+    flags = np.zeros(400, dtype=bool)
+    flags[[50, 150, 250, 350]] = True
+    cap = ContextCapture(["a"], 5, 5, tmp_path, on_write=lambda p, n: release.wait(5))
+    t = time.perf_counter()
+    cap.update(X, None, X[:, 0], flags)  # four snapshots, the writer is stuck on the first
+    assert time.perf_counter() - t < 1.0
+    release.set()
+    cap.close()
+    assert cap.snapshots == 4 == len(list(tmp_path.glob("ctx_*.npz")))
+
+    def fail(path, n):
+        raise OSError("disk full")
+
+    cap = ContextCapture(["a"], 5, 5, tmp_path / "f", on_write=fail)
+    cap.update(X, None, X[:, 0], flags)
+    with pytest.raises(OSError, match="disk full"):
+        cap.close()
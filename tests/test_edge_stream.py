@@ -0,0 +1,68 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SCORE_STREAM = ROOT / "edge" / "score_stream.py"
+
+
+def _write_baseline(path: Path) -> Path:
+    cfg = {
+        "type": "baseline_robust_z",
+        "columns": ["temp", "pressure"],
+        "med": {"temp": 50.0, "pressure": 5.0},
+        "mad": {"temp": 0.5, "pressure": 0.05},
+        "threshold": 3.0,
+        "agg": "max",
+    }
+    p = path / "baseline.json"
+    p.write_text(json.dumps(cfg), encoding="utf-8")
+    return p
+
+
+def _feed(n: int = 300) -> str:
+    rng = np.random.default_rng(0)
+    lines = ["time,temp,pressure"]
+    for i in range(n):
+        temp = "" if i % 50 == 7 else f"{50 + rng.normal(0, 1):.4f}"
+        lines.append(f"t{i},{temp},{5 + rng.normal(0, 0.1):.4f}")
+    return "\n".join(lines) + "\n"
+
+
+def _run(baseline: Path, feed: str, *extra: str) -> str:
+    res = subprocess.run(
+        [sys.executable, str(SCORE_STREAM), "--baseline", str(baseline), *extra],
+        input=feed, capture_output=True, text=True, check=True,
+    )
+    return res.stdout
+
+
+def test_micro_batching_keeps_per_row_output(tmp_path):
+    baseline = _write_baseline(tmp_path)
+    feed = _feed()
+    per_row = _run(baseline, feed)
+    assert len(per_row.splitlines()) == 301
+    assert _run(baseline, feed, "--max-batch", "64", "--max-wait-ms", "20") == per_row
+    assert _run(baseline, feed, "--queue-rows", "0") == per_row  # synchronous writes
+    only = _run(baseline, feed, "--only-anomalies", "--max-batch", "32")
+    assert only.splitlines()[1:] == [l for l in per_row.splitlines()[1:] if l.endswith(",1")]
+
+
+def test_events_output_matches_batch(tmp_path):
+    from sensad.events import EVENT_COLUMNS, event_cells, find_events, predict_with_z
+    from sensad.models import load_model
+
+    baseline = _write_baseline(tmp_path)
+    feed = _feed(1000)
+    out = _run(baseline, feed, "--output", "events", "--max-batch", "16").splitlines()
+    assert out[0] == ",".join(EVENT_COLUMNS)
+
+    rows = [line.split(",") for line in feed.splitlines()[1:]]
+    X = np.array([[float(v) if v else np.nan for v in r[1:]] for r in rows], dtype=np.float32)
+    score, pred, Z = predict_with_z(load_model(baseline).compile(), X)
+    expected = find_events(["temp", "pressure"], score, pred, Z, [r[0] for r in rows])
+    assert len(expected) > 0
+    assert out[1:] == [",".join(event_cells(e)) for e in expected]
@@ -0,0 +1,27 @@
+import numpy as np
+
+from sensad.eval import _prf, average_precision, event_metrics, pr_curve
+
+
+def test_pr_curve_matches_bruteforce_sweep():
+    rng = np.random.default_rng(0)
+    y = (rng.random(2000) < 0.1).astype(int)
+    score = np.round(rng.normal(size=2000) + 2 * y, 1).astype(np.float32)  # many ties
+    score[::97] = np.nan
+
+    thr, prec, rec, tp, fp = pr_curve(y, score)
+    assert np.all(np.diff(thr) < 0)
+    for i, th in enumerate(thr):
+        m = _prf(y, (score >= th).astype(int))
+        assert (m["tp"], m["fp"]) == (tp[i], fp[i])
+        assert np.isclose(m["precision"], prec[i]) and np.isclose(m["recall"], rec[i])
+    assert 0.0 < average_precision(prec, rec) <= 1.0
+
+
+def test_event_metrics():
+    y = np.array([0, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0, 1, 0])
+    p = np.array([0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 1, 1, 0])
+    ev = event_metrics(y, p)
+    assert (ev["events"], ev["detected"]) == (3, 2)
+    assert (ev["alarm_runs"], ev["false_alarm_runs"]) == (3, 1)
+    assert ev["delay_rows_max"] == 2 and ev["delay_rows_median"] == 1.0
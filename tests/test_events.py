@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from sensad.baseline import BaselineModel
+from sensad.events import EVENT_COLUMNS, EventTracker, find_events
+from sensad.infer import infer_main
+from sensad.models import model_to_config
+
+
+def _naive(score, pred, Z, gap):
+    # reference: walk the rows, close a run after more than `gap` normal rows
+    out, cur, quiet = [], None, 0
+    for i, p in enumerate(pred):
+        if p:
+            if cur is None:
+                cur = {"start_row": i, "rows_idx": []}
+            cur["end_row"] = i
+            cur["rows_idx"].append(i)
+            quiet = 0
+        elif cur is not None:
+            quiet += 1
+            if quiet > gap:
+                out.append(cur)
+                cur = None
+    if cur is not None:
+        out.append(cur)
+    res = []
+    for ev in out:
+        r = ev["rows_idx"]
+        zmax = Z[r].max(axis=0)
+        res.append((ev["start_row"], ev["end_row"], score[r].max(), score[r].mean(), int(zmax.argmax())))
+    return res
+
+
+def _data(n=2000, d=4, seed=0):
+    rng = np.random.default_rng(seed)
+    Z = np.abs(rng.normal(size=(n, d))).astype(np.float32)
+    score = Z.max(axis=1)
+    return score, (score >= 2.3).astype(int), Z
+
+
+def test_events_match_reference_and_any_partition():
+    score, pred, Z = _data()
+    cols = ["a", "b", "c", "d"]
+    times = [f"{i}" for i in range(len(score))]
+    for gap in (0, 3):
+        batch = find_events(cols, score, pred, Z, times, gap=gap)
+        ref = _naive(score, pred, Z, gap)
+        got = [(e["start_row"], e["end_row"], e["peak_score"], e["mean_score"], cols.index(e["top_sensor"])) for e in batch]
+        assert [g[:2] for g in got] == [r[:2] for r in ref]
+        np.testing.assert_allclose([g[2:4] for g in got], [r[2:4] for r in ref], rtol=1e-6)
+        assert [g[4] for g in got] == [r[4] for r in ref]
+        assert all(e["duration_s"] == e["end_row"] - e["start_row"] for e in batch)
+
+        for block in (1, 7, 256):
+            tr = EventTracker(cols, gap=gap)
+            inc = []
+            for a in range(0, len(score), block):
+                inc += tr.update(score[a:a + block], pred[a:a + block], Z[a:a + block], times[a:a + block])
+            inc += tr.flush()
+            assert inc == batch
+
+
+def test_no_events_when_nothing_flagged():
+    score, pred, Z = _data()
+    assert find_events(["a", "b", "c", "d"], score, np.zeros_like(pred), Z) == []
+
+
+def test_infer_events_without_anomalies(tmp_path):
+    model = BaselineModel(columns=["a", "b"], med=[0.0, 0.0], mad=[1.0, 1.0], threshold=3.0)
+    run = tmp_path / "run"
+    run.mkdir()
+    (run / "baseline.json").write_text(json.dumps(model_to_config(model)), encoding="utf-8")
+    src = tmp_path / "test.csv"
+    pd.DataFrame({"time": range(200), "a": np.zeros(200), "b": np.ones(200)}).to_csv(src, index=False)
+    out = tmp_path / "events.csv"
+    assert infer_main(str(run), str(src), str(out), output="events", threshold=1000.0)
+    assert out.read_text(encoding="utf-8").splitlines() == [",".join(EVENT_COLUMNS)]
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+
+from sensad.baseline import choose_threshold_from_train, fit_baseline
+from sensad.features import FeatureModel, RollingFeatures, feature_channels
+from sensad.models import model_from_config, model_to_config
+
+KINDS = ["mean", "std", "min", "max", "slope"]
+
+
+def _naive(X, w):
+    out = {k: np.full(X.shape, np.nan) for k in KINDS}
+    for t in range(len(X)):
+        win = X[max(0, t - w + 1):t + 1]
+        for j in range(X.shape[1]):
+            v = win[:, j][~np.isnan(win[:, j])]
+            if len(v):
+                out["mean"][t, j], out["std"][t, j] = v.mean(), v.std()
+                out["min"][t, j], out["max"][t, j] = v.min(), v.max()
+        # slope between the oldest and newest valid samples of the window
+        for j in range(X.shape[1]):
+            ok = np.flatnonzero(~np.isnan(win[:, j]))
+            if len(ok):
+                a, b = ok[0], ok[-1]
+                out["slope"][t, j] = (win[b, j] - win[a, j]) / (b - a) if b > a else 0.0
+    return out
+
+
+def test_features_match_naive_windows_and_ignore_block_size():
+    rng = np.random.default_rng(0)
+    X = (rng.normal(size=(600, 3)) * [1, 5, 0.1] + [0, 100, -3]).astype(np.float32)
+    X[::37, 1] = np.nan
+    X = X.astype(np.float64)
+    w = 20
+    whole = RollingFeatures(3, w, KINDS, center=np.nanmedian(X, axis=0)).transform(X)
+    ref = _naive(X, w)
+    for i, k in enumerate(KINDS):
+        got = whole[:, 3 * (i + 1):3 * (i + 2)]
+        np.testing.assert_allclose(got, ref[k].astype(np.float32), rtol=1e-4, atol=1e-4, err_msg=k)
+
+    for block in (1, 7, 256):
+        eng = RollingFeatures(3, w, KINDS, center=np.nanmedian(X, axis=0))
+        parts = [eng.transform(X[i:i + block]) for i in range(0, len(X), block)]
+        np.testing.assert_array_equal(np.concatenate(parts), whole)
+
+
+def test_slope_skips_missing_samples_in_a_ramp():
+    x = np.array([0, 1, np.nan, 3, 4, 5, np.nan, 7, np.nan, np.nan, np.nan, np.nan])[:, None]
+    slope = RollingFeatures(1, 4, ["slope"]).transform(x)[:, 1]
+    # the ramp keeps slope 1 through missing samples, at their real lag
+    np.testing.assert_allclose(slope[1:9], 1.0)
+    # a single valid sample gives no slope information; NaN once the window is all NaN
+    assert slope[0] == slope[9] == slope[10] == 0.0 and np.isnan(slope[11])
+
+
+def test_feature_model_roundtrip_and_chunked_scoring():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(2000, 2)).astype(np.float32)
+    cols, kinds = ["a", "b"], ["mean", "slope"]
+    center = np.nanmedian(X, axis=0)
+    F = RollingFeatures(2, 30, kinds, center).transform(X)
+    inner = fit_baseline(F, columns=feature_channels(cols, kinds))
+    inner.threshold = choose_threshold_from_train(inner, F)
+    model = FeatureModel(inner, cols, 30, kinds, center)
+
+    cfg = json.loads(json.dumps(model_to_config(model)))
+    assert cfg["columns"] == cols and cfg["features"]["kinds"] == kinds
+    back = model_from_config(cfg)
+    assert back.channels == ["a", "b", "a:mean", "b:mean", "a:slope", "b:slope"]
+
+    batch = model.score(X)
+    scorer = back.compile()
+    parts = [scorer.score(X[i:i + 333]) for i in range(0, len(X), 333)]
+    np.testing.assert_array_equal(np.concatenate(parts), batch)
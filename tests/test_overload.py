@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+import pytest
+
+from sensad.overload import OutputStage
+
+
+class _Gate:
+    # writer that blocks until released, recording what it wrote
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.rows = []
+
+    def __call__(self, blocks):
+        self.started.set()
+        self.release.wait(5)
+        for b in blocks:
+            self.rows.extend(zip(*b.fields, b.flags))
+
+
+def _stalled(policy, max_rows, **kw):
+    gate = _Gate()
+    stage = OutputStage(gate, max_rows=max_rows, policy=policy, **kw)
+    stage.put((["w"],), [False], 1)
+    assert gate.started.wait(5)  # the writer holds this block until released
+    return gate, stage
+
+
+def test_drop_normal_sheds_oldest_and_keeps_anomalies():
+    gate, stage = _stalled("drop-normal", 10)
+    ids = np.arange(30)
+    flags = np.zeros(30, dtype=bool)
+    flags[[3, 17, 25]] = True
+    for a in range(0, 30, 6):
+        stage.put((ids[a:a + 6],), flags[a:a + 6], 6)
+    gate.release.set()
+    stage.close()
+
+    got = [int(r[0]) for r in gate.rows[1:]]
+    # the newest block stays whole; older ones keep their anomalies only
+    assert got == [3, 17] + list(range(24, 30))
+    assert stage.dropped == 30 - len(got) and stage.blocked_s == 0.0
+
+
+def test_sample_keeps_every_nth_normal_row():
+    gate, stage = _stalled("sample", 12, sample_every=3)
+    for i in range(12):
+        stage.put(([i, i],), [i == 5, False], 2)
+    gate.release.set()
+    stage.close()
+    got = gate.rows[1:]
+    assert [r for r in got if r[1]] == [(5, True)]  # the anomaly survives
+    assert stage.dropped > 0 and len(got) + stage.dropped == 24 and stage.blocked_s == 0.0
+    kept = [r[0] for r in got if not r[1]]
+    assert 0 < len(kept) < 23  # some normal rows are kept, unlike drop-normal
+
+
+def test_rows_being_written_count_against_the_bound():
+    gate, stage = _stalled("drop-normal", 4)
+    assert stage.rows == 1  # the stalled write still shows in the queue gauge
+    for i in range(5):
+        stage.put(([i, i],), [False, False], 2)
+        assert stage.rows <= 4
+    gate.release.set()
+    stage.close()
+    assert stage.rows == 0 and len(gate.rows) + stage.dropped == 11
+
+
+def test_block_waits_and_writer_errors_surface():
+    gate, stage = _stalled("block", 3)
+    stage.put((["a", "b"],), [False, False], 2)
+    threading.Timer(0.1, gate.release.set).start()
+    stage.put((["c"],), [False], 1)  # waits for the writer
+    stage.close()
+    assert [r[0] for r in gate.rows] == ["w", "a", "b", "c"]
+    assert stage.dropped == 0 and stage.blocked_s > 0.05
+
+    def broken(blocks):
+        raise BrokenPipeError
+    stage = OutputStage(broken, max_rows=4)
+    stage.put((["x"],), [True], 1)
+    with pytest.raises(BrokenPipeError):
+        stage.close()
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from sensad.pipeline import TopK, run_pipeline
+
+
+def test_topk_matches_argsort_across_chunks():
+    rng = np.random.default_rng(0)
+    s = rng.normal(size=1000).astype(np.float32)
+    top = TopK(10)
+    for off in range(0, len(s), 64):
+        chunk = s[off:off + 64]
+        top.push(chunk, off, (np.arange(off, off + len(chunk)),))
+    idx = [i for i, _, _ in top.items()]
+    assert idx == list(np.argsort(-s)[:10])
+    assert all(i == f[0] for i, _, f in top.items())
+
+
+def test_pipeline_preserves_order_and_reraises():
+    out = []
+    run_pipeline(iter(range(100)), lambda x: x * 2, out.append, depth=2)
+    assert out == [x * 2 for x in range(100)]
+
+    def bad_sink(x):
+        if x == 10:
+            raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        run_pipeline(iter(range(1000)), lambda x: x, bad_sink)
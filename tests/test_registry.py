@@ -0,0 +1,36 @@
+import json
+import os
+
+import numpy as np
+
+from sensad.registry import ModelRegistry
+
+
+def _write_run(path, med):
+    path.mkdir(parents=True, exist_ok=True)
+    cfg = {"type": "baseline_robust_z", "columns": ["a"], "med": {"a": med}, "mad": {"a": 1.0}, "threshold": 3.0}
+    (path / "baseline.json").write_text(json.dumps(cfg), encoding="utf-8")
+
+
+def test_registry_lru_and_reload(tmp_path):
+    for dev in ("d1", "d2", "d3"):
+        _write_run(tmp_path / dev, med=0.0)
+    reg = ModelRegistry(str(tmp_path), capacity=2, check_interval=0.0)
+    reg.get("d1"), reg.get("d2"), reg.get("d1"), reg.get("d3")
+    assert list(reg._cache) == ["d1", "d3"]  # d2 was least recently used
+    assert reg.loads == 3
+
+    _write_run(tmp_path / "d1", med=10.0)
+    st = os.stat(tmp_path / "d1" / "baseline.json")
+    os.utime(tmp_path / "d1" / "baseline.json", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert reg.get("d1").med[0] == 10.0
+
+
+def test_predict_grouped_scores_each_device_with_its_model(tmp_path):
+    _write_run(tmp_path / "d1", med=0.0)
+    _write_run(tmp_path / "d2", med=100.0)
+    reg = ModelRegistry(str(tmp_path))
+    X = np.array([[0.0], [100.0], [0.0], [1.0]], dtype=np.float32)
+    score, pred = reg.predict_grouped(["d1", "d2", "d1", "nope"], lambda cols: X)
+    assert score[0] == 0.0 and score[1] == 0.0 and score[2] == 0.0
+    assert np.isnan(score[3]) and pred[3] == 0
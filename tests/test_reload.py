@@ -0,0 +1,132 @@
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from sensad.models import model_from_config
+from sensad.reload import ModelWatcher, read_artifact
+from sensad.serve import ScoringServer
+
+SCORE_STREAM = Path(__file__).resolve().parents[1] / "edge" / "score_stream.py"
+
+
+def _cfg(threshold=3.5, columns=("a", "b")):
+    return {"type": "baseline_robust_z", "columns": list(columns), "med": [0.0] * len(columns),
+            "mad": [1.0] * len(columns), "threshold": threshold, "agg": "max"}
+
+
+def _write(path, cfg):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cfg), encoding="utf-8")
+    tmp.replace(path)
+
+
+def test_watcher_swaps_new_versions_and_rejects_column_changes(tmp_path):
+    p = tmp_path / "baseline.json"
+    _write(p, _cfg())
+    cfg, v0 = read_artifact(p)
+    logs = []
+    w = ModelWatcher(p, model_from_config, v0, columns=cfg["columns"], log=logs.append, start=False)
+    assert not w.check() and w.take() is None
+
+    _write(p, _cfg(threshold=1.0))
+    assert w.check()
+    model, v1 = w.take()
+    assert model.threshold == 1.0 and v1 != v0 and w.take() is None
+    w.activate(v1)
+    assert w.version == v1 and w.reloads == 1
+
+    _write(p, _cfg(columns=("a", "c")))
+    assert not w.check() and w.take() is None
+    assert w.rejected == 1 and "differ" in logs[-1]
+    p.write_text("{not json", encoding="utf-8")
+    assert not w.check() and w.rejected == 2 and w.version == v1
+
+
+def test_server_swaps_model_between_batches(tmp_path):
+    p = tmp_path / "baseline.json"
+    _write(p, _cfg())
+    cfg, v0 = read_artifact(p)
+    w = ModelWatcher(p, model_from_config, v0, columns=cfg["columns"], log=lambda m: None, start=False)
+
+    async def run():
+        server = ScoringServer(model_from_config(cfg), max_batch=8, max_wait_s=0.001, watcher=w, version_column=True)
+        port, _ = await server.start("127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"b,a\n0,2.0\n")
+            header, first = await reader.readline(), await reader.readline()
+            _write(p, _cfg(threshold=1.0))
+            assert w.check()
+            writer.write(b"0,2.0\n")
+            second = await reader.readline()
+            writer.close()
+            return header, first, second
+        finally:
+            await server.close()
+
+    header, first, second = asyncio.run(run())
+    assert header == b"b,a,anomaly_score,is_anomaly,model_version\n"
+    assert first.startswith(b"0,2.0,") and first.endswith(b",0,%s\n" % v0.encode())
+    assert second.endswith(b",1,%s\n" % w.version.encode()) and w.version != v0
+
+
+def test_stream_scorer_reloads_without_losing_rows(tmp_path):
+    p = tmp_path / "baseline.json"
+    _write(p, _cfg())
+    proc = subprocess.Popen(
+        [sys.executable, str(SCORE_STREAM), "--baseline", str(p), "--reload-interval", "0.05", "--version-column"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    proc.stdin.write("a,b\n" + "2.0,0\n" * 5)
+    proc.stdin.flush()
+    lines = [proc.stdout.readline() for _ in range(6)]
+    _write(p, _cfg(threshold=1.0))
+    time.sleep(0.5)
+    _write(p, _cfg(columns=("a",)))
+    time.sleep(0.5)
+    out, err = proc.communicate("2.0,0\n" * 5)
+    rows = [ln.strip().split(",") for ln in lines[1:] + out.splitlines()]
+    assert len(rows) == 10
+    assert [r[3] for r in rows] == ["0"] * 5 + ["1"] * 5
+    assert len({r[4] for r in rows[:5]}) == len({r[4] for r in rows[5:]}) == 1 and rows[0][4] != rows[5][4]
+    assert "rejected" in err and proc.returncode == 0
+
+
+def test_stream_scorer_warms_a_stateful_model_before_the_swap(tmp_path):
+    p = tmp_path / "baseline.json"
+    cfg = dict(_cfg(), type="rolling_robust_z", window=4, min_periods=4)
+    _write(p, cfg)
+    proc = subprocess.Popen(
+        [sys.executable, str(SCORE_STREAM), "--baseline", str(p), "--reload-interval", "0.05", "--version-column"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    values = [10.0 + i % 3 for i in range(15)]
+    batches = [values[:5], values[5:10], values[10:]]
+    proc.stdin.write("a,b\n" + "".join(f"{v},0\n" for v in batches[0]))
+    proc.stdin.flush()
+    lines = [proc.stdout.readline() for _ in range(6)]
+    _write(p, dict(cfg, threshold=100.0))
+    time.sleep(0.5)
+    for batch in batches[1:]:
+        # the first batch(es) warm the new model, it scores the rest
+        proc.stdin.write("".join(f"{v},0\n" for v in batch))
+        proc.stdin.flush()
+        lines += [proc.stdout.readline() for _ in batch]
+    out, err = proc.communicate("")
+    rows = [ln.strip().split(",") for ln in lines[1:]]
+    assert len(rows) == 15 and proc.returncode == 0
+
+    # the swapped-in model carries on the window instead of falling back to warm-up
+    X = np.array([[v, 0.0] for v in values], dtype=np.float32)
+    expected = model_from_config(cfg).compile().score(X)
+    assert [r[2] for r in rows] == [f"{s:.6f}" for s in expected]
+    versions = [r[4] for r in rows]
+    swap = versions.index(versions[-1])
+    assert 9 <= swap < 15 and set(versions[:swap]) == {versions[0]}  # after >= 4 rows in the new window
+    assert [r[3] for r in rows[swap:]] == ["0"] * (15 - swap)
+    assert "warming its window on the next 4 rows" in err and "-> %s" % versions[-1] in err
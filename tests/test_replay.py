@@ -0,0 +1,39 @@
+import io
+
+from sensad.replay import replay
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, s):
+        self.t += max(s, 0.0)
+
+
+def _csv(tmp_path, times):
+    p = tmp_path / "feed.csv"
+    p.write_text("time,x\n" + "".join(f"{t},{i}\n" for i, t in enumerate(times)), encoding="utf-8")
+    return p
+
+
+def test_replay_rate_uses_absolute_deadlines(tmp_path):
+    p = _csv(tmp_path, range(1000))
+    clock, out = FakeClock(), io.BytesIO()
+    jit = replay(str(p), out, rate=100.0, loop=False, block_rows=64, clock=clock, sleep=clock.sleep)
+    assert out.getvalue() == p.read_bytes()
+    assert jit.rows == 1000 and jit.late_max == 0.0
+    assert abs(clock.t - 999 / 100.0) < 1e-9  # no accumulated drift
+
+
+def test_replay_speedup_follows_time_column(tmp_path):
+    times = ["2026-01-01 00:00:00", "2026-01-01 00:00:01", "2026-01-01 00:00:01", "2026-01-01 00:00:10"]
+    p = _csv(tmp_path, times)
+    clock, out = FakeClock(), io.BytesIO()
+    jit = replay(str(p), out, speedup=10.0, clock=clock, sleep=clock.sleep)
+    assert out.getvalue() == p.read_bytes()
+    assert abs(clock.t - 1.0) < 1e-9
+    assert jit.writes == 3  # rows sharing a timestamp go out in one write
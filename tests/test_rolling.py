@@ -0,0 +1,35 @@
+from collections import deque
+
+import numpy as np
+
+from sensad.rolling import SortedWindow, fit_rolling_baseline
+
+
+def test_sorted_window_median_mad_match_numpy():
+    rng = np.random.default_rng(0)
+    win, fifo = SortedWindow(load=4), deque()
+    for x in np.round(rng.normal(size=2000), 2).tolist():
+        if len(fifo) == 51:
+            win.remove(fifo.popleft())
+        fifo.append(x)
+        win.add(x)
+        a = np.array(fifo)
+        med = np.median(a)
+        assert win.median() == med
+        assert abs(win.mad(med) - np.median(np.abs(a - med))) < 1e-12
+
+
+def test_rolling_scores_do_not_depend_on_block_size():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(3000, 3)).astype(np.float32)
+    X[::97, 1] = np.nan
+    X[2000:, 0] += np.linspace(0, 5, 1000, dtype=np.float32)  # slow drift
+    model = fit_rolling_baseline(X[:500], columns=["a", "b", "c"], window=64)
+    batch = model.score(X)
+
+    scorer, parts, i = model.compile(), [], 0
+    while i < len(X):
+        k = int(rng.integers(1, 40))
+        parts.append(scorer.score(X[i:i + k]))
+        i += k
+    np.testing.assert_array_equal(np.concatenate(parts), batch)
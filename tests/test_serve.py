@@ -0,0 +1,109 @@
+import asyncio
+import io
+
+import numpy as np
+
+from sensad.baseline import BaselineModel
+from sensad.serve import ScoringServer, run_clients
+
+
+def _model():
+    return BaselineModel(columns=["a", "b"], med={"a": 0.0, "b": 10.0}, mad={"a": 1.0, "b": 1.0}, threshold=3.5)
+
+
+def test_serve_many_connections_match_batch_scores(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 1, size=(300, 2)) + [0.0, 10.0]
+    X[::50, 0] += 20.0
+    p = tmp_path / "feed.csv"
+    # columns in a different order than the model, plus an extra one
+    p.write_text("time,b,a\n" + "".join(f"{i},{b:.4f},{a:.4f}\n" for i, (a, b) in enumerate(X)), encoding="utf-8")
+    model = _model()
+    expected = int(model.predict(np.loadtxt(p, delimiter=",", skiprows=1, usecols=(2, 1)))[1].sum())
+    sink = io.BytesIO()
+
+    async def run():
+        server = ScoringServer(model, max_batch=64, conn_inflight=32, sink=sink)
+        port, _ = await server.start("127.0.0.1", 0)
+        try:
+            return await run_clients("127.0.0.1", port, str(p), connections=20, rate=0)
+        finally:
+            await server.close()
+
+    stats = asyncio.run(run())
+    assert stats["sent"] == stats["verdicts"] == 20 * 300
+    assert stats["anomalies"] == 20 * expected
+    lines = sink.getvalue().splitlines()
+    assert len(lines) == 20 * 300 and len({ln.split(b",")[0] for ln in lines}) == 20
+
+
+def test_serve_rejects_missing_columns():
+    async def run():
+        server = ScoringServer(_model())
+        port, _ = await server.start("127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"time,a\n1,0.0\n")
+            line = await reader.readline()
+            writer.close()
+            return line
+        finally:
+            await server.close()
+
+    assert asyncio.run(run()).startswith(b"ERROR missing columns")
+
+
+class _Flaky:
+    # stateful stand-in model (one scorer per feed) whose scorer fails on a value of 666
+    columns = ["a"]
+
+    def compile(self):
+        return self
+
+    def predict(self, X):
+        if (X == 666).any():
+            raise RuntimeError("bad row")
+        return X[:, 0], (X[:, 0] > 1).astype(int)
+
+
+class _FullDisk(io.BytesIO):
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+
+def test_serve_fails_only_the_feed_whose_batch_failed():
+    async def run():
+        server = ScoringServer(_Flaky(), max_wait_s=0.001)
+        port, _ = await server.start("127.0.0.1", 0)
+        try:
+            bad_r, bad_w = await asyncio.open_connection("127.0.0.1", port)
+            bad_w.write(b"a\n666\n")
+            bad = [await bad_r.readline(), await bad_r.readline(), await bad_r.readline()]
+            good_r, good_w = await asyncio.open_connection("127.0.0.1", port)
+            good_w.write(b"a\n2\n")
+            good = [await good_r.readline(), await good_r.readline()]
+            good_w.write_eof()
+            assert await good_r.read() == b""  # the feed ends normally
+            return bad, good
+        finally:
+            await server.close()
+
+    bad, good = asyncio.run(run())
+    assert bad[1].startswith(b"ERROR scoring failed: bad row") and bad[2] == b""  # then closed
+    assert good[1] == b"2,2.000000,1\n"
+
+
+def test_serve_stops_when_the_sink_fails():
+    async def run():
+        server = ScoringServer(_model(), max_wait_s=0.001, sink=_FullDisk())
+        port, _ = await server.start("127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"a,b\n0,10\n")
+            await asyncio.wait_for(server.wait(), 5)
+            writer.close()
+            return server.error
+        finally:
+            await server.close()
+
+    assert isinstance(asyncio.run(run()), OSError)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from sensad.sketch import QuantileSketch, RowSample, rank_error
+
+
+def _rank(col: np.ndarray, v: float) -> float:
+    col = col[~np.isnan(col)]
+    return float(np.mean(col < v))
+
+
+def test_sketch_median_and_mad_within_rank_error():
+    rng = np.random.default_rng(0)
+    X = rng.standard_t(3, size=(200_000, 3)).astype(np.float32)
+    X[rng.random(X.shape) < 0.01] = np.nan
+    left, right = QuantileSketch(3, k=200, seed=1), QuantileSketch(3, k=200, seed=2)
+    for i in range(0, 100_000, 9_000):
+        left.update(X[i:min(i + 9_000, 100_000)])
+    for i in range(100_000, 200_000, 25_000):
+        right.update(X[i:i + 25_000])
+    sketch = left.merge(right)
+    assert sketch.n == len(X)
+
+    eps = rank_error(200)
+    med = sketch.median()
+    mad = sketch.mad(med)
+    for j in range(3):
+        assert abs(_rank(X[:, j], med[j]) - 0.5) < eps
+        assert abs(_rank(np.abs(X[:, j] - med[j]), mad[j]) - 0.5) < 2 * eps
+    assert sum(len(b) for b in sketch.levels) < 4 * 200
+
+
+def test_row_sample_is_bounded_and_mergeable():
+    a, b = RowSample(2, size=100, seed=0), RowSample(2, size=100, seed=1)
+    a.update(np.zeros((1000, 2)))
+    b.update(np.ones((1000, 2)))
+    a.merge(b)
+    assert a.rows.shape == (100, 2)
+    assert 20 < a.rows[:, 0].sum() < 80
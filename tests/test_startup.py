@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SCORE_STREAM = ROOT / "edge" / "score_stream.py"
+
+# Budget for the lite stream scorer on top of a bare interpreter start.
+STARTUP_BUDGET_S = 0.1
+
+
+def _imported(args, stdin=""):
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "src"))
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        input=stdin, capture_output=True, text=True, check=True, env=env,
+    )
+    return {line.split("|")[-1].strip() for line in res.stderr.splitlines() if line.startswith("import time:")}
+
+
+def _best_wall(args, stdin="", runs=3):
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *args], input=stdin, capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _baseline_json(tmp_path):
+    cfg = {"type": "baseline_robust_z", "columns": ["a"], "med": {"a": 0.0}, "mad": {"a": 1.0}, "threshold": 3.0}
+    p = tmp_path / "baseline.json"
+    p.write_text(json.dumps(cfg), encoding="utf-8")
+    return str(p)
+
+
+def test_lite_stream_scorer_imports_no_numpy_or_pandas(tmp_path):
+    mods = _imported([str(SCORE_STREAM), "--baseline", _baseline_json(tmp_path), "--engine", "lite"], "a\n1\n")
+    assert "numpy" not in mods and "pandas" not in mods
+
+
+def test_cli_imports_subcommands_lazily():
+    mods = _imported(["-c", "import sensad.cli"])
+    assert "pandas" not in mods and "numpy" not in mods
+
+
+def test_lite_stream_scorer_startup_time(tmp_path):
+    feed = "a\n1\n"
+    bare = _best_wall(["-c", "pass"])
+    lite = _best_wall([str(SCORE_STREAM), "--baseline", _baseline_json(tmp_path), "--engine", "lite"], feed)
+    assert lite - bare < STARTUP_BUDGET_S, f"lite scorer startup {1000 * (lite - bare):.0f} ms over bare python"
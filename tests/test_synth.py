@@ -0,0 +1,17 @@
+import numpy as np
+
+from sensad.synth import synth_main
+
+
+def test_synth_chunks_are_reproducible_across_workers(tmp_path):
+    # 4000 sensors -> 1024-row chunks, so 3000 rows span several chunks
+    for workers in (1, 2):
+        synth_main(str(tmp_path / f"w{workers}"), minutes=0, freq="1s", seed=7, format="npy",
+                   sensors=4000, rows=3000, workers=workers)
+    for name in ("train.npy", "test.npy", "test.time.npy"):
+        a = np.load(tmp_path / "w1" / name)
+        b = np.load(tmp_path / "w2" / name)
+        np.testing.assert_array_equal(a, b)
+    X = np.load(tmp_path / "w1" / "test.npy")
+    assert X.shape == (600, 4001) and not np.isnan(X).any()
+    assert X[:, -1].max() == 1.0  # labels present
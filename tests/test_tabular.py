@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensad.tabular import FrameWriter, iter_frames, iter_shard, read_frame, read_matrix, shard_ranges
+
+
+def _frame(n=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "time": pd.date_range("2026-01-01", periods=n, freq="1s"),
+        "a": rng.normal(size=n),
+        "b": rng.normal(size=n),
+        "c": rng.normal(size=n),
+    })
+
+
+@pytest.mark.parametrize("ext", ["csv", "npy", "parquet", "arrow"])
+def test_chunked_write_roundtrip(tmp_path, ext):
+    if ext in ("parquet", "arrow"):
+        pytest.importorskip("pyarrow")
+    df = _frame()
+    path = tmp_path / f"x.{ext}"
+    with FrameWriter(path) as w:
+        for a in range(0, len(df), 128):
+            w.write(df.iloc[a:a + 128])
+
+    X = read_matrix(path, ["b", "c"])
+    assert X.dtype == np.float32 and X.shape == (len(df), 2)
+    np.testing.assert_array_equal(X, df[["b", "c"]].to_numpy(np.float32))
+
+    back = pd.concat(list(iter_frames(path, 100)), ignore_index=True)
+    assert list(back.columns) == ["time", "a", "b", "c"]
+    assert len(back) == len(df)
+
+    blocks = [blk for a, b in shard_ranges(path, 3) for blk in iter_shard(path, a, b, ["a"], 64)]
+    np.testing.assert_array_equal(np.concatenate(blocks), df[["a"]].to_numpy(np.float32))
+
+
+def test_npy_is_memory_mapped(tmp_path):
+    df = _frame()
+    path = tmp_path / "x.npy"
+    with FrameWriter(path) as w:
+        w.write(df)
+    X = read_matrix(path, ["a", "b"])
+    assert isinstance(X.base, np.memmap) or isinstance(X, np.memmap)
+    assert pd.api.types.is_datetime64_any_dtype(read_frame(path, ["time"])["time"])
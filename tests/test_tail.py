@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from sensad.baseline import BaselineModel
+from sensad.infer import infer_main
+from sensad.models import model_to_config
+from sensad.rolling import RollingBaselineModel
+from sensad.tail import load_checkpoint
+
+
+def _run(tmp_path, model):
+    run = tmp_path / "run"
+    run.mkdir()
+    (run / "baseline.json").write_text(json.dumps(model_to_config(model)), encoding="utf-8")
+    return run
+
+
+def _csv(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, 2)), columns=["a", "b"])
+    df.insert(0, "time", range(n))
+    df.loc[n // 3, "a"] = 40.0
+    df.loc[n // 2, "b"] = np.nan
+    text = df.to_csv(index=False)
+    return text[: text.index("\n") + 1], text.splitlines(keepends=True)[1:]
+
+
+def test_tail_appends_match_full_run(tmp_path):
+    model = RollingBaselineModel(columns=["a", "b"], med=[0.0, 0.0], mad=[1.0, 1.0], threshold=3.0, window=25)
+    run = _run(tmp_path, model)
+    header, rows = _csv(600)
+    full, live = tmp_path / "full.csv", tmp_path / "live.csv"
+    full.write_text(header + "".join(rows), encoding="utf-8")
+    infer_main(str(run), str(full), str(tmp_path / "expected.csv"))
+
+    out = tmp_path / "pred.csv"
+    # the second cut ends mid-line: that row waits for the next run
+    for n, partial in ((150, ""), (310, rows[310][:6]), (600, "")):
+        live.write_text(header + "".join(rows[:n]) + partial, encoding="utf-8")
+        infer_main(str(run), str(live), str(out), tail=True, chunksize=64)
+    ck = load_checkpoint(out)
+    assert ck["rows"] == 600 and ck["offset"] == live.stat().st_size and ck["state"]
+    assert out.read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+
+def test_tail_rescores_on_changes(tmp_path):
+    model = BaselineModel(columns=["a", "b"], med=[0.0, 0.0], mad=[1.0, 1.0], threshold=3.0)
+    run = _run(tmp_path, model)
+    header, rows = _csv(200)
+    live, out = tmp_path / "live.csv", tmp_path / "pred.csv"
+    live.write_text(header + "".join(rows[:100]), encoding="utf-8")
+    infer_main(str(run), str(live), str(out), tail=True)
+    assert load_checkpoint(out)["state"] is None
+
+    # a threshold override is a different model: full rescore, not an append
+    infer_main(str(run), str(live), str(out), tail=True, threshold=1.0)
+    assert len(pd.read_csv(out)) == 100
+
+    # the file was replaced by another one (rotation): rescored from the start
+    _, other = _csv(200, seed=1)
+    live.write_text(header + "".join(other[:150]), encoding="utf-8")
+    infer_main(str(run), str(live), str(out), tail=True, threshold=1.0)
+    pred = pd.read_csv(out)
+    assert len(pred) == 150
+    _, expected = BaselineModel(columns=["a", "b"], med=[0.0, 0.0], mad=[1.0, 1.0], threshold=1.0).predict(
+        pd.read_csv(live)[["a", "b"]].to_numpy())
+    np.testing.assert_array_equal(pred["is_anomaly"].to_numpy(), expected)
+    assert load_checkpoint(out)["rows"] == 150
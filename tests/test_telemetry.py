@@ -0,0 +1,31 @@
+import urllib.request
+
+from sensad.telemetry import NULL, Metrics, make_metrics, serve_http
+
+
+def test_prometheus_text_and_http_endpoint():
+    m = Metrics()
+    rows = m.counter("rows_total", "Rows scored")
+    h = m.histogram("stage_seconds", "Stage time", buckets=(0.001, 0.01), stage="score")
+    rows.inc(5)
+    for v in (0.0005, 0.005, 0.5):
+        h.observe(v)
+    port = serve_http(m, 0)
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    finally:
+        m.close()
+    assert "# TYPE sensad_rows_total counter" in body
+    assert "sensad_rows_total 5" in body
+    assert 'sensad_stage_seconds_bucket{stage="score",le="0.01"} 2' in body
+    assert 'sensad_stage_seconds_bucket{stage="score",le="+Inf"} 3' in body
+    assert 'sensad_stage_seconds_count{stage="score"} 3' in body
+
+
+def test_disabled_metrics_are_noops():
+    m = make_metrics()
+    assert m is NULL and not m.enabled
+    c = m.counter("rows_total")
+    c.inc(10)
+    m.histogram("x").observe(1.0)
+    assert m.render() == ""
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from sensad.baseline import aggregate, fit_baseline
+from sensad.eval import _prf
+from sensad.models import load_model, model_to_config
+from sensad.tune import tune_main
+
+
+def test_aggregate_top_k_and_weights():
+    rng = np.random.default_rng(0)
+    Z = np.abs(rng.normal(size=(50, 6))).astype(np.float32)
+    Z[3, 2] = np.nan
+    w = rng.uniform(0.5, 2.0, 6).astype(np.float32)
+
+    ref = np.sort(Z * w, axis=1)[:, -3:].mean(axis=1)
+    got = aggregate(Z.copy(), "top3", w)
+    np.testing.assert_allclose(got[~np.isnan(ref)], ref[~np.isnan(ref)], rtol=1e-6)
+    assert np.isnan(got[3])
+    np.testing.assert_array_equal(aggregate(Z.copy(), "top1"), aggregate(Z.copy(), "max"))
+    np.testing.assert_array_equal(aggregate(Z.copy(), "top9"), aggregate(Z.copy(), "mean"))
+
+
+def test_tune_writes_best_setting(tmp_path):
+    rng = np.random.default_rng(1)
+    cols = [f"s{j}" for j in range(5)]
+    scale = np.array([1.0, 1.0, 1.0, 1.0, 6.0])  # one heavy-tailed sensor
+    train = pd.DataFrame(rng.standard_t(3, size=(3000, 5)) * scale, columns=cols)
+    test = pd.DataFrame(rng.standard_t(3, size=(3000, 5)) * scale, columns=cols)
+    y = np.zeros(3000, dtype=int)
+    y[1000:1040] = y[2000:2030] = 1
+    test.loc[y == 1, ["s0", "s1"]] += 4.0
+    test["anomaly"] = y
+    train.to_csv(tmp_path / "train.csv", index=False)
+    test.to_csv(tmp_path / "test.csv", index=False)
+
+    run = tmp_path / "run"
+    run.mkdir()
+    bm = fit_baseline(train[cols].to_numpy(np.float32), cols)
+    (run / "baseline.json").write_text(json.dumps(model_to_config(bm)), encoding="utf-8")
+    (run / "meta.json").write_text(json.dumps({"data": str(tmp_path / "train.csv")}), encoding="utf-8")
+
+    out = tune_main(str(run), str(tmp_path / "test.csv"), quantiles="0.95,0.99,0.999")
+    assert out["configs"] == 4 * 2 * 3 and not out["cache_hit"]
+    best = out["best"]
+    assert best["f1"] >= out["current"]["f1"]
+
+    # the written model reproduces the reported score
+    model = load_model(run / "baseline.json")
+    assert model.agg == best["agg"] and model.threshold == best["threshold"]
+    assert (model.weights is not None) == (best["weights"] == "balanced")
+    _, pred = model.predict(test[cols].to_numpy(np.float32))
+    assert np.isclose(_prf(y, pred)["f1"], best["f1"])
+
+    again = tune_main(str(run), str(tmp_path / "test.csv"), quantiles="0.95,0.99,0.999", write=False)
+    assert again["cache_hit"] and again["best"] == best
@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from sensad.replay import replay
+from sensad.wire import BlockEncoder, format_times, iter_batches, read_header
+
+ROOT = Path(__file__).resolve().parents[1]
+SCORE_STREAM = ROOT / "edge" / "score_stream.py"
+
+
+def _csv(tmp_path, n=500):
+    rng = np.random.default_rng(0)
+    lines = ["time,temp,pressure"]
+    for i in range(n):
+        temp = "" if i % 50 == 7 else f"{50 + rng.normal(0, 1):.4f}"
+        lines.append(f"{i * 0.5:g},{temp},{5 + rng.normal(0, 0.1):.4f}")
+    p = tmp_path / "feed.csv"
+    p.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return p
+
+
+def _binary_feed(p: Path) -> bytes:
+    out = io.BytesIO()
+    replay(str(p), out, rate=0, block_rows=64, encoder=BlockEncoder(["time", "temp", "pressure"]))
+    return out.getvalue()
+
+
+def test_frames_round_trip_in_any_batch_size(tmp_path):
+    p = _csv(tmp_path)
+    feed = tmp_path / "feed.bin"
+    feed.write_bytes(_binary_feed(p))
+    text = np.genfromtxt(p, delimiter=",", skip_header=1, dtype=np.float64)
+    for max_batch in (1, 37, 1000):
+        fd = os.open(feed, os.O_RDONLY)
+        try:
+            schema = read_header(fd)
+            parts = list(iter_batches(fd, schema, max_batch=max_batch))
+        finally:
+            os.close(fd)
+        assert schema["columns"] == ["temp", "pressure"] and schema["time"] == "number"
+        assert max(len(X) for _, X in parts) <= max_batch
+        times = np.concatenate([t for t, _ in parts])
+        X = np.concatenate([X for _, X in parts])
+        np.testing.assert_array_equal(X, text[:, 1:].astype(np.float32))
+        assert format_times(times, "number")[:3] == ["0", "0.5", "1"]
+
+
+def test_epoch_millisecond_times_round_trip(tmp_path):
+    # far beyond int64 once scaled to ns: numbers travel as they are
+    cells = ["1700000000000", "1700000000250", "", "1700000000000.5", "9.5e15"]
+    enc = BlockEncoder(["time", "a"])
+    blk = enc.block([f"{c},1\n".encode() for c in cells])
+    feed = tmp_path / "feed.bin"
+    feed.write_bytes(enc.header() + enc.frame(blk, 0, len(cells)))
+    fd = os.open(feed, os.O_RDONLY)
+    try:
+        schema = read_header(fd)
+        ((times, _),) = iter_batches(fd, schema, max_batch=10)
+    finally:
+        os.close(fd)
+    assert schema["time"] == "number"
+    assert format_times(times, "number") == ["1700000000000", "1700000000250", "", "1700000000000.5",
+                                             "9500000000000000"]
+
+
+def test_binary_wire_scores_like_text(tmp_path):
+    p = _csv(tmp_path)
+    cfg = {"columns": ["temp", "pressure"], "med": {"temp": 50.0, "pressure": 5.0},
+           "mad": {"temp": 0.5, "pressure": 0.05}, "threshold": 3.0, "agg": "max"}
+    (tmp_path / "baseline.json").write_text(json.dumps(cfg), encoding="utf-8")
+
+    def run(feed: bytes, *extra: str) -> str:
+        cmd = [sys.executable, str(SCORE_STREAM), "--baseline", str(tmp_path / "baseline.json"), "--max-batch", "64", *extra]
+        return subprocess.run(cmd, input=feed, capture_output=True, check=True).stdout.decode()
+
+    text = [l.split(",") for l in run(p.read_bytes()).splitlines()[1:]]
+    binary = [l.split(",") for l in run(_binary_feed(p), "--wire", "binary").splitlines()[1:]]
+    assert len(binary) == len(text) == 500
+    assert [r[-2:] for r in binary] == [r[-2:] for r in text]  # same score and flag for every row
+    assert [r[1] for r in binary][7] == ""                     # missing cell stays empty